@@ -0,0 +1,79 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+import logging
+from app.core.config import settings
+from app.core.database import get_async_db
+from app.core.auth_dependencies import get_current_admin
+from app.repository import AsyncUserRepository
+from app.schemas import BulkUserCreateRequest, BulkUserCreateResponse, ProfilingRequest
+from app.services.password_hasher import get_password_hasher
+from app.services.request_profiler import get_request_profiler
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/v1/admin", tags=["Admin"])
+
+@router.post("/users/bulk", response_model=BulkUserCreateResponse, summary="Provision users in bulk", description="Create many users at once. Passwords are hashed in parallel on the password hashing pool and users are inserted with a single bulk insert. Emails that already exist, or repeat within the request, are skipped. Admin authentication required.")
+async def bulk_create_users(
+    request: BulkUserCreateRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_admin=Depends(get_current_admin)
+):
+    user_repo = AsyncUserRepository(db)
+    
+    seen = set()
+    skipped = []
+    candidates = []
+    for user in request.users:
+        if user.email in seen:
+            skipped.append(user.email)
+            continue
+        seen.add(user.email)
+        candidates.append(user)
+    
+    existing = set(await user_repo.get_existing_emails([user.email for user in candidates]))
+    skipped.extend(user.email for user in candidates if user.email in existing)
+    to_create = [user for user in candidates if user.email not in existing]
+    
+    hashed_passwords = await get_password_hasher().hash_many([user.password for user in to_create])
+    created = await user_repo.bulk_create([
+        {
+            "email": user.email,
+            "name": user.name,
+            "hashed_password": hashed_password,
+            "plan_type": user.plan_type
+        }
+        for user, hashed_password in zip(to_create, hashed_passwords)
+    ])
+    logger.info(f"Admin {current_admin.id} provisioned {created} users ({len(skipped)} skipped)")
+    return BulkUserCreateResponse(created=created, skipped_emails=skipped)
+
+@router.get("/password-hasher/stats", summary="Get password hashing pool statistics", description="Get worker count, in-flight calls and queue depth of the password hashing pool. Admin authentication required.")
+async def get_password_hasher_stats(current_admin=Depends(get_current_admin)):
+    return get_password_hasher().get_stats()
+
+@router.post("/profiling", summary="Profile upcoming requests", description="Profile the next N AI query requests handled by this worker with cProfile or a stack sampler, optionally with tracemalloc snapshots. Reports are collected from GET /api/v1/admin/profiling. Returns 409 when Server-Timing is disabled, since nothing would be profiled. Admin authentication required.")
+async def arm_profiling(request: ProfilingRequest, current_admin=Depends(get_current_admin)):
+    # Requests are only claimed by ServerTimingMiddleware, and only on paths it times
+    if not settings.SERVER_TIMING_ENABLED:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Profiling needs SERVER_TIMING_ENABLED: no requests would be profiled"
+        )
+    timed_prefix = settings.SERVER_TIMING_PATH_PREFIX
+    if not (request.path_prefix.startswith(timed_prefix) or timed_prefix.startswith(request.path_prefix)):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Only requests under SERVER_TIMING_PATH_PREFIX ({timed_prefix}) can be profiled"
+        )
+    logger.info(f"Admin {current_admin.id} armed profiling for {request.requests} requests")
+    return get_request_profiler().arm(request.requests, mode=request.mode, memory=request.memory, path_prefix=request.path_prefix)
+
+@router.get("/profiling", summary="Get profiling reports", description="Get the profiler status and the reports of profiled requests on this worker, oldest first. Admin authentication required.")
+async def get_profiling_reports(current_admin=Depends(get_current_admin)):
+    profiler = get_request_profiler()
+    return {**profiler.get_status(), "reports": list(profiler.reports)}
+
+@router.delete("/profiling", summary="Stop profiling", description="Stop profiling further requests and discard collected reports. Admin authentication required.")
+async def disarm_profiling(current_admin=Depends(get_current_admin)):
+    return get_request_profiler().disarm(clear_reports=True)
@@ -1,58 +1,103 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
+import json
+from typing import Optional
 import logging
-from app.core.database import get_db
-from app.schemas import QueryRequest, QueryResponse
-from app.services.ai_router_service import AIRouterService
+import time
+from datetime import datetime, timedelta
+from app.core.database import get_async_db
+from app.schemas import QueryRequest, QueryResponse, BatchQueryRequest, BatchQueryItem, BatchQueryResponse, AIQueryResponse, QueryHistoryPage
+from app.utils import encode_cursor, decode_cursor
+from app.services.ai_router_service import get_ai_router_service
 from app.services.rate_limiter import RateLimiter
-from app.repository import UserRepository, AIQueryRepository
+from app.services.conversation_memory import ConversationContext
+from app.services.token_estimator import PromptTooLargeError, get_token_estimator
+from app.services.query_log_writer import QueryLogWriter
+from app.services.principal_cache import get_principal_cache
+from app.services.usage_counters import DailyUsage, get_usage_counters
+from app.repository import AsyncAIQueryRepository
+from app.core.config import settings
 from app.core.models_config import ModelConfig
+from app.core.metrics import REQUEST_SECONDS, record_usage
+from app.core.request_timing import begin_span, span
 from app.core.auth_dependencies import get_current_user
+from app.core.principal import Principal
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/v1/ai", tags=["AI"])
 
-ai_router_service = AIRouterService()
 rate_limiter = RateLimiter()
+query_log_writer = QueryLogWriter()
+# Persistence for streams whose client went away; held here so the tasks are not garbage collected mid-write
+_orphaned_persists = set()
+
+# Not a real HTTP status: the nginx convention for "client closed request", used to label abandoned streams
+STATUS_CLIENT_CLOSED = 499
+
+async def _authorize_query(request, current_user: Principal, cost: int = 1):
+    if request.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Forbidden: user mismatch")
+    if current_user.session_id is None or request.session_id != current_user.session_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    with span("ratelimit"):
+        rate_limit = await rate_limiter.acquire(request.user_id, current_user.plan_type.value, cost=cost)
+    if not rate_limit.allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Rate limit exceeded. Free users are limited to {rate_limit.limit} requests per {rate_limiter.window} seconds.",
+            headers=rate_limit.headers()
+        )
+    return rate_limit
+
+async def _record_queries(user: Principal, session_id: str, items) -> int:
+    # Persistence is write-behind; today's counters live in Redis and the increment returns the new totals
+    await query_log_writer.record(user.id, session_id, items)
+    for _, ai_response in items:
+        record_usage(ai_response.model_used, ai_response.tokens_used, ai_response.cost_usd)
+    premium = sum(1 for _, ai_response in items if ModelConfig.is_premium(ai_response.model_used))
+    usage = await get_usage_counters().increment(user.id, queries=len(items), premium=premium)
+    return get_ai_router_service().remaining_queries_for(user.plan_type, usage.queries if usage else 0)
+
+async def _load_context(request: QueryRequest, user: Principal) -> Optional[ConversationContext]:
+    if not request.use_history:
+        return None
+    with span("history"):
+        return await get_ai_router_service().conversation_memory.load(user.id, request.session_id)
+
+async def _remember_turn(request: QueryRequest, user: Principal, context: Optional[ConversationContext], response_text: str):
+    if request.use_history and response_text:
+        await get_ai_router_service().conversation_memory.append(user.id, request.session_id, context, request.query, response_text)
+
+def _observe_request(endpoint: str, user: Principal, start_time: float, status_code: int):
+    REQUEST_SECONDS.labels(endpoint, user.plan_type.value, str(status_code)).observe(time.perf_counter() - start_time)
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 @router.post("/query", response_model=QueryResponse, summary="Query AI", description="Send a query to the AI system. Authentication required.")
 async def query_ai(
     request: QueryRequest,
-    db: Session = Depends(get_db),
-    current_user=Depends(get_current_user)
+    response: Response,
+    current_user: Principal = Depends(get_current_user)
 ):
+    start_time = time.perf_counter()
+    status_code = 200
     try:
-        user_repo = UserRepository(db)
-        user = user_repo.get_by_id_and_session_id(request.user_id, request.session_id)
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="User not found"
-            )
-        if user.id != current_user.id:
-            raise HTTPException(status_code=403, detail="Forbidden: user mismatch")
-        if not rate_limiter.is_allowed(request.user_id, user.plan_type.value):
-            raise HTTPException(
-                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail=f"Rate limit exceeded. Free users are limited to {rate_limiter.get_remaining_requests(request.user_id, user.plan_type.value)} requests per minute."
-            )
-        rate_limiter.increment_request(request.user_id, user.plan_type.value)
-        ai_response = await ai_router_service.execute_query(
-            query=request.query,
-            user_id=request.user_id,
-            session_id=request.session_id,
-            db=db
-        )
-        ai_router_service.save_query_to_db(
-            db=db,
-            user_id=request.user_id,
-            session_id=request.session_id,
-            query_text=request.query,
-            ai_response=ai_response
-        )
-        user_repo.increment_daily_query_count(request.user_id)
-        remaining_queries = ai_router_service.get_remaining_queries(db, request.user_id)
+        rate_limit = await _authorize_query(request, current_user)
+        response.headers.update(rate_limit.headers())
+        context = await _load_context(request, current_user)
+        ai_response = await get_ai_router_service().execute_query(request.query, current_user.plan_type, context)
+        with span("persist"):
+            remaining_queries = await _record_queries(current_user, request.session_id, [(request.query, ai_response)])
+            await _remember_turn(request, current_user, context, ai_response.response)
+        # Runs until the response starts: building the model, validation and JSON encoding
+        begin_span("serialize")
         return QueryResponse(
             response=ai_response.response,
             model_used=ai_response.model_used,
@@ -60,51 +105,258 @@ async def query_ai(
             cost_usd=ai_response.cost_usd,
             processing_time=ai_response.processing_time,
             session_id=request.session_id,
-            remaining_queries=remaining_queries
+            remaining_queries=remaining_queries,
+            cached=ai_response.cached
         )
-    except HTTPException:
+    except HTTPException as e:
+        status_code = e.status_code
         raise
+    except PromptTooLargeError as e:
+        status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        raise HTTPException(status_code=status_code, detail=str(e))
     except Exception as e:
         logger.error(f"Error in query_ai: {str(e)}")
+        status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+        raise HTTPException(
+            status_code=status_code,
+            detail="Internal server error"
+        )
+    finally:
+        _observe_request("query", current_user, start_time, status_code)
+
+@router.post("/query/batch", response_model=BatchQueryResponse, summary="Query AI in batch", description="Send many queries in one request. Queries are classified together, answered concurrently and returned in order, with failures reported per item. Authentication required.")
+async def query_ai_batch(
+    request: BatchQueryRequest,
+    response: Response,
+    current_user: Principal = Depends(get_current_user)
+):
+    start_time = time.perf_counter()
+    status_code = 200
+    try:
+        rate_limit = await _authorize_query(request, current_user, cost=len(request.queries))
+        response.headers.update(rate_limit.headers())
+        outcomes = await get_ai_router_service().execute_batch(request.queries, current_user.plan_type)
+        
+        results = []
+        answered = []
+        for index, (query_text, outcome) in enumerate(zip(request.queries, outcomes)):
+            if isinstance(outcome, Exception):
+                logger.warning(f"Batch item {index} failed: {str(outcome)}")
+                error = str(outcome) if isinstance(outcome, PromptTooLargeError) else "All AI models are currently unavailable"
+                results.append(BatchQueryItem(index=index, success=False, error=error))
+                continue
+            answered.append((query_text, outcome))
+            results.append(BatchQueryItem(
+                index=index,
+                success=True,
+                response=outcome.response,
+                model_used=outcome.model_used,
+                tokens_used=outcome.tokens_used,
+                cost_usd=outcome.cost_usd,
+                processing_time=outcome.processing_time,
+                cached=outcome.cached
+            ))
+        
+        with span("persist"):
+            remaining_queries = await _record_queries(current_user, request.session_id, answered)
+        
+        begin_span("serialize")
+        return BatchQueryResponse(
+            session_id=request.session_id,
+            results=results,
+            succeeded=len(answered),
+            failed=len(results) - len(answered),
+            remaining_queries=remaining_queries
+        )
+    except HTTPException as e:
+        status_code = e.status_code
+        raise
+    except Exception as e:
+        logger.error(f"Error in query_ai_batch: {str(e)}")
+        status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+        raise HTTPException(
+            status_code=status_code,
+            detail="Internal server error"
+        )
+    finally:
+        _observe_request("batch", current_user, start_time, status_code)
+
+@router.post("/query/stream", summary="Query AI with streaming", description="Send a query and receive the completion as Server-Sent Events (`meta`, `token`, `done`, `error`). Authentication required.")
+async def query_ai_stream(
+    request: QueryRequest,
+    current_user: Principal = Depends(get_current_user)
+):
+    start_time = time.perf_counter()
+    try:
+        rate_limit = await _authorize_query(request, current_user)
+        context = await _load_context(request, current_user)
+        completion_stream = await get_ai_router_service().open_stream(request.query, current_user.plan_type, context)
+    except HTTPException as e:
+        _observe_request("stream", current_user, start_time, e.status_code)
+        raise
+    except PromptTooLargeError as e:
+        _observe_request("stream", current_user, start_time, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error in query_ai_stream: {str(e)}")
+        _observe_request("stream", current_user, start_time, status.HTTP_500_INTERNAL_SERVER_ERROR)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Internal server error"
         )
+    
+    async def persist(interrupted: bool):
+        # Whatever was generated is charged and logged, including the partial text of an abandoned stream
+        ai_response = completion_stream.to_ai_response(request.query, context)
+        # Sent after the headers, so this span only reaches the sampled timing log
+        with span("persist"):
+            try:
+                remaining_queries = await _record_queries(current_user, request.session_id, [(request.query, ai_response)])
+            except Exception as e:
+                logger.error(f"Failed to record streamed query: {str(e)}")
+                remaining_queries = 0
+            if not interrupted:
+                await _remember_turn(request, current_user, context, ai_response.response)
+        return ai_response, remaining_queries
+    
+    async def event_stream():
+        yield _sse("meta", {"model_used": completion_stream.model_used, "session_id": request.session_id})
+        interrupted = False
+        finished = False
+        try:
+            try:
+                async for delta in completion_stream:
+                    if delta.text:
+                        yield _sse("token", {"text": delta.text})
+            except Exception as e:
+                logger.error(f"Stream from {completion_stream.model_used} failed after first token: {str(e)}")
+                yield _sse("error", {"detail": "Stream interrupted"})
+                interrupted = True
+            finished = True
+        finally:
+            # Also reached when the client disconnects mid-stream: release the provider stream
+            await completion_stream.aclose()
+            if not finished:
+                # The generator is being cancelled or closed, so persist in a task of its own; shield keeps
+                # a second cancel from abandoning it. The partial answer is not remembered as a turn.
+                task = asyncio.create_task(persist(interrupted=True))
+                _orphaned_persists.add(task)
+                task.add_done_callback(_orphaned_persists.discard)
+                _observe_request("stream", current_user, start_time, STATUS_CLIENT_CLOSED)
+                try:
+                    await asyncio.shield(task)
+                except asyncio.CancelledError:
+                    pass
+        
+        ai_response, remaining_queries = await persist(interrupted)
+        # End to end for a stream is until the done event; observed first so a disconnect now still counts
+        _observe_request("stream", current_user, start_time, 200)
+        yield _sse("done", {
+            "model_used": ai_response.model_used,
+            "tokens_used": ai_response.tokens_used,
+            "cost_usd": ai_response.cost_usd,
+            "processing_time": ai_response.processing_time,
+            "time_to_first_token": ai_response.time_to_first_token,
+            "session_id": request.session_id,
+            "remaining_queries": remaining_queries
+        })
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={**rate_limit.headers(), "Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @router.get("/models", summary="Get available models", description="Get information about available AI models and selection logic. Authentication required.")
 async def get_available_models(current_user=Depends(get_current_user)):
     return {
         "models": ModelConfig.get_all_models(),
-        "selection_logic": ModelConfig.get_selection_logic()
+        "selection_logic": ModelConfig.get_selection_logic(),
+        "routing_candidates": ModelConfig.ROUTING_CANDIDATES,
+        "routing": get_ai_router_service().adaptive_router.get_stats()
+    }
+
+@router.get("/cache/stats", summary="Get cache statistics", description="Get hit/miss/eviction counters for the in-process and Redis caches. Authentication required.")
+async def get_cache_stats(current_user=Depends(get_current_user)):
+    ai_router_service = get_ai_router_service()
+    return {
+        "classification": ai_router_service.classification_cache.get_stats(),
+        "response": ai_router_service.response_cache.get_stats(),
+        "principal": get_principal_cache().get_stats(),
+        "token_estimator": get_token_estimator().get_stats(),
+        "conversation_memory": ai_router_service.conversation_memory.get_stats(),
+        "single_flight": {
+            "provider": ai_router_service.provider_flights.get_stats(),
+            "classification": ai_router_service.classification_flights.get_stats()
+        }
     }
 
+@router.get("/history", response_model=QueryHistoryPage, summary="Get query history", description="Page through the authenticated user's queries, newest first; pass `next_cursor` back as `cursor` for the next page. For incremental sync pass `since` instead: queries added after that cursor are returned oldest first, and `next_cursor` is the `since` for the following call. Authentication required.")
+async def get_query_history(
+    cursor: Optional[str] = Query(None, description="Continue newest-first paging after this cursor"),
+    since: Optional[str] = Query(None, description="Return queries added after this cursor, oldest first"),
+    session_id: Optional[str] = Query(None, description="Only queries from this session"),
+    model: Optional[str] = Query(None, description="Only queries answered by this model"),
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    if cursor and since:
+        raise HTTPException(status_code=400, detail="Use either cursor or since, not both")
+    try:
+        decoded = decode_cursor(since or cursor) if (since or cursor) else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if cursor and decoded[1] is None:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    ai_query_repo = AsyncAIQueryRepository(db)
+    if since:
+        settled_before = datetime.utcnow() - timedelta(seconds=settings.HISTORY_SYNC_LAG_SECONDS)
+        rows = await ai_query_repo.get_history_since(
+            current_user.id, decoded[0], session_id, model, limit=limit + 1, settled_before=settled_before
+        )
+    else:
+        before = (decoded[1], decoded[0]) if decoded else None
+        rows = await ai_query_repo.get_history_page(current_user.id, session_id, model, before=before, limit=limit + 1)
+    
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if since:
+        # Always hand back a since cursor, even for an empty page, so clients can keep polling
+        next_cursor = encode_cursor(rows[-1].id, rows[-1].created_at) if rows else since
+    else:
+        next_cursor = encode_cursor(rows[-1].id, rows[-1].created_at) if rows and has_more else None
+    
+    return QueryHistoryPage(
+        items=[AIQueryResponse.model_validate(row) for row in rows],
+        next_cursor=next_cursor,
+        has_more=has_more
+    )
+
 @router.get("/usage/{user_id}", summary="Get user usage statistics", description="Get detailed usage statistics for a user. Authentication required.")
 async def get_user_usage(
     user_id: int, 
-    db: Session = Depends(get_db), 
-    current_user=Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db), 
+    current_user: Principal = Depends(get_current_user)
 ):
     if current_user.id != user_id:
         raise HTTPException(status_code=403, detail="Forbidden: can only access own usage statistics")
     
-    user_repo = UserRepository(db)
-    ai_query_repo = AIQueryRepository(db)
-    user = user_repo.get_by_id(user_id)
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
+    ai_query_repo = AsyncAIQueryRepository(db)
     
     try:
-        usage_summary = ai_query_repo.get_user_usage_summary(user_id)
+        usage_summary = await ai_query_repo.get_user_usage_summary(user_id)
+        usage = await get_usage_counters().get(user_id) or DailyUsage()
+        daily_query_count = usage.queries
         return {
             "user_id": user_id,
-            "plan_type": user.plan_type.value,
-            "daily_query_count": user.daily_query_count,
+            "plan_type": current_user.plan_type.value,
+            "daily_query_count": daily_query_count,
+            "daily_premium_count": usage.premium,
             "total_queries": usage_summary["total_queries"],
             "total_cost_usd": usage_summary["total_cost_usd"],
-            "remaining_queries": ai_router_service.get_remaining_queries(db, user_id),
+            "remaining_queries": get_ai_router_service().remaining_queries_for(current_user.plan_type, daily_query_count),
             "recent_queries": usage_summary["recent_queries"],
             "model_breakdown": usage_summary["model_breakdown"]
         }
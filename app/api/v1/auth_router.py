@@ -1,8 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from app.core.database import get_db
-from app.repository import UserRepository
-from app.core.auth import verify_password, get_password_hash, create_access_token
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_db, get_async_db
+from app.repository import UserRepository, AsyncUserRepository
+from app.core.auth import create_access_token
+from app.services.password_hasher import get_password_hasher, PasswordHasherBusyError
 from app.schemas.user import UserRegisterRequest, UserLoginRequest, TokenResponse, UserResponse, LogoutResponse, PlanUpdateRequest, PlanUpdateResponse
 from app.models.user import User, PlanType
 from app.utils import generate_session_id
@@ -10,30 +12,44 @@ from app.core.auth_dependencies import get_current_user
 
 router = APIRouter(prefix="/api/v1/auth", tags=["Auth"])
 
+def _hasher_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication is busy, please retry shortly",
+        headers={"Retry-After": "1"}
+    )
+
 @router.post("/register", response_model=UserResponse, summary="Register a new user", description="Create a new user account. No authentication required.")
-def register_user(request: UserRegisterRequest, db: Session = Depends(get_db)):
-    user_repo = UserRepository(db)
-    if user_repo.get_by_email(request.email):
+async def register_user(request: UserRegisterRequest, db: AsyncSession = Depends(get_async_db)):
+    user_repo = AsyncUserRepository(db)
+    if await user_repo.get_by_email(request.email):
         raise HTTPException(status_code=400, detail="Email already registered")
-    hashed_password = get_password_hash(request.password)
+    try:
+        hashed_password = await get_password_hasher().hash(request.password)
+    except PasswordHasherBusyError:
+        raise _hasher_busy()
     user = User(
         email=request.email,
         name=request.name,
         hashed_password=hashed_password,
         plan_type=request.plan_type
     )
-    user_repo.create(user)
+    await user_repo.create(user)
     return user
 
 @router.post("/login", response_model=TokenResponse, summary="Login user", description="Authenticate user and return JWT token. No authentication required.")
-def login_user(request: UserLoginRequest, db: Session = Depends(get_db)):
-    user_repo = UserRepository(db)
-    user = user_repo.get_by_email(request.email)
-    if not user or not verify_password(request.password, user.hashed_password):
+async def login_user(request: UserLoginRequest, db: AsyncSession = Depends(get_async_db)):
+    user_repo = AsyncUserRepository(db)
+    user = await user_repo.get_by_email(request.email)
+    try:
+        password_ok = user is not None and await get_password_hasher().verify(request.password, user.hashed_password)
+    except PasswordHasherBusyError:
+        raise _hasher_busy()
+    if not password_ok:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     session_id = generate_session_id()
-    user_repo.set_session_id(user.id, session_id)
+    await user_repo.set_session_id(user.id, session_id)
     
     token = create_access_token({"sub": str(user.id)})
     return TokenResponse(access_token=token, session_id=session_id, user_id=user.id)
@@ -1,6 +1,7 @@
 from app.core.config import settings
-from app.core.database import get_db, engine, Base
+from app.core.database import get_db, get_async_db, engine, async_engine, Base
 from app.core.models_config import ModelConfig
 from app.core.auth_dependencies import get_current_user, oauth2_scheme
+from app.core.principal import Principal
 
-__all__ = ["settings", "get_db", "engine", "Base", "ModelConfig", "get_current_user", "oauth2_scheme"] 
\ No newline at end of file
+__all__ = ["settings", "get_db", "get_async_db", "engine", "async_engine", "Base", "ModelConfig", "get_current_user", "oauth2_scheme", "Principal"] 
\ No newline at end of file
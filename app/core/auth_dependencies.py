@@ -1,23 +1,29 @@
 from fastapi import Depends, HTTPException
-from sqlalchemy.orm import Session
 from fastapi.security import OAuth2PasswordBearer
 from app.core.auth import verify_token
-from app.core.database import get_db
-from app.repository import UserRepository
-from app.models.user import User
+from app.core.config import settings
+from app.core.principal import Principal
+from app.core.request_timing import span
+from app.services.principal_cache import get_principal_cache
 
 oauth2_scheme = OAuth2PasswordBearer(
     tokenUrl="/api/v1/auth/login",
     scheme_name="JWT Bearer Token"
 )
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
-    payload = verify_token(token)
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> Principal:
+    with span("auth"):
+        payload = verify_token(token)
     if not payload or "sub" not in payload:
         raise HTTPException(status_code=401, detail="Invalid or missing token")
     user_id = int(payload["sub"])
-    user_repo = UserRepository(db)
-    user = user_repo.get_by_id(user_id)
-    if not user:
+    with span("user"):
+        principal = await get_principal_cache().get(user_id)
+    if not principal:
         raise HTTPException(status_code=401, detail="User not found")
-    return user 
\ No newline at end of file
+    return principal
+
+async def get_current_admin(current_user: Principal = Depends(get_current_user)) -> Principal:
+    if current_user.email not in settings.ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Forbidden: admin access required")
+    return current_user
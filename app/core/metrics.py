@@ -0,0 +1,110 @@
+"""
+Prometheus metrics for the query path, exposed at GET /metrics.
+
+Metric objects are module-level so instrumented code pays only a label lookup and an in-memory
+increment per observation; nothing is aggregated until Prometheus scrapes. Durations are
+measured with time.perf_counter().
+
+With several worker processes, set PROMETHEUS_MULTIPROC_DIR to a shared empty directory so
+/metrics aggregates every worker instead of reporting whichever one answered the scrape.
+"""
+import os
+import time
+from contextlib import contextmanager
+from typing import Tuple
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+)
+
+# Cache lookups and the keyword classifier answer in well under a millisecond, the LLM classifier in ~1s
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# Completions, from cached answers to long generations
+SLOW_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 7.5, 10.0, 15.0, 20.0, 30.0, 45.0, 60.0, 120.0)
+
+CLASSIFICATION_SECONDS = Histogram(
+    "vexacore_classification_seconds",
+    "Time to classify queries as code/creative, including cache lookups",
+    ["mode"],
+    buckets=FAST_BUCKETS
+)
+PROVIDER_SECONDS = Histogram(
+    "vexacore_provider_request_seconds",
+    "Provider completion latency per model; for streams, time to first token",
+    ["model", "kind", "outcome"],
+    buckets=SLOW_BUCKETS
+)
+FALLBACKS = Counter(
+    "vexacore_fallbacks_total",
+    "Requests that started a second model, by why it was started",
+    ["reason"]
+)
+DB_WRITE_SECONDS = Histogram(
+    "vexacore_db_write_seconds",
+    "Time spent in background database writes",
+    ["operation", "outcome"],
+    buckets=FAST_BUCKETS
+)
+RATE_LIMIT_SECONDS = Histogram(
+    "vexacore_rate_limit_seconds",
+    "Time to check and record a request against the Redis rate limiter",
+    ["source"],
+    buckets=FAST_BUCKETS
+)
+REQUEST_SECONDS = Histogram(
+    "vexacore_request_seconds",
+    "End-to-end latency of AI query endpoints, by plan",
+    ["endpoint", "plan", "status"],
+    buckets=SLOW_BUCKETS
+)
+TOKENS = Counter(
+    "vexacore_tokens_total",
+    "Tokens billed by providers, per model and purpose (query, or summary for conversation summaries)",
+    ["model", "purpose"]
+)
+COST_USD = Counter(
+    "vexacore_cost_usd_total",
+    "Provider spend in USD, per model and purpose (query, or summary for conversation summaries)",
+    ["model", "purpose"]
+)
+ROUTING_DECISIONS = Counter(
+    "vexacore_routing_decisions_total",
+    "Model selections per query category, and whether the preferred model was used",
+    ["category", "model", "reason"]
+)
+PROVIDER_IN_FLIGHT = Gauge(
+    "vexacore_provider_in_flight",
+    "Provider calls and open streams currently in flight, per provider",
+    ["provider"],
+    multiprocess_mode="livesum"
+)
+
+@contextmanager
+def observe_seconds(histogram: Histogram, **labels):
+    """Time the block into the histogram; the labels may be changed by the block, e.g. outcome."""
+    start = time.perf_counter()
+    try:
+        yield labels
+    finally:
+        histogram.labels(**labels).observe(time.perf_counter() - start)
+
+def record_usage(model: str, tokens: int, cost_usd: float, purpose: str = "query"):
+    # "gpt-4o-mini (fallback)" is billed as gpt-4o-mini; keeping the suffix out bounds the label set
+    model = model.split(" (", 1)[0]
+    if tokens:
+        TOKENS.labels(model, purpose).inc(tokens)
+    if cost_usd:
+        COST_USD.labels(model, purpose).inc(cost_usd)
+
+def render_latest() -> Tuple[bytes, str]:
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
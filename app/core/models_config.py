@@ -1,4 +1,4 @@
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 from app.core.config import settings
 
 class ModelConfig:
@@ -8,38 +8,107 @@ class ModelConfig:
             "provider": "OpenAI",
             "use_case": "Simple queries (< 50 words)",
             "cost_per_1k_tokens": settings.GPT4O_MINI_COST,
+            "context_window": 128000,
             "max_tokens": 4000,
+            "max_tokens_by_complexity": {"simple": 1024, "complex": 4000},
+            "read_timeout_seconds": 30.0,
+            "temperature": 0.7,
+            "alternatives": ["claude-3-haiku-20240307"],
+            "premium": False,
             "classification_model": True
         },
         "gpt-4o": {
             "provider": "OpenAI", 
             "use_case": "Complex queries, code-related tasks",
             "cost_per_1k_tokens": settings.GPT4O_COST,
+            "context_window": 128000,
             "max_tokens": 4000,
+            "max_tokens_by_complexity": {"simple": 2048, "complex": 4000},
+            "read_timeout_seconds": 60.0,
+            "temperature": 0.7,
+            "hedge_after_seconds": 8.0,
+            "alternatives": ["claude-3-5-sonnet-20241022", "gpt-4o-mini"],
+            "premium": True,
             "classification_model": False
         },
         "claude-3-5-sonnet-20241022": {
             "provider": "Anthropic",
             "use_case": "Creative writing, complex reasoning",
             "cost_per_1k_tokens": settings.CLAUDE_SONNET_COST,
+            "context_window": 200000,
             "max_tokens": 4000,
+            "max_tokens_by_complexity": {"simple": 2048, "complex": 4000},
+            "read_timeout_seconds": 60.0,
+            "prompt_cache_min_tokens": 1024,
+            "cache_read_cost_multiplier": 0.1,
+            "cache_write_cost_multiplier": 1.25,
+            "hedge_after_seconds": 10.0,
+            "alternatives": ["gpt-4o", "gpt-4o-mini"],
+            "premium": True,
             "classification_model": False
         },
         "claude-3-haiku-20240307": {
             "provider": "Anthropic",
             "use_case": "Lightweight classification tasks",
             "cost_per_1k_tokens": settings.CLAUDE_HAIKU_COST,
+            "context_window": 200000,
             "max_tokens": 4000,
+            "max_tokens_by_complexity": {"simple": 1024, "complex": 4000},
+            "read_timeout_seconds": 30.0,
+            "prompt_cache_min_tokens": 2048,
+            "cache_read_cost_multiplier": 0.1,
+            "cache_write_cost_multiplier": 1.25,
+            "alternatives": ["gpt-4o-mini"],
+            "premium": False,
             "classification_model": True
         }
     }
     
+    FALLBACK_MODEL = "gpt-4o-mini"
+    
+    # Smallest completion budget worth sending; prompts leaving less than this are rejected
+    MIN_COMPLETION_TOKENS = 256
+    CLASSIFIER_MODEL = "gpt-4o-mini"
+    SUMMARY_MODEL = "gpt-4o-mini"
+    
+    # How early each plan hedges a slow primary with the fallback model. The multiplier
+    # scales the model's hedge threshold (its observed p95 once enough samples exist).
+    HEDGING_POLICY = {
+        "free": {"enabled": False, "threshold_multiplier": 1.0},
+        "pro": {"enabled": True, "threshold_multiplier": 1.0},
+        "expert": {"enabled": True, "threshold_multiplier": 0.5}
+    }
+    
+    # Models that may answer each query category, most preferred first
+    ROUTING_CANDIDATES = {
+        "code": ["gpt-4o", "claude-3-5-sonnet-20241022", "gpt-4o-mini"],
+        "creative": ["claude-3-5-sonnet-20241022", "gpt-4o", "gpt-4o-mini"],
+        "complex": ["claude-3-5-sonnet-20241022", "gpt-4o", "gpt-4o-mini"],
+        "simple": ["gpt-4o-mini", "claude-3-haiku-20240307"]
+    }
+    
+    # Per-plan targets for adaptive routing. A candidate whose recent latency (EWMA, seconds)
+    # is over the SLO, whose error rate is over max_error_rate, or whose realized cost per 1k
+    # tokens is over the ceiling (None for no ceiling) is passed over for the next one.
+    ROUTING_POLICY = {
+        "free": {"latency_slo_seconds": 20.0, "max_error_rate": 0.25, "max_cost_per_1k_tokens": 0.005},
+        "pro": {"latency_slo_seconds": 15.0, "max_error_rate": 0.15, "max_cost_per_1k_tokens": None},
+        "expert": {"latency_slo_seconds": 10.0, "max_error_rate": 0.10, "max_cost_per_1k_tokens": None}
+    }
+    
+    # Concurrent batch completions allowed per provider
+    PROVIDER_CONCURRENCY = {
+        "OpenAI": settings.BATCH_OPENAI_CONCURRENCY,
+        "Anthropic": settings.BATCH_ANTHROPIC_CONCURRENCY
+    }
+    
     SELECTION_LOGIC = {
         "simple_queries": "GPT-4o-mini (cost-effective)",
         "code_queries": "GPT-4o (better code understanding)",
         "creative_writing": "Claude Sonnet (creative capabilities)",
         "complex_queries": "Claude Sonnet (better reasoning)",
-        "fallback": "GPT-4o-mini (reliability)"
+        "fallback": "GPT-4o-mini (reliability)",
+        "adaptive": "Skips to the next candidate when a model misses the plan's latency SLO, error budget or cost ceiling"
     }
     
     @classmethod
@@ -67,6 +136,71 @@ class ModelConfig:
         model_info = cls.get_model_info(model_name)
         return model_info.get("cost_per_1k_tokens", 0.0)
     
+    @classmethod
+    def get_usage_cost(cls, model_name: str, tokens_used: int, cache_read_tokens: int = 0, cache_write_tokens: int = 0) -> float:
+        """
+        Cost of a call whose tokens_used includes prompt-cache reads and writes. Anthropic bills
+        cache reads at a fraction of the input rate and cache writes at a premium.
+        """
+        model_info = cls.get_model_info(model_name)
+        billed_tokens = (
+            tokens_used - cache_read_tokens - cache_write_tokens
+            + cache_read_tokens * model_info.get("cache_read_cost_multiplier", 1.0)
+            + cache_write_tokens * model_info.get("cache_write_cost_multiplier", 1.0)
+        )
+        return (billed_tokens / 1000) * model_info.get("cost_per_1k_tokens", 0.0)
+    
+    @classmethod
+    def get_generation_params(cls, model_name: str, max_tokens: Optional[int] = None) -> Dict[str, Any]:
+        model_info = cls.get_model_info(model_name)
+        params = {"max_tokens": max_tokens or model_info.get("max_tokens", 4000)}
+        if "temperature" in model_info:
+            params["temperature"] = model_info["temperature"]
+        return params
+    
+    @classmethod
+    def get_max_tokens(cls, model_name: str, complexity: Optional[str] = None) -> int:
+        model_info = cls.get_model_info(model_name)
+        by_complexity = model_info.get("max_tokens_by_complexity", {})
+        return by_complexity.get(complexity, model_info.get("max_tokens", 4000))
+    
+    @classmethod
+    def get_context_window(cls, model_name: str) -> int:
+        return cls.get_model_info(model_name).get("context_window", 128000)
+    
+    @classmethod
+    def get_prompt_cache_min_tokens(cls, model_name: str) -> int:
+        # Anthropic only caches prefixes of at least this many tokens; other providers cache automatically
+        return cls.get_model_info(model_name).get("prompt_cache_min_tokens", 1024)
+    
+    @classmethod
+    def get_read_timeout(cls, model_name: str) -> float:
+        return cls.get_model_info(model_name).get("read_timeout_seconds", settings.HTTP_POOL_DEFAULT_READ_TIMEOUT)
+    
+    @classmethod
+    def get_connect_timeout(cls, model_name: str) -> float:
+        return cls.get_model_info(model_name).get("connect_timeout_seconds", settings.HTTP_POOL_CONNECT_TIMEOUT)
+    
+    @classmethod
+    def get_alternatives(cls, model_name: str) -> List[str]:
+        return cls.get_model_info(model_name).get("alternatives", [])
+    
+    @classmethod
+    def get_provider_concurrency(cls) -> Dict[str, int]:
+        return cls.PROVIDER_CONCURRENCY
+    
+    @classmethod
+    def get_routing_candidates(cls, category: str) -> List[str]:
+        return cls.ROUTING_CANDIDATES.get(category, [cls.FALLBACK_MODEL])
+    
+    @classmethod
+    def get_routing_policy(cls, plan_type: str) -> Dict[str, Any]:
+        return cls.ROUTING_POLICY.get(plan_type, cls.ROUTING_POLICY["free"])
+    
+    @classmethod
+    def get_hedging_policy(cls, plan_type: str) -> Dict[str, Any]:
+        return cls.HEDGING_POLICY.get(plan_type, {"enabled": False})
+    
     @classmethod
     def get_model_provider(cls, model_name: str) -> str:
         model_info = cls.get_model_info(model_name)
@@ -75,4 +209,9 @@ class ModelConfig:
     @classmethod
     def is_classification_model(cls, model_name: str) -> bool:
         model_info = cls.get_model_info(model_name)
-        return model_info.get("classification_model", False) 
\ No newline at end of file
+        return model_info.get("classification_model", False) 
+    
+    @classmethod
+    def is_premium(cls, model_name: str) -> bool:
+        # Answers may carry a routing label, e.g. "gpt-4o-mini (fallback)"
+        return cls.get_model_info(model_name.split(" (")[0]).get("premium", False)
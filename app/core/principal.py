@@ -0,0 +1,84 @@
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from app.core.config import settings
+from app.core.redis import get_redis, get_sync_redis
+from app.models.user import User, PlanType
+import logging
+
+logger = logging.getLogger(__name__)
+
+PRINCIPAL_CACHE_NAMESPACE = "principal"
+PRINCIPAL_INVALIDATION_CHANNEL = "principal:invalidate"
+
+# Called with the invalidated user ids so the current process can evict its local tier immediately
+_local_invalidation_hooks: List[Callable[[List[int]], None]] = []
+
+@dataclass
+class Principal:
+    """The authenticated user as seen by a request: identity, plan and session."""
+    id: int
+    email: str
+    plan_type: PlanType
+    session_id: Optional[str]
+    
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(
+            id=user.id,
+            email=user.email,
+            plan_type=user.plan_type,
+            session_id=user.session_id
+        )
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Principal":
+        return cls(**{**data, "plan_type": PlanType(data["plan_type"])})
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "email": self.email,
+            "plan_type": self.plan_type.value,
+            "session_id": self.session_id
+        }
+
+def principal_redis_key(user_id: int) -> str:
+    return f"cache:{PRINCIPAL_CACHE_NAMESPACE}:{user_id}"
+
+def add_local_invalidation_hook(hook: Callable[[List[int]], None]):
+    _local_invalidation_hooks.append(hook)
+
+def invalidate_principals_sync(user_ids: Iterable[int]):
+    """Drop cached principals from blocking code and tell every worker to evict them."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    for hook in _local_invalidation_hooks:
+        hook(user_ids)
+    if not settings.PRINCIPAL_CACHE_REDIS_ENABLED:
+        return
+    try:
+        client = get_sync_redis()
+        pipe = client.pipeline(transaction=False)
+        pipe.delete(*[principal_redis_key(user_id) for user_id in user_ids])
+        pipe.publish(PRINCIPAL_INVALIDATION_CHANNEL, ",".join(str(user_id) for user_id in user_ids))
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Failed to publish principal invalidation for users {user_ids}: {str(e)}")
+
+async def invalidate_principals(user_ids: Iterable[int]):
+    """Async counterpart of invalidate_principals_sync for code running on the event loop."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    for hook in _local_invalidation_hooks:
+        hook(user_ids)
+    if not settings.PRINCIPAL_CACHE_REDIS_ENABLED:
+        return
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.delete(*[principal_redis_key(user_id) for user_id in user_ids])
+        pipe.publish(PRINCIPAL_INVALIDATION_CHANNEL, ",".join(str(user_id) for user_id in user_ids))
+        await pipe.execute()
+    except Exception as e:
+        logger.warning(f"Failed to publish principal invalidation for users {user_ids}: {str(e)}")
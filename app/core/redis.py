@@ -0,0 +1,30 @@
+from typing import Optional
+import redis
+import redis.asyncio as aioredis
+from app.core.config import settings
+
+_redis_client: Optional[aioredis.Redis] = None
+_sync_redis_client: Optional[redis.Redis] = None
+
+def get_redis() -> aioredis.Redis:
+    """Return the process-wide async Redis client, creating it on first use."""
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = aioredis.from_url(settings.REDIS_URL)
+    return _redis_client
+
+def get_sync_redis() -> redis.Redis:
+    """Return the process-wide blocking Redis client for code running in sync endpoints and scripts."""
+    global _sync_redis_client
+    if _sync_redis_client is None:
+        _sync_redis_client = redis.Redis.from_url(settings.REDIS_URL)
+    return _sync_redis_client
+
+async def close_redis():
+    global _redis_client, _sync_redis_client
+    if _redis_client is not None:
+        await _redis_client.close()
+        _redis_client = None
+    if _sync_redis_client is not None:
+        _sync_redis_client.close()
+        _sync_redis_client = None
@@ -0,0 +1,134 @@
+"""
+Per-request stage timing for the AI query endpoints.
+
+ServerTimingMiddleware puts a RequestTimings in a context variable for each request under
+SERVER_TIMING_PATH_PREFIX. Code along the request path wraps its stages in span("name"), which
+is a no-op outside such a request, and the totals are sent back in a Server-Timing header:
+
+    Server-Timing: auth;dur=0.4, user;dur=0.2, ratelimit;dur=1.1, classify;dur=0.3, ...
+
+A REQUEST_TIMING_LOG_SAMPLE_RATE share of requests is also logged as one JSON line, and requests
+claimed by the admin profiler (app/services/request_profiler.py) are profiled.
+"""
+import json
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+from app.core.config import settings
+
+timing_logger = logging.getLogger("app.timing")
+
+class RequestTimings:
+    """Milliseconds spent per stage of one request, in the order the stages first ran."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.spans: Dict[str, float] = {}
+        self._open: Optional[Tuple[str, float]] = None
+
+    def add(self, name: str, seconds: float):
+        self.spans[name] = self.spans.get(name, 0.0) + seconds * 1000
+
+    def begin(self, name: str):
+        """Start a stage that ends when the next one begins or the response starts."""
+        self.end()
+        self._open = (name, time.perf_counter())
+
+    def end(self):
+        if self._open is not None:
+            name, started = self._open
+            self._open = None
+            self.add(name, time.perf_counter() - started)
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.start) * 1000
+
+    def header_value(self, total_ms: float) -> str:
+        entries = [f"{name};dur={duration:.1f}" for name, duration in self.spans.items()]
+        entries.append(f"total;dur={total_ms:.1f}")
+        return ", ".join(entries)
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+def current_timings() -> Optional[RequestTimings]:
+    return _current.get()
+
+@contextmanager
+def span(name: str):
+    """Add the block's duration to the current request's `name` stage."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
+
+def begin_span(name: str):
+    timings = _current.get()
+    if timings is not None:
+        timings.begin(name)
+
+class ServerTimingMiddleware:
+    """
+    Pure ASGI middleware, so the response body is passed through untouched and streaming
+    responses still stream; only the header list of http.response.start is extended.
+    """
+
+    def __init__(self, app, profiler=None):
+        self.app = app
+        self.profiler = profiler
+        self.path_prefix = settings.SERVER_TIMING_PATH_PREFIX
+        self.log_sample_rate = settings.REQUEST_TIMING_LOG_SAMPLE_RATE
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        profile = self.profiler.claim(scope["path"]) if self.profiler is not None else None
+        status_code = 500
+        header_total_ms = None
+
+        async def send_with_timing(message):
+            nonlocal status_code, header_total_ms
+            if message["type"] == "http.response.start":
+                # Whatever stage is still open (serialization) ends when the response starts
+                timings.end()
+                status_code = message["status"]
+                header_total_ms = timings.total_ms()
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (b"server-timing", timings.header_value(header_total_ms).encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            if profile is not None:
+                with profile:
+                    await self.app(scope, receive, send_with_timing)
+            else:
+                await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            total_ms = timings.total_ms()
+            if profile is not None:
+                profile.finish(status_code, total_ms, timings.spans)
+            if self.log_sample_rate > 0 and random.random() < self.log_sample_rate:
+                timing_logger.info(json.dumps({
+                    "event": "request_timing",
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status_code,
+                    # For streams the header only covers time to the first byte
+                    "header_ms": round(header_total_ms, 2) if header_total_ms is not None else None,
+                    "total_ms": round(total_ms, 2),
+                    "spans": {name: round(duration, 2) for name, duration in timings.spans.items()}
+                }))
@@ -1,13 +1,24 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi.openapi.utils import get_openapi
 import logging
 
-from app.api.v1.ai_router import router as ai_router
+from app.api.v1.ai_router import router as ai_router, query_log_writer
 from app.api.v1.auth_router import router as auth_router
+from app.api.v1.admin_router import router as admin_router
 from app.services.database_service import DatabaseService
+from app.services.ai_router_service import get_ai_router_service
 from app.core.config import settings
+from app.core.redis import close_redis
+from app.core.metrics import render_latest
+from app.core.request_timing import ServerTimingMiddleware
+from app.services.principal_cache import get_principal_cache
+from app.services.password_hasher import get_password_hasher
+from app.services.usage_counters import get_usage_counters
+from app.services.http_pool import get_http_pool
+from app.services.readiness import ReadinessProbe
+from app.services.request_profiler import get_request_profiler
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -77,8 +88,8 @@ def custom_openapi():
             if path.startswith("/api/v1/auth/register") or path.startswith("/api/v1/auth/login"):
                 continue
             
-            # Skip root and health endpoints
-            if path in ["/", "/health"]:
+            # Skip root, health, readiness and metrics endpoints
+            if path in ["/", "/health", "/ready", "/metrics"]:
                 continue
                 
             # Add security requirement to all other endpoints
@@ -93,6 +104,9 @@ def custom_openapi():
 
 app.openapi = custom_openapi
 
+if settings.SERVER_TIMING_ENABLED:
+    app.add_middleware(ServerTimingMiddleware, profiler=get_request_profiler())
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -101,15 +115,34 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+readiness_probe = ReadinessProbe(lambda: get_ai_router_service().provider_base_urls())
+
 @app.on_event("startup")
 async def startup_event():
     logger.info("Starting VexaCore AI application...")
-    if not DatabaseService.initialize_database():
+    if settings.DB_AUTO_INIT and not DatabaseService.initialize_database():
         logger.error("Failed to initialize database. Application may not function correctly.")
+    await get_principal_cache().start()
+    get_password_hasher().start()
+    await query_log_writer.start()
+    await get_usage_counters().start()
+    if settings.HTTP_POOL_WARMUP_ENABLED:
+        await get_ai_router_service().warm_up()
     logger.info("VexaCore AI application started successfully!")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await query_log_writer.stop()
+    await get_usage_counters().stop()
+    await get_ai_router_service().conversation_memory.stop()
+    await get_principal_cache().stop()
+    get_password_hasher().shutdown()
+    await get_http_pool().close()
+    await close_redis()
+
 app.include_router(auth_router)
 app.include_router(ai_router)
+app.include_router(admin_router)
 
 @app.get("/", summary="API Information", description="Get API information and available endpoints")
 async def root():
@@ -124,12 +157,16 @@ async def root():
         },
         "endpoints": {
             "ai_query": "/api/v1/ai/query",
+            "ai_query_stream": "/api/v1/ai/query/stream",
+            "ai_query_batch": "/api/v1/ai/query/batch",
             "models_info": "/api/v1/ai/models",
             "user_usage": "/api/v1/ai/usage/{user_id}",
+            "query_history": "/api/v1/ai/history",
             "register": "/api/v1/auth/register",
             "login": "/api/v1/auth/login",
             "logout": "/api/v1/auth/logout",
-            "me": "/api/v1/auth/me"
+            "me": "/api/v1/auth/me",
+            "admin_bulk_users": "/api/v1/admin/users/bulk"
         },
         "rate_limiting": {
             "free_users": "5 requests per minute",
@@ -139,7 +176,30 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "VexaCore AI"}
+    circuit_breakers = get_ai_router_service().circuit_breakers.snapshot()
+    degraded = any(state != "closed" for state in circuit_breakers["providers"].values())
+    return {
+        "status": "degraded" if degraded else "healthy",
+        "service": "VexaCore AI",
+        "circuit_breakers": circuit_breakers,
+        "query_log": query_log_writer.get_stats(),
+        "usage_counters": get_usage_counters().get_stats(),
+        "http_pool": get_http_pool().get_stats()
+    }
+
+@app.get("/ready")
+async def readiness_check():
+    ready, checks = await readiness_probe.check()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "not_ready", "checks": checks}
+    )
+
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", summary="Prometheus metrics", description="Latency histograms, token and cost counters and in-flight gauges in the Prometheus text format.")
+    async def metrics():
+        body, content_type = render_latest()
+        return Response(content=body, headers={"Content-Type": content_type})
 
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
@@ -1,5 +1,6 @@
 from app.models.user import User, PlanType
 from app.models.ai_query import AIQuery
+from app.models.usage_rollup import UserModelDailyUsage, ModelDailyUsage
 from app.core.database import Base
 
-__all__ = ["User", "PlanType", "AIQuery", "Base"] 
\ No newline at end of file
+__all__ = ["User", "PlanType", "AIQuery", "UserModelDailyUsage", "ModelDailyUsage", "Base"]
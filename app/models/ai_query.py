@@ -1,12 +1,22 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, DECIMAL, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, DECIMAL, Float, ForeignKey, Index
 from sqlalchemy.sql import func
 from app.core.database import Base
 
 class AIQuery(Base):
     __tablename__ = "ai_queries"
+    __table_args__ = (
+        # History reads filter on one of these and walk created_at; InnoDB appends the primary key
+        # to every secondary index, so each also serves the (created_at, id) keyset tiebreak
+        Index("ix_ai_queries_user_id_created_at", "user_id", "created_at"),
+        Index("ix_ai_queries_session_id_created_at", "session_id", "created_at"),
+        Index("ix_ai_queries_model_used_created_at", "model_used", "created_at"),
+        # Lets retention find the last expired id without scanning the table
+        Index("ix_ai_queries_created_at", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # Plain (user_id) index is (user_id, id) in InnoDB and backs the id-ordered `since` sync
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     session_id = Column(String(255), nullable=False)
     query_text = Column(Text, nullable=False)
     model_used = Column(String(50), nullable=False)
@@ -14,4 +24,8 @@ class AIQuery(Base):
     tokens_used = Column(Integer, default=0)
     cost_usd = Column(DECIMAL(8, 6), default=0.000000)
     processing_time = Column(Float, default=0)
-    created_at = Column(DateTime, default=func.now()) 
\ No newline at end of file
+    time_to_first_token = Column(Float, nullable=True)
+    created_at = Column(DateTime, default=func.now())
+    # When the row was written, which for write-behind and spool replay is later than created_at;
+    # the `since` sync holds back rows written in the last HISTORY_SYNC_LAG_SECONDS
+    inserted_at = Column(DateTime, nullable=True) 
\ No newline at end of file
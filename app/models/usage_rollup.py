@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, BigInteger, String, Date, DECIMAL, Float, ForeignKey
+from app.core.database import Base
+
+class UserModelDailyUsage(Base):
+    """Per user, per model, per UTC day totals of ai_queries, maintained as queries are logged."""
+    __tablename__ = "user_model_daily_usage"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    model_used = Column(String(50), primary_key=True)
+    usage_date = Column(Date, primary_key=True)
+    query_count = Column(Integer, nullable=False, default=0)
+    tokens_used = Column(BigInteger, nullable=False, default=0)
+    cost_usd = Column(DECIMAL(14, 6), nullable=False, default=0)
+    processing_time_sum = Column(Float, nullable=False, default=0)
+
+class ModelDailyUsage(Base):
+    """Per model, per UTC day totals of ai_queries across all users."""
+    __tablename__ = "model_daily_usage"
+    
+    model_used = Column(String(50), primary_key=True)
+    usage_date = Column(Date, primary_key=True)
+    query_count = Column(Integer, nullable=False, default=0)
+    tokens_used = Column(BigInteger, nullable=False, default=0)
+    cost_usd = Column(DECIMAL(14, 6), nullable=False, default=0)
+    processing_time_sum = Column(Float, nullable=False, default=0)
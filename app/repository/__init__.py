@@ -1,4 +1,8 @@
 from app.repository.user_repository import UserRepository
 from app.repository.ai_query_repository import AIQueryRepository
+from app.repository.async_user_repository import AsyncUserRepository
+from app.repository.async_ai_query_repository import AsyncAIQueryRepository
+from app.repository.usage_rollup_repository import UsageRollupRepository
+from app.repository.async_usage_rollup_repository import AsyncUsageRollupRepository
 
-__all__ = ["UserRepository", "AIQueryRepository"] 
\ No newline at end of file
+__all__ = ["UserRepository", "AIQueryRepository", "AsyncUserRepository", "AsyncAIQueryRepository", "UsageRollupRepository", "AsyncUsageRollupRepository"]
@@ -1,8 +1,15 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, and_, or_
 from app.models import AIQuery
-from typing import Optional, List, Dict, Any
+from app.repository.usage_rollup_repository import UsageRollupRepository
+from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime, timedelta
+import time
+
+def created_before(before: Tuple[datetime, int]):
+    """Keyset predicate for rows after `before` in (created_at DESC, id DESC) order."""
+    created_at, row_id = before
+    return or_(AIQuery.created_at < created_at, and_(AIQuery.created_at == created_at, AIQuery.id < row_id))
 
 class AIQueryRepository:
     
@@ -73,43 +80,79 @@ class AIQueryRepository:
             AIQuery.model_used == model_used
         ).order_by(AIQuery.created_at.desc()).all()
     
+    def _page_newest_first(self, query, before: Optional[Tuple[datetime, int]], limit: int) -> List[AIQuery]:
+        if before is not None:
+            query = query.filter(created_before(before))
+        return query.order_by(AIQuery.created_at.desc(), AIQuery.id.desc()).limit(limit).all()
+    
+    def get_by_session_id_page(
+        self, 
+        session_id: str, 
+        before: Optional[Tuple[datetime, int]] = None, 
+        limit: int = 50
+    ) -> List[AIQuery]:
+        return self._page_newest_first(
+            self.db.query(AIQuery).filter(AIQuery.session_id == session_id), before, limit
+        )
+    
+    def get_queries_by_model_page(
+        self, 
+        model_used: str, 
+        before: Optional[Tuple[datetime, int]] = None, 
+        limit: int = 50
+    ) -> List[AIQuery]:
+        return self._page_newest_first(
+            self.db.query(AIQuery).filter(AIQuery.model_used == model_used), before, limit
+        )
+    
+    def get_recent_queries_page(
+        self, 
+        hours: int = 24, 
+        before: Optional[Tuple[datetime, int]] = None, 
+        limit: int = 50
+    ) -> List[AIQuery]:
+        cutoff_time = datetime.utcnow() - timedelta(hours=hours)
+        return self._page_newest_first(
+            self.db.query(AIQuery).filter(AIQuery.created_at >= cutoff_time), before, limit
+        )
+    
+    def get_queries_by_date_range_page(
+        self, 
+        user_id: int, 
+        start_date: datetime, 
+        end_date: datetime, 
+        before: Optional[Tuple[datetime, int]] = None, 
+        limit: int = 50
+    ) -> List[AIQuery]:
+        return self._page_newest_first(
+            self.db.query(AIQuery).filter(
+                AIQuery.user_id == user_id,
+                AIQuery.created_at >= start_date,
+                AIQuery.created_at <= end_date
+            ),
+            before,
+            limit
+        )
+    
+    def get_distinct_query_texts(self, limit: int = 5000) -> List[str]:
+        rows = self.db.query(AIQuery.query_text).group_by(AIQuery.query_text).order_by(
+            func.max(AIQuery.id).desc()
+        ).limit(limit).all()
+        return [row.query_text for row in rows]
+    
     def get_model_usage_stats(self) -> Dict[str, Any]:
-        stats = self.db.query(
-            AIQuery.model_used,
-            func.count(AIQuery.id).label('total_queries'),
-            func.sum(AIQuery.tokens_used).label('total_tokens'),
-            func.sum(AIQuery.cost_usd).label('total_cost'),
-            func.avg(AIQuery.processing_time).label('avg_processing_time')
-        ).group_by(AIQuery.model_used).all()
-        
-        return {
-            'model_stats': [
-                {
-                    'model': stat.model_used,
-                    'total_queries': stat.total_queries,
-                    'total_tokens': int(stat.total_tokens) if stat.total_tokens else 0,
-                    'total_cost': float(stat.total_cost) if stat.total_cost else 0.0,
-                    'avg_processing_time': float(stat.avg_processing_time) if stat.avg_processing_time else 0.0
-                }
-                for stat in stats
-            ]
-        }
+        return UsageRollupRepository(self.db).get_model_stats()
     
     def get_user_usage_summary(self, user_id: int) -> Dict[str, Any]:
-        total_queries = self.get_total_queries_by_user(user_id)
-        total_cost = self.get_total_cost_by_user(user_id)
+        rollups = UsageRollupRepository(self.db)
+        totals = rollups.get_user_totals(user_id)
         
         recent_queries = self.get_by_user_id(user_id, limit=10)
         
-        model_breakdown = self.db.query(
-            AIQuery.model_used,
-            func.count(AIQuery.id).label('count')
-        ).filter(AIQuery.user_id == user_id).group_by(AIQuery.model_used).all()
-        
         return {
             'user_id': user_id,
-            'total_queries': total_queries,
-            'total_cost_usd': round(total_cost, 6),
+            'total_queries': totals['total_queries'],
+            'total_cost_usd': round(totals['total_cost'], 6),
             'recent_queries': [
                 {
                     'query': q.query_text[:100] + "..." if len(q.query_text) > 100 else q.query_text,
@@ -120,19 +163,47 @@ class AIQueryRepository:
                 }
                 for q in recent_queries
             ],
-            'model_breakdown': [
-                {
-                    'model': stat.model_used,
-                    'count': stat.count
-                }
-                for stat in model_breakdown
-            ]
+            'model_breakdown': rollups.get_user_model_breakdown(user_id)
         }
     
-    def cleanup_old_queries(self, days: int = 90) -> int:
-        cutoff_date = datetime.utcnow() - timedelta(days=days)
-        deleted = self.db.query(AIQuery).filter(
-            AIQuery.created_at < cutoff_date
-        ).delete()
+    def get_max_expired_id(self, cutoff: datetime) -> Optional[int]:
+        return self.db.query(func.max(AIQuery.id)).filter(AIQuery.created_at < cutoff).scalar()
+    
+    def get_expired_chunk(self, cutoff: datetime, after_id: int, max_id: int, limit: int) -> List[AIQuery]:
+        """Next `limit` expired rows in primary-key order, walking the range (after_id, max_id]."""
+        return self.db.query(AIQuery).filter(
+            AIQuery.id > after_id,
+            AIQuery.id <= max_id,
+            AIQuery.created_at < cutoff
+        ).order_by(AIQuery.id).limit(limit).all()
+    
+    def get_expired_ids(self, cutoff: datetime, after_id: int, max_id: int, limit: int) -> List[int]:
+        rows = self.db.query(AIQuery.id).filter(
+            AIQuery.id > after_id,
+            AIQuery.id <= max_id,
+            AIQuery.created_at < cutoff
+        ).order_by(AIQuery.id).limit(limit).all()
+        return [row.id for row in rows]
+    
+    def delete_by_ids(self, ids: List[int]) -> int:
+        if not ids:
+            return 0
+        deleted = self.db.query(AIQuery).filter(AIQuery.id.in_(ids)).delete(synchronize_session=False)
         self.db.commit()
+        return deleted
+    
+    def cleanup_old_queries(self, days: int = 90, chunk_size: int = 1000, pause_seconds: float = 0.0) -> int:
+        """Delete expired rows in bounded primary-key chunks, one short transaction each."""
+        cutoff_date = datetime.utcnow() - timedelta(days=days)
+        max_id = self.get_max_expired_id(cutoff_date)
+        deleted = 0
+        last_id = 0
+        while max_id is not None:
+            ids = self.get_expired_ids(cutoff_date, last_id, max_id, chunk_size)
+            if not ids:
+                break
+            deleted += self.delete_by_ids(ids)
+            last_id = ids[-1]
+            if pause_seconds:
+                time.sleep(pause_seconds)
         return deleted 
\ No newline at end of file
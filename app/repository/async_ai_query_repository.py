@@ -0,0 +1,141 @@
+from sqlalchemy import select, func, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import AIQuery
+from app.repository.ai_query_repository import created_before
+from app.repository.async_usage_rollup_repository import AsyncUsageRollupRepository
+from typing import Optional, List, Dict, Any, Tuple
+from datetime import datetime
+
+class AsyncAIQueryRepository:
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def get_by_id(self, query_id: int) -> Optional[AIQuery]:
+        result = await self.db.execute(select(AIQuery).where(AIQuery.id == query_id))
+        return result.scalars().first()
+    
+    async def get_by_user_id(self, user_id: int, limit: int = 10) -> List[AIQuery]:
+        result = await self.db.execute(
+            select(AIQuery)
+            .where(AIQuery.user_id == user_id)
+            .order_by(AIQuery.created_at.desc())
+            .limit(limit)
+        )
+        return list(result.scalars().all())
+    
+    def _history_filters(self, user_id: int, session_id: Optional[str], model_used: Optional[str]) -> list:
+        filters = [AIQuery.user_id == user_id]
+        if session_id is not None:
+            filters.append(AIQuery.session_id == session_id)
+        if model_used is not None:
+            filters.append(AIQuery.model_used == model_used)
+        return filters
+    
+    async def get_history_page(
+        self, 
+        user_id: int, 
+        session_id: Optional[str] = None, 
+        model_used: Optional[str] = None, 
+        before: Optional[Tuple[datetime, int]] = None, 
+        limit: int = 50
+    ) -> List[AIQuery]:
+        """Newest-first keyset page of a user's queries, continuing after `before` (created_at, id)."""
+        filters = self._history_filters(user_id, session_id, model_used)
+        if before is not None:
+            filters.append(created_before(before))
+        result = await self.db.execute(
+            select(AIQuery)
+            .where(*filters)
+            .order_by(AIQuery.created_at.desc(), AIQuery.id.desc())
+            .limit(limit)
+        )
+        return list(result.scalars().all())
+    
+    async def get_history_since(
+        self, 
+        user_id: int, 
+        after_id: int, 
+        session_id: Optional[str] = None, 
+        model_used: Optional[str] = None, 
+        limit: int = 50,
+        settled_before: Optional[datetime] = None
+    ) -> List[AIQuery]:
+        """Queries inserted after row `after_id`, oldest first, stopping at the first row
+        inserted at or after `settled_before`.
+        
+        Ordered by id rather than created_at: write-behind and spool replay can insert a row
+        whose created_at is older than rows already synced. Ids are not commit order either:
+        with concurrent writers, a transaction holding id 100 can commit after one holding 101.
+        Only rows inserted before `settled_before` (now minus the longest a write transaction
+        stays open) are returned, so every lower id is committed by the time a row is handed out.
+        """
+        filters = self._history_filters(user_id, session_id, model_used)
+        filters.append(AIQuery.id > after_id)
+        result = await self.db.execute(
+            select(AIQuery).where(*filters).order_by(AIQuery.id).limit(limit)
+        )
+        rows = list(result.scalars().all())
+        if settled_before is not None:
+            for index, row in enumerate(rows):
+                if row.inserted_at is not None and row.inserted_at >= settled_before:
+                    return rows[:index]
+        return rows
+    
+    async def create(self, ai_query: AIQuery) -> AIQuery:
+        ai_query.inserted_at = datetime.utcnow()
+        self.db.add(ai_query)
+        await self.db.commit()
+        await self.db.refresh(ai_query)
+        return ai_query
+    
+    async def bulk_insert(self, rows: List[Dict[str, Any]], commit: bool = True) -> int:
+        """Insert many ai_queries rows in one executemany statement without loading them back."""
+        if not rows:
+            return 0
+        inserted_at = datetime.utcnow()
+        await self.db.execute(insert(AIQuery), [{**row, "inserted_at": inserted_at} for row in rows])
+        if commit:
+            await self.db.commit()
+        return len(rows)
+    
+    async def get_total_queries_by_user(self, user_id: int) -> int:
+        result = await self.db.execute(
+            select(func.count(AIQuery.id)).where(AIQuery.user_id == user_id)
+        )
+        return result.scalar() or 0
+    
+    async def get_total_cost_by_user(self, user_id: int) -> float:
+        result = await self.db.execute(
+            select(func.sum(AIQuery.cost_usd)).where(AIQuery.user_id == user_id)
+        )
+        total = result.scalar()
+        return float(total) if total else 0.0
+    
+    async def get_model_usage_stats(self) -> Dict[str, Any]:
+        return await AsyncUsageRollupRepository(self.db).get_model_stats()
+    
+    async def get_user_usage_summary(self, user_id: int) -> Dict[str, Any]:
+        # Totals come from the daily rollups so this stays flat as a user's history grows
+        rollups = AsyncUsageRollupRepository(self.db)
+        totals = await rollups.get_user_totals(user_id)
+        model_breakdown = await rollups.get_user_model_breakdown(user_id)
+        
+        recent_queries = await self.get_by_user_id(user_id, limit=10)
+        
+        return {
+            'user_id': user_id,
+            'total_queries': totals['total_queries'],
+            'total_cost_usd': round(totals['total_cost'], 6),
+            'recent_queries': [
+                {
+                    'query': q.query_text[:100] + "..." if len(q.query_text) > 100 else q.query_text,
+                    'model_used': q.model_used,
+                    'tokens_used': q.tokens_used,
+                    'cost_usd': float(q.cost_usd),
+                    'created_at': q.created_at.isoformat()
+                }
+                for q in recent_queries
+            ],
+            'model_breakdown': model_breakdown
+        }
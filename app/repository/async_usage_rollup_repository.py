@@ -0,0 +1,38 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import UserModelDailyUsage, ModelDailyUsage
+from app.repository.usage_rollup_repository import (
+    aggregate_usage,
+    build_increment_statement,
+    user_totals_query,
+    user_model_breakdown_query,
+    model_stats_query,
+    format_model_stats
+)
+from typing import List, Dict, Any
+
+class AsyncUsageRollupRepository:
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def apply(self, rows: List[Dict[str, Any]], commit: bool = True):
+        """Add freshly logged ai_queries rows to the daily rollups with one upsert per table."""
+        user_rows, model_rows = aggregate_usage(rows)
+        if not user_rows:
+            return
+        dialect_name = self.db.bind.dialect.name
+        await self.db.execute(build_increment_statement(dialect_name, UserModelDailyUsage, ["user_id", "model_used", "usage_date"]), user_rows)
+        await self.db.execute(build_increment_statement(dialect_name, ModelDailyUsage, ["model_used", "usage_date"]), model_rows)
+        if commit:
+            await self.db.commit()
+    
+    async def get_user_totals(self, user_id: int) -> Dict[str, Any]:
+        totals = (await self.db.execute(user_totals_query(user_id))).one()
+        return {'total_queries': int(totals.total_queries), 'total_cost': float(totals.total_cost)}
+    
+    async def get_user_model_breakdown(self, user_id: int) -> List[Dict[str, Any]]:
+        result = await self.db.execute(user_model_breakdown_query(user_id))
+        return [{'model': stat.model_used, 'count': int(stat.count)} for stat in result.all()]
+    
+    async def get_model_stats(self) -> Dict[str, Any]:
+        return format_model_stats((await self.db.execute(model_stats_query())).all())
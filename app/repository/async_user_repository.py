@@ -0,0 +1,99 @@
+from sqlalchemy import select, update, insert, bindparam
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import User, PlanType
+from app.core.principal import invalidate_principals
+from typing import Any, Dict, Optional, List, Tuple
+
+class AsyncUserRepository:
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def get_by_id(self, user_id: int) -> Optional[User]:
+        result = await self.db.execute(select(User).where(User.id == user_id))
+        return result.scalars().first()
+    
+    async def get_by_id_and_session_id(self, user_id: int, session_id: str) -> Optional[User]:
+        result = await self.db.execute(
+            select(User).where(User.id == user_id, User.session_id == session_id)
+        )
+        return result.scalars().first()
+    
+    async def get_by_email(self, email: str) -> Optional[User]:
+        result = await self.db.execute(select(User).where(User.email == email))
+        return result.scalars().first()
+    
+    async def get_users_by_plan(self, plan_type: PlanType) -> List[User]:
+        result = await self.db.execute(select(User).where(User.plan_type == plan_type))
+        return list(result.scalars().all())
+    
+    async def create(self, user: User) -> User:
+        self.db.add(user)
+        await self.db.commit()
+        await self.db.refresh(user)
+        return user
+    
+    async def bulk_create(self, rows: List[Dict[str, Any]]) -> int:
+        """Insert many users in one executemany statement without loading them back."""
+        if not rows:
+            return 0
+        await self.db.execute(insert(User), rows)
+        await self.db.commit()
+        return len(rows)
+    
+    async def get_existing_emails(self, emails: List[str]) -> List[str]:
+        if not emails:
+            return []
+        result = await self.db.execute(select(User.email).where(User.email.in_(emails)))
+        return list(result.scalars().all())
+    
+    async def set_session_id(self, user_id: int, session_id: Optional[str]) -> bool:
+        result = await self.db.execute(
+            update(User)
+            .where(User.id == user_id)
+            .values(session_id=session_id)
+        )
+        await self.db.commit()
+        await invalidate_principals([user_id])
+        return result.rowcount > 0
+    
+    async def update(self, user: User) -> User:
+        await self.db.commit()
+        await self.db.refresh(user)
+        return user
+    
+    async def increment_daily_query_count(self, user_id: int, amount: int = 1) -> bool:
+        result = await self.db.execute(
+            update(User)
+            .where(User.id == user_id)
+            .values(daily_query_count=User.daily_query_count + amount)
+        )
+        await self.db.commit()
+        return result.rowcount > 0
+    
+    async def increment_daily_premium_count(self, user_id: int) -> bool:
+        result = await self.db.execute(
+            update(User)
+            .where(User.id == user_id)
+            .values(daily_premium_count=User.daily_premium_count + 1)
+        )
+        await self.db.commit()
+        return result.rowcount > 0
+    
+    async def set_daily_counts(self, counts: Dict[int, Tuple[int, int]], commit: bool = True) -> int:
+        """Overwrite (daily_query_count, daily_premium_count) for many users with one executemany UPDATE."""
+        if not counts:
+            return 0
+        users = User.__table__
+        await self.db.execute(
+            update(users)
+            .where(users.c.id == bindparam("user_id"))
+            .values(daily_query_count=bindparam("queries"), daily_premium_count=bindparam("premium")),
+            [
+                {"user_id": user_id, "queries": queries, "premium": premium}
+                for user_id, (queries, premium) in counts.items()
+            ]
+        )
+        if commit:
+            await self.db.commit()
+        return len(counts)
@@ -0,0 +1,148 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, delete, insert, select, literal, Date
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from app.models import AIQuery, UserModelDailyUsage, ModelDailyUsage
+from typing import Optional, List, Dict, Any, Iterable, Tuple
+from datetime import date, datetime, time, timedelta
+
+SUM_COLUMNS = ("query_count", "tokens_used", "cost_usd", "processing_time_sum")
+
+def aggregate_usage(rows: Iterable[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Fold ai_queries rows into (user, model, day) and (model, day) increments."""
+    per_user: Dict[tuple, list] = {}
+    per_model: Dict[tuple, list] = {}
+    for row in rows:
+        usage_date = row["created_at"].date()
+        for totals in (
+            per_user.setdefault((row["user_id"], row["model_used"], usage_date), [0, 0, 0.0, 0.0]),
+            per_model.setdefault((row["model_used"], usage_date), [0, 0, 0.0, 0.0])
+        ):
+            totals[0] += 1
+            totals[1] += row["tokens_used"] or 0
+            totals[2] += row["cost_usd"] or 0.0
+            totals[3] += row["processing_time"] or 0.0
+    
+    def as_rows(bucket, key_names):
+        return [
+            {**dict(zip(key_names, key)), **dict(zip(SUM_COLUMNS, (count, tokens, round(cost, 6), seconds)))}
+            for key, (count, tokens, cost, seconds) in bucket.items()
+        ]
+    
+    return (
+        as_rows(per_user, ("user_id", "model_used", "usage_date")),
+        as_rows(per_model, ("model_used", "usage_date"))
+    )
+
+def build_increment_statement(dialect_name: str, model, key_columns: List[str]):
+    """INSERT that adds to the sums of an existing rollup row instead of failing on its key."""
+    table = model.__table__
+    if dialect_name == "mysql":
+        stmt = mysql.insert(table)
+        return stmt.on_duplicate_key_update({column: table.c[column] + stmt.inserted[column] for column in SUM_COLUMNS})
+    if dialect_name in ("sqlite", "postgresql"):
+        stmt = (sqlite if dialect_name == "sqlite" else postgresql).insert(table)
+        return stmt.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={column: table.c[column] + stmt.excluded[column] for column in SUM_COLUMNS}
+        )
+    raise ValueError(f"Usage rollups do not support the '{dialect_name}' dialect")
+
+def user_totals_query(user_id: int):
+    return select(
+        func.coalesce(func.sum(UserModelDailyUsage.query_count), 0).label('total_queries'),
+        func.coalesce(func.sum(UserModelDailyUsage.cost_usd), 0).label('total_cost')
+    ).where(UserModelDailyUsage.user_id == user_id)
+
+def user_model_breakdown_query(user_id: int):
+    return select(
+        UserModelDailyUsage.model_used,
+        func.sum(UserModelDailyUsage.query_count).label('count')
+    ).where(UserModelDailyUsage.user_id == user_id).group_by(UserModelDailyUsage.model_used)
+
+def model_stats_query():
+    return select(
+        ModelDailyUsage.model_used,
+        func.sum(ModelDailyUsage.query_count).label('total_queries'),
+        func.sum(ModelDailyUsage.tokens_used).label('total_tokens'),
+        func.sum(ModelDailyUsage.cost_usd).label('total_cost'),
+        func.sum(ModelDailyUsage.processing_time_sum).label('processing_time_sum')
+    ).group_by(ModelDailyUsage.model_used)
+
+def format_model_stats(stats) -> Dict[str, Any]:
+    return {
+        'model_stats': [
+            {
+                'model': stat.model_used,
+                'total_queries': int(stat.total_queries or 0),
+                'total_tokens': int(stat.total_tokens) if stat.total_tokens else 0,
+                'total_cost': float(stat.total_cost) if stat.total_cost else 0.0,
+                'avg_processing_time': float(stat.processing_time_sum) / stat.total_queries if stat.total_queries else 0.0
+            }
+            for stat in stats
+        ]
+    }
+
+class UsageRollupRepository:
+    
+    def __init__(self, db: Session):
+        self.db = db
+    
+    def apply(self, rows: List[Dict[str, Any]], commit: bool = True):
+        user_rows, model_rows = aggregate_usage(rows)
+        if not user_rows:
+            return
+        dialect_name = self.db.get_bind().dialect.name
+        self.db.execute(build_increment_statement(dialect_name, UserModelDailyUsage, ["user_id", "model_used", "usage_date"]), user_rows)
+        self.db.execute(build_increment_statement(dialect_name, ModelDailyUsage, ["model_used", "usage_date"]), model_rows)
+        if commit:
+            self.db.commit()
+    
+    def get_query_date_range(self) -> Tuple[Optional[date], Optional[date]]:
+        first, last = self.db.query(func.min(AIQuery.created_at), func.max(AIQuery.created_at)).one()
+        return (first.date() if first else None, last.date() if last else None)
+    
+    def rebuild_day(self, usage_date: date) -> int:
+        """Recompute one day of both rollups from ai_queries in a single transaction."""
+        start = datetime.combine(usage_date, time.min)
+        end = start + timedelta(days=1)
+        in_day = (AIQuery.created_at >= start, AIQuery.created_at < end)
+        sums = (
+            func.count(AIQuery.id),
+            func.coalesce(func.sum(AIQuery.tokens_used), 0),
+            func.coalesce(func.sum(AIQuery.cost_usd), 0),
+            func.coalesce(func.sum(AIQuery.processing_time), 0)
+        )
+        
+        self.db.execute(delete(UserModelDailyUsage).where(UserModelDailyUsage.usage_date == usage_date))
+        self.db.execute(delete(ModelDailyUsage).where(ModelDailyUsage.usage_date == usage_date))
+        result = self.db.execute(
+            insert(UserModelDailyUsage).from_select(
+                ["user_id", "model_used", "usage_date", *SUM_COLUMNS],
+                select(AIQuery.user_id, AIQuery.model_used, literal(usage_date, Date), *sums)
+                .where(*in_day)
+                .group_by(AIQuery.user_id, AIQuery.model_used)
+            )
+        )
+        self.db.execute(
+            insert(ModelDailyUsage).from_select(
+                ["model_used", "usage_date", *SUM_COLUMNS],
+                select(AIQuery.model_used, literal(usage_date, Date), *sums)
+                .where(*in_day)
+                .group_by(AIQuery.model_used)
+            )
+        )
+        self.db.commit()
+        return result.rowcount
+    
+    def get_user_totals(self, user_id: int) -> Dict[str, Any]:
+        totals = self.db.execute(user_totals_query(user_id)).one()
+        return {'total_queries': int(totals.total_queries), 'total_cost': float(totals.total_cost)}
+    
+    def get_user_model_breakdown(self, user_id: int) -> List[Dict[str, Any]]:
+        return [
+            {'model': stat.model_used, 'count': int(stat.count)}
+            for stat in self.db.execute(user_model_breakdown_query(user_id)).all()
+        ]
+    
+    def get_model_stats(self) -> Dict[str, Any]:
+        return format_model_stats(self.db.execute(model_stats_query()).all())
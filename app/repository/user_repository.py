@@ -1,5 +1,6 @@
 from sqlalchemy.orm import Session
 from app.models import User, PlanType
+from app.core.principal import invalidate_principals_sync
 from typing import Optional, List
 
 class UserRepository:
@@ -35,6 +36,7 @@ class UserRepository:
         if user:
             self.db.delete(user)
             self.db.commit()
+            invalidate_principals_sync([user_id])
             return True
         return False
     
@@ -43,6 +45,7 @@ class UserRepository:
         if user:
             user.session_id = session_id
             self.db.commit()
+            invalidate_principals_sync([user_id])
             return True
         return False
     
@@ -51,6 +54,7 @@ class UserRepository:
         if user:
             user.session_id = None
             self.db.commit()
+            invalidate_principals_sync([user_id])
             return True
         return False
     
@@ -98,5 +102,6 @@ class UserRepository:
         if user:
             user.plan_type = plan_type
             self.db.commit()
+            invalidate_principals_sync([user_id])
             return True
         return False 
\ No newline at end of file
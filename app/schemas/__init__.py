@@ -1,5 +1,6 @@
-from app.schemas.query import QueryRequest, QueryResponse
-from app.schemas.user import UserResponse
-from app.schemas.ai_query import AIQueryResponse
+from app.schemas.query import QueryRequest, QueryResponse, BatchQueryRequest, BatchQueryItem, BatchQueryResponse
+from app.schemas.user import UserResponse, BulkUserCreateRequest, BulkUserCreateResponse
+from app.schemas.ai_query import AIQueryResponse, QueryHistoryPage
+from app.schemas.profiling import ProfilingRequest
 
-__all__ = ["QueryRequest", "QueryResponse", "UserResponse", "AIQueryResponse"] 
\ No newline at end of file
+__all__ = ["QueryRequest", "QueryResponse", "BatchQueryRequest", "BatchQueryItem", "BatchQueryResponse", "UserResponse", "BulkUserCreateRequest", "BulkUserCreateResponse", "AIQueryResponse", "QueryHistoryPage", "ProfilingRequest"] 
\ No newline at end of file
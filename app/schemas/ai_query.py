@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 class AIQueryResponse(BaseModel):
@@ -12,7 +12,13 @@ class AIQueryResponse(BaseModel):
     tokens_used: int
     cost_usd: float
     processing_time: float
+    time_to_first_token: Optional[float] = None
     created_at: datetime
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True 
+
+class QueryHistoryPage(BaseModel):
+    items: List[AIQueryResponse]
+    next_cursor: Optional[str] = None
+    has_more: bool = False
@@ -0,0 +1,9 @@
+from pydantic import BaseModel, Field
+from typing import Literal
+from app.core.config import settings
+
+class ProfilingRequest(BaseModel):
+    requests: int = Field(1, ge=1, le=settings.PROFILING_MAX_REQUESTS, description="Number of upcoming requests to profile on this worker")
+    mode: Literal["cprofile", "sample"] = Field("cprofile", description="Deterministic cProfile, or a low-overhead statistical stack sampler")
+    memory: bool = Field(False, description="Also diff tracemalloc snapshots taken before and after each request")
+    path_prefix: str = Field("", description="Only profile requests whose path starts with this prefix")
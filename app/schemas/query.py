@@ -1,9 +1,12 @@
 from pydantic import BaseModel, Field
+from typing import Annotated, List, Optional
+from app.core.config import settings
 
 class QueryRequest(BaseModel):
     query: str = Field(..., min_length=1, max_length=5000, description="User query text")
     user_id: int = Field(..., gt=0, description="User ID")
     session_id: str = Field(..., min_length=1, max_length=255, description="Session identifier")
+    use_history: bool = Field(default=True, description="Send earlier turns of this session as context")
 
 class QueryResponse(BaseModel):
     response: str = Field(..., description="AI generated response")
@@ -12,4 +15,30 @@ class QueryResponse(BaseModel):
     cost_usd: float = Field(..., ge=0, description="Cost in USD")
     processing_time: float = Field(..., ge=0, description="Processing time in seconds")
     session_id: str = Field(..., description="Session identifier")
-    remaining_queries: int = Field(..., ge=0, description="Remaining queries for the user") 
\ No newline at end of file
+    remaining_queries: int = Field(..., ge=0, description="Remaining queries for the user")
+    cached: bool = Field(False, description="Whether the response was served from the response cache") 
+
+class BatchQueryRequest(BaseModel):
+    queries: List[Annotated[str, Field(min_length=1, max_length=5000)]] = Field(
+        ..., min_length=1, max_length=settings.BATCH_MAX_QUERIES, description="Query texts, answered in order"
+    )
+    user_id: int = Field(..., gt=0, description="User ID")
+    session_id: str = Field(..., min_length=1, max_length=255, description="Session identifier")
+
+class BatchQueryItem(BaseModel):
+    index: int = Field(..., ge=0, description="Position of the query in the request")
+    success: bool = Field(..., description="Whether this query was answered")
+    response: Optional[str] = Field(None, description="AI generated response")
+    model_used: Optional[str] = Field(None, description="Model that was used for generation")
+    tokens_used: int = Field(0, ge=0, description="Number of tokens used")
+    cost_usd: float = Field(0.0, ge=0, description="Cost in USD")
+    processing_time: float = Field(0.0, ge=0, description="Processing time in seconds")
+    cached: bool = Field(False, description="Whether the response was served from the response cache")
+    error: Optional[str] = Field(None, description="Why this query failed")
+
+class BatchQueryResponse(BaseModel):
+    session_id: str = Field(..., description="Session identifier")
+    results: List[BatchQueryItem] = Field(..., description="One result per query, in request order")
+    succeeded: int = Field(..., ge=0, description="Number of answered queries")
+    failed: int = Field(..., ge=0, description="Number of failed queries")
+    remaining_queries: int = Field(..., ge=0, description="Remaining queries for the user")
@@ -1,7 +1,8 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 from app.models.user import PlanType
-from typing import Optional
+from typing import List, Optional
+from app.core.config import settings
 
 class UserResponse(BaseModel):
     id: int
@@ -41,4 +42,11 @@ class PlanUpdateRequest(BaseModel):
 class PlanUpdateResponse(BaseModel):
     message: str
     user_id: int
-    new_plan_type: PlanType 
\ No newline at end of file
+    new_plan_type: PlanType 
+
+class BulkUserCreateRequest(BaseModel):
+    users: List[UserRegisterRequest] = Field(..., min_length=1, max_length=settings.ADMIN_BULK_MAX_USERS)
+
+class BulkUserCreateResponse(BaseModel):
+    created: int
+    skipped_emails: List[str]
@@ -0,0 +1,162 @@
+import json
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+from app.core.config import settings
+from app.core.metrics import ROUTING_DECISIONS
+from app.core.models_config import ModelConfig
+
+decision_logger = logging.getLogger("app.routing")
+
+@dataclass
+class ModelPerformance:
+    """Exponentially weighted averages of one model's recent calls."""
+    latency_seconds: Optional[float] = None
+    error_rate: float = 0.0
+    cost_per_1k_tokens: Optional[float] = None
+    samples: int = 0
+    updated_at: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "latency_seconds": round(self.latency_seconds, 4) if self.latency_seconds is not None else None,
+            "error_rate": round(self.error_rate, 4),
+            "cost_per_1k_tokens": round(self.cost_per_1k_tokens, 6) if self.cost_per_1k_tokens is not None else None,
+            "samples": self.samples,
+            "age_seconds": round(time.monotonic() - self.updated_at, 1)
+        }
+
+class ModelPerformanceTracker:
+    """
+    Per-model EWMA latency, error rate and realized cost per 1k tokens from live calls.
+    Primaries abandoned for a winning hedge count with the time they had run, not as errors.
+
+    Stats are per worker. A model with fewer than ROUTING_MIN_SAMPLES calls, or none in the
+    last ROUTING_STATS_STALE_SECONDS, has no usable stats and is treated as healthy, so a model
+    routed away from gets traffic again once its bad numbers have aged out.
+    """
+
+    def __init__(self):
+        self.alpha = settings.ROUTING_EWMA_ALPHA
+        self.min_samples = settings.ROUTING_MIN_SAMPLES
+        self.stale_seconds = settings.ROUTING_STATS_STALE_SECONDS
+        self._models: Dict[str, ModelPerformance] = {}
+
+    def _ewma(self, previous: Optional[float], value: float) -> float:
+        return value if previous is None else previous + self.alpha * (value - previous)
+
+    def record(self, model: str, ok: bool, latency: Optional[float] = None, tokens: int = 0, cost_usd: float = 0.0):
+        stats = self._models.get(model)
+        now = time.monotonic()
+        if stats is None or now - stats.updated_at > self.stale_seconds:
+            stats = self._models[model] = ModelPerformance()
+        stats.error_rate = self._ewma(stats.error_rate if stats.samples else None, 0.0 if ok else 1.0)
+        if ok and latency is not None:
+            stats.latency_seconds = self._ewma(stats.latency_seconds, latency)
+        if ok and tokens > 0:
+            stats.cost_per_1k_tokens = self._ewma(stats.cost_per_1k_tokens, cost_usd / tokens * 1000)
+        stats.samples += 1
+        stats.updated_at = now
+
+    def get(self, model: str) -> Optional[ModelPerformance]:
+        stats = self._models.get(model)
+        if stats is None or stats.samples < self.min_samples or time.monotonic() - stats.updated_at > self.stale_seconds:
+            return None
+        return stats
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {model: stats.to_dict() for model, stats in self._models.items()}
+
+@dataclass
+class RoutingDecision:
+    model: str
+    category: str
+    plan: str
+    reason: str
+    candidates: List[Dict[str, Any]] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "event": "routing_decision",
+            "plan": self.plan,
+            "category": self.category,
+            "model": self.model,
+            "reason": self.reason,
+            "candidates": self.candidates
+        }
+
+class AdaptiveRouter:
+    """
+    Picks a model for a query category from ModelConfig.ROUTING_CANDIDATES.
+
+    The first candidate, in preference order, that is available and meets the plan's
+    ROUTING_POLICY (latency SLO, error budget, cost ceiling) wins. When none meets every
+    target, the fastest affordable available candidate is used instead. Decisions that
+    passed over the preferred model are always logged to app.routing; the rest are sampled.
+    """
+
+    def __init__(self, is_available: Callable[[str], bool]):
+        self.enabled = settings.ADAPTIVE_ROUTING_ENABLED
+        self.log_sample_rate = settings.ROUTING_DECISION_LOG_SAMPLE_RATE
+        self.is_available = is_available
+        self.performance = ModelPerformanceTracker()
+
+    def _evaluate(self, model: str, policy: Dict[str, Any]) -> Dict[str, Any]:
+        stats = self.performance.get(model)
+        cost = stats.cost_per_1k_tokens if stats is not None and stats.cost_per_1k_tokens is not None else ModelConfig.get_model_cost(model)
+        candidate = {
+            "model": model,
+            "latency_seconds": round(stats.latency_seconds, 4) if stats is not None and stats.latency_seconds is not None else None,
+            "error_rate": round(stats.error_rate, 4) if stats is not None else None,
+            "cost_per_1k_tokens": round(cost, 6),
+            "available": self.is_available(model),
+            "skip": None
+        }
+        ceiling = policy.get("max_cost_per_1k_tokens")
+        if not candidate["available"]:
+            candidate["skip"] = "circuit_open"
+        elif ceiling is not None and cost > ceiling:
+            candidate["skip"] = "cost_ceiling"
+        elif stats is not None and stats.error_rate > policy["max_error_rate"]:
+            candidate["skip"] = "error_rate"
+        elif stats is not None and stats.latency_seconds is not None and stats.latency_seconds > policy["latency_slo_seconds"]:
+            candidate["skip"] = "latency_slo"
+        return candidate
+
+    def choose(self, category: str, plan: str) -> RoutingDecision:
+        names = ModelConfig.get_routing_candidates(category)
+        if not self.enabled:
+            return RoutingDecision(model=names[0], category=category, plan=plan, reason="static")
+
+        policy = ModelConfig.get_routing_policy(plan)
+        candidates = [self._evaluate(model, policy) for model in names]
+        chosen = next((candidate for candidate in candidates if candidate["skip"] is None), None)
+        if chosen is not None:
+            reason = "preferred" if chosen is candidates[0] else "policy"
+        else:
+            # Nothing meets every target: prefer affordable over fast, and unknown latency last
+            usable = [candidate for candidate in candidates if candidate["available"]] or candidates
+            affordable = [candidate for candidate in usable if candidate["skip"] != "cost_ceiling"] or usable
+            chosen = min(affordable, key=lambda candidate: (
+                candidate["latency_seconds"] is None,
+                candidate["latency_seconds"] or 0.0
+            ))
+            reason = "best_effort"
+
+        decision = RoutingDecision(model=chosen["model"], category=category, plan=plan, reason=reason, candidates=candidates)
+        ROUTING_DECISIONS.labels(category, decision.model, reason).inc()
+        if reason != "preferred" or (self.log_sample_rate > 0 and random.random() < self.log_sample_rate):
+            decision_logger.info(json.dumps(decision.to_dict()))
+        return decision
+
+    def record(self, model: str, ok: bool, latency: Optional[float] = None, tokens: int = 0, cost_usd: float = 0.0):
+        self.performance.record(model, ok, latency, tokens, cost_usd)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "policy": ModelConfig.ROUTING_POLICY,
+            "models": self.performance.get_stats()
+        }
@@ -1,13 +1,31 @@
-from typing import Optional
-from sqlalchemy.orm import Session
+from typing import Dict, List, Optional, Union
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.services.base_ai_service import BaseAIService, AIResponse
+from app.services.completion_stream import CompletionStream
+from app.services.conversation_memory import ConversationContext, ConversationMemory
 from app.services.openai_service import OpenAIService
 from app.services.claude_service import ClaudeService
+from app.services.classification_cache import ClassificationCache
+from app.services.response_cache import ResponseCache
+from app.services.latency_tracker import LatencyTracker
+from app.services.circuit_breaker import CircuitBreakerRegistry, CircuitOpenError
+from app.services.single_flight import SingleFlight
+from app.services.adaptive_router import AdaptiveRouter
+from app.services.http_pool import get_http_pool
+from app.services.token_estimator import PromptTooLargeError, get_token_estimator
+from app.services.query_log_writer import QueryLogWriter
+from app.services.usage_counters import get_usage_counters
 from app.models import User, AIQuery, PlanType
-from app.repository import UserRepository, AIQueryRepository
+from app.repository import AsyncUserRepository, AsyncAIQueryRepository, AsyncUsageRollupRepository
 from app.core.config import settings
 from app.core.models_config import ModelConfig
+from app.core.request_timing import span
+from app.core.metrics import CLASSIFICATION_SECONDS, FALLBACKS, PROVIDER_IN_FLIGHT, PROVIDER_SECONDS, observe_seconds, record_usage
+from app.utils import exact_fingerprint, query_fingerprint
+import asyncio
+import dataclasses
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -19,92 +37,464 @@ class AIRouterService:
             organization=settings.OPENAI_ORGANIZATION
         )
         self.claude_service = ClaudeService(api_key=settings.ANTHROPIC_API_KEY)
+        self.classification_cache = ClassificationCache()
+        self.response_cache = ResponseCache()
+        self.latency_tracker = LatencyTracker()
+        self.circuit_breakers = CircuitBreakerRegistry()
+        self.adaptive_router = AdaptiveRouter(self.circuit_breakers.is_available)
+        self.provider_flights = SingleFlight("provider")
+        self.classification_flights = SingleFlight("classify")
+        self.conversation_memory = ConversationMemory(summarizer=self.summarize_conversation)
+        self.provider_semaphores = {
+            provider: asyncio.Semaphore(limit)
+            for provider, limit in ModelConfig.get_provider_concurrency().items()
+        }
     
-    async def select_model(self, query: str, user_plan: PlanType) -> tuple[str, BaseAIService]:
-        complexity = self.openai_service.get_query_complexity(query)
-        is_code, is_creative = await self.openai_service.classify_query_type(query)
+    def provider_base_urls(self) -> Dict[str, str]:
+        return {
+            "openai": str(self.openai_service.client.base_url),
+            "anthropic": str(self.claude_service.client.base_url)
+        }
+    
+    async def warm_up(self):
+        """Open provider connections ahead of the first request."""
+        await get_http_pool().warm_up(self.provider_base_urls().values())
+    
+    def get_service(self, model: str) -> BaseAIService:
+        if ModelConfig.get_model_provider(model) == "Anthropic":
+            return self.claude_service
+        return self.openai_service
+    
+    def route_around_open_circuits(self, model: str) -> str:
+        """Return the model, or its first alternative whose circuit is not open."""
+        if self.circuit_breakers.is_available(model):
+            return model
+        for alternative in ModelConfig.get_alternatives(model):
+            if self.circuit_breakers.is_available(alternative):
+                logger.info(f"Circuit open for {model}, routing to {alternative}")
+                return alternative
+        return model
+    
+    async def classify_query(self, query: str) -> tuple[bool, bool]:
+        with observe_seconds(CLASSIFICATION_SECONDS, mode="single"):
+            return await self._classify_query(query)
+    
+    async def _classify_query(self, query: str) -> tuple[bool, bool]:
+        cached = await self.classification_cache.get(query)
+        if cached is not None:
+            return cached
+        
+        allow_llm = self.circuit_breakers.is_available(ModelConfig.CLASSIFIER_MODEL)
+        classification, _ = await self.classification_flights.do(
+            query_fingerprint(query, "classify", str(allow_llm)),
+            lambda: self.openai_service.classify_query_type(query, allow_llm=allow_llm),
+            encode=list,
+            decode=tuple
+        )
+        if allow_llm:
+            await self.classification_cache.set(query, classification)
+        return classification
+    
+    async def classify_queries(self, queries: List[str]) -> List[tuple[bool, bool]]:
+        """Classify a batch: cache hits are reused, misses go to the classifier together."""
+        with observe_seconds(CLASSIFICATION_SECONDS, mode="batch"):
+            return await self._classify_queries(queries)
+    
+    async def _classify_queries(self, queries: List[str]) -> List[tuple[bool, bool]]:
+        cached = await asyncio.gather(*(self.classification_cache.get(query) for query in queries))
+        misses = [index for index, classification in enumerate(cached) if classification is None]
+        if not misses:
+            return list(cached)
         
+        allow_llm = self.circuit_breakers.is_available(ModelConfig.CLASSIFIER_MODEL)
+        classifications = await self.openai_service.classify_query_types(
+            [queries[index] for index in misses], allow_llm=allow_llm
+        )
+        results = list(cached)
+        for index, classification in zip(misses, classifications):
+            results[index] = classification
+            if allow_llm:
+                await self.classification_cache.set(queries[index], classification)
+        return results
+    
+    def query_category(self, query: str, is_code: bool, is_creative: bool) -> str:
+        """Key into ModelConfig.ROUTING_CANDIDATES"""
         if is_code:
-            return "gpt-4o", self.openai_service
-        elif is_creative:
-            return "claude-3-5-sonnet-20241022", self.claude_service
-        elif complexity == "simple":
-            return "gpt-4o-mini", self.openai_service
-        elif complexity == "complex":
-            return "claude-3-5-sonnet-20241022", self.claude_service
-        else:
-            return "gpt-4o-mini", self.openai_service
+            return "code"
+        if is_creative:
+            return "creative"
+        return self.openai_service.get_query_complexity(query)
+    
+    def choose_model(self, query: str, is_code: bool, is_creative: bool, user_plan: PlanType) -> str:
+        decision = self.adaptive_router.choose(self.query_category(query, is_code, is_creative), user_plan.value)
+        return self.route_around_open_circuits(decision.model)
+    
+    def plan_max_tokens(self, query: str, model: str, context: Optional[ConversationContext] = None) -> int:
+        """
+        Generation cap for this query on this model, from the model's per-complexity policy
+        Raises PromptTooLargeError when the prompt leaves no room for a useful completion
+        """
+        prompt_tokens = get_token_estimator().count_prompt(query, model)
+        if context is not None:
+            prompt_tokens += context.token_count()
+        context_window = ModelConfig.get_context_window(model)
+        available = context_window - prompt_tokens
+        if available < ModelConfig.MIN_COMPLETION_TOKENS:
+            raise PromptTooLargeError(model, prompt_tokens, context_window)
+        complexity = self.openai_service.get_query_complexity(query)
+        return min(ModelConfig.get_max_tokens(model, complexity), available)
+    
+    async def select_model(self, query: str, user_plan: PlanType) -> tuple[str, BaseAIService]:
+        await self.circuit_breakers.sync()
+        with span("classify"):
+            is_code, is_creative = await self.classify_query(query)
+        model = self.choose_model(query, is_code, is_creative, user_plan)
+        return model, self.get_service(model)
     
     async def execute_query(
-        self, 
-        query: str, 
-        user_id: int, 
-        session_id: str, 
-        db: Session
+        self,
+        query: str,
+        user_plan: PlanType,
+        context: Optional[ConversationContext] = None
     ) -> AIResponse:
+        primary_model, primary_service = await self.select_model(query, user_plan)
+        with span("completion"):
+            return await self._execute_selected(query, primary_model, primary_service, user_plan, context)
+    
+    async def execute_batch(self, queries: List[str], user_plan: PlanType) -> List[Union[AIResponse, Exception]]:
+        """
+        Run many queries with the same routing as execute_query
+        Classification is batched and completions run concurrently under per-provider
+        semaphores. Results come back in input order; failures are returned, not raised.
+        """
+        await self.circuit_breakers.sync()
+        with span("classify"):
+            classifications = await self.classify_queries(queries)
         
-        user_repo = UserRepository(db)
-        user = user_repo.get_by_id(user_id)
-        if not user:
-            raise ValueError("User not found")
+        async def run(query: str, is_code: bool, is_creative: bool) -> AIResponse:
+            model = self.choose_model(query, is_code, is_creative, user_plan)
+            async with self.provider_semaphores[ModelConfig.get_model_provider(model)]:
+                return await self._execute_selected(query, model, self.get_service(model), user_plan)
         
-        primary_model, primary_service = await self.select_model(query, user.plan_type)
+        # One span for the whole fan-out: the completions overlap, so their sum is not wall time
+        with span("completion"):
+            return await asyncio.gather(
+                *(run(query, is_code, is_creative) for query, (is_code, is_creative) in zip(queries, classifications)),
+                return_exceptions=True
+            )
+    
+    async def _execute_selected(
+        self,
+        query: str,
+        primary_model: str,
+        primary_service: BaseAIService,
+        user_plan: PlanType,
+        context: Optional[ConversationContext] = None
+    ) -> AIResponse:
+        # An answer that depends on earlier turns is not reusable for the same query text
+        use_cache = self.response_cache.is_enabled_for(user_plan) and (context is None or context.is_empty)
+        if use_cache:
+            cached_response = await self.response_cache.get(query, primary_model)
+            if cached_response:
+                return cached_response
         
+        response = await self._query_with_fallback(query, primary_model, primary_service, user_plan, context)
+        if use_cache and response.model_used == primary_model:
+            await self.response_cache.set(query, primary_model, response)
+        return response
+    
+    async def _call_model(
+        self,
+        model: str,
+        service: BaseAIService,
+        query: str,
+        context: Optional[ConversationContext] = None
+    ) -> AIResponse:
+        """
+        Call the provider, sharing one in-flight call between identical concurrent queries.
+        Callers that did not make the call get a copy with zero tokens and cost, so each
+        still logs its own ai_queries row without double counting spend.
+        """
+        key_parts = [query, model]
+        if context is not None and not context.is_empty:
+            key_parts.append(context.fingerprint())
+        response, shared = await self.provider_flights.do(
+            exact_fingerprint(*key_parts),
+            lambda: self._call_provider(model, service, query, context),
+            encode=dataclasses.asdict,
+            decode=lambda value: AIResponse(**value)
+        )
+        if shared:
+            return dataclasses.replace(response, tokens_used=0, cost_usd=0.0, cache_read_tokens=0, cache_write_tokens=0)
+        return dataclasses.replace(response)
+    
+    async def _call_provider(
+        self,
+        model: str,
+        service: BaseAIService,
+        query: str,
+        context: Optional[ConversationContext] = None,
+        max_tokens: Optional[int] = None
+    ) -> AIResponse:
+        max_tokens = max_tokens or self.plan_max_tokens(query, model, context)
+        if not self.circuit_breakers.allow_request(model):
+            raise CircuitOpenError(f"Circuit open for {model}")
+        
+        in_flight = PROVIDER_IN_FLIGHT.labels(ModelConfig.get_model_provider(model))
+        in_flight.inc()
+        start_time = time.perf_counter()
+        try:
+            response = await service.query(query, model, max_tokens=max_tokens, context=context)
+        except asyncio.CancelledError:
+            PROVIDER_SECONDS.labels(model, "completion", "cancelled").observe(time.perf_counter() - start_time)
+            self.circuit_breakers.release(model)
+            raise
+        except Exception:
+            latency = time.perf_counter() - start_time
+            PROVIDER_SECONDS.labels(model, "completion", "error").observe(latency)
+            self.adaptive_router.record(model, False)
+            await self.circuit_breakers.record(model, False, latency)
+            raise
+        finally:
+            in_flight.dec()
+        
+        latency = time.perf_counter() - start_time
+        PROVIDER_SECONDS.labels(model, "completion", "success").observe(latency)
+        self.adaptive_router.record(model, True, latency, response.tokens_used, response.cost_usd)
+        self.latency_tracker.record(model, latency)
+        await self.circuit_breakers.record(model, True, latency)
+        return response
+    
+    def get_hedge_delay(self, model: str, user_plan: PlanType) -> Optional[float]:
+        """Seconds to wait on the primary before also starting the fallback, or None to never hedge."""
+        policy = ModelConfig.get_hedging_policy(user_plan.value)
+        if not settings.HEDGING_ENABLED or not policy.get("enabled") or model == ModelConfig.FALLBACK_MODEL:
+            return None
+        
+        threshold = ModelConfig.get_model_info(model).get("hedge_after_seconds")
+        if settings.HEDGE_USE_OBSERVED_P95:
+            observed_p95 = self.latency_tracker.percentile(model, 0.95, settings.HEDGE_MIN_SAMPLES)
+            if observed_p95 is not None:
+                threshold = observed_p95
+        if threshold is None:
+            return None
+        return threshold * policy.get("threshold_multiplier", 1.0)
+    
+    async def _query_with_fallback(
+        self,
+        query: str,
+        primary_model: str,
+        primary_service: BaseAIService,
+        user_plan: PlanType,
+        context: Optional[ConversationContext] = None
+    ) -> AIResponse:
+        """
+        Run the primary model, falling back to GPT-4o-mini if it fails.
+        
+        With hedging, a primary still running after the hedge delay gets the fallback
+        started alongside it; the first successful answer wins and the other is cancelled.
+        """
+        fallback_model = self.route_around_open_circuits(ModelConfig.FALLBACK_MODEL)
+        fallback_service = self.get_service(fallback_model)
+        primary_started = time.perf_counter()
+        running = {asyncio.ensure_future(self._call_model(primary_model, primary_service, query, context)): None}
+        fallback_started = False
+        timeout = self.get_hedge_delay(primary_model, user_plan)
+        
+        try:
+            while running:
+                done, _ = await asyncio.wait(running.keys(), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                timeout = None
+                
+                if not done:
+                    logger.info(f"Primary model {primary_model} is slow, hedging with {fallback_model}")
+                    FALLBACKS.labels("hedge").inc()
+                    hedge_task = asyncio.ensure_future(self._call_model(fallback_model, fallback_service, query, context))
+                    running[hedge_task] = "hedge"
+                    fallback_started = True
+                    continue
+                
+                for task in done:
+                    label = running.pop(task)
+                    if task.exception() is None:
+                        response = task.result()
+                        if label:
+                            response.model_used = f"{response.model_used} ({label})"
+                        return response
+                    
+                    if label is None and isinstance(task.exception(), PromptTooLargeError):
+                        # The fallback has no larger context, so there is nothing to retry
+                        raise task.exception()
+                    if label is None:
+                        logger.warning(f"Primary model {primary_model} failed: {str(task.exception())}")
+                    else:
+                        logger.error(f"Fallback model also failed: {str(task.exception())}")
+                
+                if not fallback_started:
+                    logger.info(f"Trying fallback to {fallback_model}")
+                    FALLBACKS.labels("fallback").inc()
+                    fallback_task = asyncio.ensure_future(self._call_model(fallback_model, fallback_service, query, context))
+                    running[fallback_task] = "fallback"
+                    fallback_started = True
+        finally:
+            for task, label in running.items():
+                if label is None and fallback_started and not task.done():
+                    self._record_censored_latency(primary_model, time.perf_counter() - primary_started)
+                task.cancel()
+        
+        raise Exception("All AI models are currently unavailable")
+    
+    def _record_censored_latency(self, model: str, seconds: float):
+        """
+        Record a primary abandoned after hedging as taking `seconds`, a lower bound on its latency.
+        Without it only the calls that beat their hedge are measured, so the observed p95 and the
+        routing EWMA would drift down exactly when the model is slow, and the latency SLO could
+        never trip while hedging is on.
+        """
+        self.latency_tracker.record(model, seconds)
+        self.adaptive_router.record(model, True, seconds)
+    
+    async def _start_stream(
+        self,
+        query: str,
+        model: str,
+        service: BaseAIService,
+        model_used: str,
+        context: Optional[ConversationContext] = None
+    ) -> CompletionStream:
+        max_tokens = self.plan_max_tokens(query, model, context)
+        if not self.circuit_breakers.allow_request(model):
+            raise CircuitOpenError(f"Circuit open for {model}")
+        
+        # The stream counts as in flight until CompletionStream finishes or is closed
+        in_flight = PROVIDER_IN_FLIGHT.labels(ModelConfig.get_model_provider(model))
+        in_flight.inc()
+        start_time = time.perf_counter()
+        deltas = service.stream(query, model, max_tokens=max_tokens, context=context)
         try:
-            if isinstance(primary_service, OpenAIService):
-                if primary_model == "gpt-4o-mini":
-                    response = await primary_service.query_gpt4o_mini(query)
-                else:
-                    response = await primary_service.query_gpt4o(query)
-            else:
-                response = await primary_service.query_sonnet(query)
-            
-            return response
-            
-        except Exception as e:
-            logger.warning(f"Primary model {primary_model} failed: {str(e)}")
-            
+            first_delta = await deltas.__anext__()
+        except asyncio.CancelledError:
+            in_flight.dec()
+            PROVIDER_SECONDS.labels(model, "stream", "cancelled").observe(time.perf_counter() - start_time)
+            self.circuit_breakers.release(model)
+            raise
+        except StopAsyncIteration:
+            in_flight.dec()
+            latency = time.perf_counter() - start_time
+            PROVIDER_SECONDS.labels(model, "stream", "error").observe(latency)
+            self.adaptive_router.record(model, False)
+            await self.circuit_breakers.record(model, False, latency)
+            raise Exception(f"Model {model} returned an empty stream")
+        except Exception:
+            in_flight.dec()
+            latency = time.perf_counter() - start_time
+            PROVIDER_SECONDS.labels(model, "stream", "error").observe(latency)
+            self.adaptive_router.record(model, False)
+            await self.circuit_breakers.record(model, False, latency)
+            await deltas.aclose()
+            raise
+        time_to_first_token = time.perf_counter() - start_time
+        PROVIDER_SECONDS.labels(model, "stream", "success").observe(time_to_first_token)
+        # Time to first token is not comparable with a full completion, so only the outcome counts
+        self.adaptive_router.record(model, True)
+        await self.circuit_breakers.record(model, True, time_to_first_token)
+        return CompletionStream(
+            model_used=model_used,
+            first_delta=first_delta,
+            deltas=deltas,
+            start_time=start_time,
+            time_to_first_token=time_to_first_token,
+            on_finish=in_flight.dec
+        )
+    
+    async def open_stream(
+        self,
+        query: str,
+        user_plan: PlanType,
+        context: Optional[ConversationContext] = None
+    ) -> CompletionStream:
+        """
+        Select a model and start streaming from it
+        Falls back to GPT-4o-mini (or its alternative) only if the primary fails before its first token
+        """
+        primary_model, primary_service = await self.select_model(query, user_plan)
+        # For a stream the completion stage ends at the first token
+        with span("completion"):
             try:
-                logger.info("Trying fallback to GPT-4o-mini")
-                fallback_response = await self.openai_service.query_gpt4o_mini(query)
-                fallback_response.model_used = f"{fallback_response.model_used} (fallback)"
-                return fallback_response
+                return await self._start_stream(query, primary_model, primary_service, primary_model, context)
+            except PromptTooLargeError:
+                raise
+            except Exception as e:
+                logger.warning(f"Primary model {primary_model} failed before first token: {str(e)}")
                 
-            except Exception as fallback_error:
-                logger.error(f"Fallback model also failed: {str(fallback_error)}")
-                raise Exception("All AI models are currently unavailable")
+                try:
+                    fallback_model = self.route_around_open_circuits(ModelConfig.FALLBACK_MODEL)
+                    logger.info(f"Trying fallback stream from {fallback_model}")
+                    FALLBACKS.labels("stream_fallback").inc()
+                    return await self._start_stream(
+                        query, fallback_model, self.get_service(fallback_model), f"{fallback_model} (fallback)", context
+                    )
+                except Exception as fallback_error:
+                    logger.error(f"Fallback model also failed: {str(fallback_error)}")
+                    raise Exception("All AI models are currently unavailable")
+    
+    async def summarize_conversation(self, summary: Optional[str], turns: List[dict]) -> str:
+        """
+        Fold turns that left the conversation window into the running summary.
+        Runs like any completion (circuit breaker, provider semaphore, latency and outcome
+        tracking); its spend is counted under purpose="summary" as it has no ai_queries row.
+        """
+        model = ModelConfig.SUMMARY_MODEL
+        transcript = "\n\n".join(f"User: {turn['user']}\nAssistant: {turn['assistant']}" for turn in turns)
+        prompt = f"""Update the summary of a conversation with the turns below.
+Keep facts, decisions, names, code identifiers and open questions that later turns may refer to.
+Respond with ONLY the updated summary, in at most {settings.CONVERSATION_SUMMARY_MAX_TOKENS // 2} words.
+
+Current summary:
+{summary or "(none)"}
+
+New turns:
+{transcript}
+
+Updated summary:"""
+        async with self.provider_semaphores[ModelConfig.get_model_provider(model)]:
+            response = await self._call_provider(
+                model, self.get_service(model), prompt, max_tokens=settings.CONVERSATION_SUMMARY_MAX_TOKENS
+            )
+        record_usage(model, response.tokens_used, response.cost_usd, purpose="summary")
+        return response.response.strip()
     
-    def save_query_to_db(
+    async def save_query_to_db(
         self, 
-        db: Session, 
+        db: AsyncSession, 
         user_id: int, 
         session_id: str, 
         query_text: str, 
         ai_response: AIResponse
     ) -> AIQuery:
         
-        ai_query_repo = AIQueryRepository(db)
-        
-        db_query = AIQuery(
-            user_id=user_id,
-            session_id=session_id,
-            query_text=query_text,
-            model_used=ai_response.model_used,
-            response=ai_response.response,
-            tokens_used=ai_response.tokens_used,
-            cost_usd=ai_response.cost_usd,
-            processing_time=ai_response.processing_time
-        )
-        
-        return ai_query_repo.create(db_query)
+        row = QueryLogWriter.build_row(user_id, session_id, query_text, ai_response)
+        await AsyncUsageRollupRepository(db).apply([row], commit=False)
+        return await AsyncAIQueryRepository(db).create(AIQuery(**row))
     
-    def get_remaining_queries(self, db: Session, user_id: int) -> int:
-        user_repo = UserRepository(db)
-        user = user_repo.get_by_id(user_id)
+    async def get_remaining_queries(self, db: AsyncSession, user_id: int) -> int:
+        user_repo = AsyncUserRepository(db)
+        user = await user_repo.get_by_id(user_id)
         if not user:
             return 0
-        
-        if user.plan_type == PlanType.FREE:
-            return max(0, settings.FREE_USER_RATE_LIMIT - user.daily_query_count)
+        usage = await get_usage_counters().get(user_id)
+        return self.remaining_queries_for(user.plan_type, usage.queries if usage else 0)
+    
+    def remaining_queries_for(self, plan_type: PlanType, daily_query_count: int) -> int:
+        if plan_type == PlanType.FREE:
+            return max(0, settings.FREE_USER_RATE_LIMIT - daily_query_count)
         else:
-            return 999999 
\ No newline at end of file
+            return 999999 
+
+_ai_router_service: Optional[AIRouterService] = None
+
+def get_ai_router_service() -> AIRouterService:
+    global _ai_router_service
+    if _ai_router_service is None:
+        _ai_router_service = AIRouterService()
+    return _ai_router_service
@@ -1,5 +1,17 @@
+import asyncio
+import re
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
+from typing import AsyncIterator, List, Optional
+from app.core.config import settings
+from app.services.conversation_memory import ConversationContext
+from app.services.query_classifier import LABELS, get_local_classifier
+
+# Queries per batch classification prompt, and characters of each query shown to the classifier
+BATCH_CLASSIFICATION_SIZE = 20
+BATCH_CLASSIFICATION_QUERY_CHARS = 500
+
+BATCH_LABEL_PATTERN = re.compile(r'^\s*(\d+)\s*[:.)\-]\s*"?(code|creative|general)', re.IGNORECASE | re.MULTILINE)
 
 @dataclass
 class AIResponse:
@@ -8,6 +20,18 @@ class AIResponse:
     model_used: str
     cost_usd: float
     processing_time: float
+    cached: bool = False
+    time_to_first_token: Optional[float] = None
+    # Part of tokens_used read from or written to the provider's prompt cache, priced differently
+    cache_read_tokens: int = 0
+    cache_write_tokens: int = 0
+
+@dataclass
+class StreamDelta:
+    text: str
+    tokens_used: Optional[int] = None
+    cache_read_tokens: int = 0
+    cache_write_tokens: int = 0
 
 class BaseAIService(ABC):
     
@@ -17,19 +41,58 @@ class BaseAIService(ABC):
         self.cost_per_1k_tokens = 0.0
     
     @abstractmethod
-    async def query(self, prompt: str) -> AIResponse:
+    async def query(
+        self,
+        prompt: str,
+        model: str,
+        max_tokens: Optional[int] = None,
+        context: Optional[ConversationContext] = None
+    ) -> AIResponse:
         pass
     
+    async def stream(
+        self,
+        prompt: str,
+        model: str,
+        max_tokens: Optional[int] = None,
+        context: Optional[ConversationContext] = None
+    ) -> AsyncIterator[StreamDelta]:
+        """
+        Yield text deltas as the provider produces them
+        A final delta may carry provider-reported tokens_used
+        """
+        response = await self.query(prompt, model, max_tokens=max_tokens, context=context)
+        yield StreamDelta(text=response.response, tokens_used=response.tokens_used)
+    
     def calculate_cost(self, tokens_used: int) -> float:
         return (tokens_used / 1000) * self.cost_per_1k_tokens
     
-    async def classify_query_type(self, query: str) -> tuple[bool, bool]:
+    async def classify_query_type(self, query: str, allow_llm: bool = True) -> tuple[bool, bool]:
         """
-        Use AI to classify if a query is code-related or creative writing
+        Classify if a query is code-related or creative writing
         Returns: (is_code, is_creative)
+        
+        The local classifier answers when it is confident enough; only uncertain
+        queries escalate to the LLM classifier, and only when allow_llm is set.
         """
+        local_result = get_local_classifier().classify(query)
+        if (
+            not allow_llm
+            or not settings.QUERY_CLASSIFIER_LLM_ESCALATION
+            or local_result.confidence >= settings.QUERY_CLASSIFIER_CONFIDENCE_THRESHOLD
+        ):
+            return local_result.as_flags()
+        
         try:
-            prompt = f"""Analyze the following query and classify it into one of three categories:
+            label = await self.classify_with_llm(query)
+            return label == "code", label == "creative"
+        except Exception as e:
+            # Fall back to the local result if AI classification fails
+            return local_result.as_flags()
+    
+    async def classify_with_llm(self, query: str) -> str:
+        """Ask the lightweight model for a label: "code", "creative" or "general"."""
+        prompt = f"""Analyze the following query and classify it into one of three categories:
 
 Query: "{query}"
 
@@ -47,18 +110,67 @@ Examples:
 - "Explain quantum physics" → general
 
 Response:"""
-            
-            response = await self.query_lightweight(prompt)
-            result = response.response.strip().lower()
-            
-            is_code = result == "code"
-            is_creative = result == "creative"
-            
-            return is_code, is_creative
-            
-        except Exception as e:
-            # Fallback to keyword-based detection if AI classification fails
-            return self._fallback_classification(query)
+        
+        response = await self.query_lightweight(prompt)
+        result = response.response.strip().strip('"').lower()
+        return result if result in LABELS else "general"
+    
+    async def classify_query_types(self, queries: List[str], allow_llm: bool = True) -> List[tuple[bool, bool]]:
+        """
+        Classify many queries at once
+        Uncertain queries are escalated together, BATCH_CLASSIFICATION_SIZE per LLM call
+        """
+        classifier = get_local_classifier()
+        local_results = [classifier.classify(query) for query in queries]
+        results = [local_result.as_flags() for local_result in local_results]
+        if not allow_llm or not settings.QUERY_CLASSIFIER_LLM_ESCALATION:
+            return results
+        
+        uncertain = [
+            index for index, local_result in enumerate(local_results)
+            if local_result.confidence < settings.QUERY_CLASSIFIER_CONFIDENCE_THRESHOLD
+        ]
+        chunks = [
+            uncertain[start:start + BATCH_CLASSIFICATION_SIZE]
+            for start in range(0, len(uncertain), BATCH_CLASSIFICATION_SIZE)
+        ]
+        chunk_labels = await asyncio.gather(
+            *(self.classify_batch_with_llm([queries[index] for index in chunk]) for chunk in chunks),
+            return_exceptions=True
+        )
+        for chunk, labels in zip(chunks, chunk_labels):
+            if isinstance(labels, Exception):
+                continue
+            for index, label in zip(chunk, labels):
+                if label:
+                    results[index] = (label == "code", label == "creative")
+        return results
+    
+    async def classify_batch_with_llm(self, queries: List[str]) -> List[Optional[str]]:
+        """Label several queries in one lightweight-model call; None where the answer was unparseable."""
+        numbered = "\n".join(
+            f'{number}. "{query[:BATCH_CLASSIFICATION_QUERY_CHARS]}"'
+            for number, query in enumerate(queries, start=1)
+        )
+        prompt = f"""Classify each of the following queries into one of three categories:
+- "code" - programming, coding, software development, algorithms, APIs, databases, technical implementation
+- "creative" - creative writing, storytelling, poems, fiction, artistic expression, creative content
+- "general" - general topics, factual information, or anything that doesn't fit the above
+
+Queries:
+{numbered}
+
+Respond with ONLY one line per query in the form "<number>: <category>".
+
+Response:"""
+        
+        response = await self.query_lightweight(prompt)
+        labels: List[Optional[str]] = [None] * len(queries)
+        for match in BATCH_LABEL_PATTERN.finditer(response.response):
+            number = int(match.group(1))
+            if 1 <= number <= len(queries):
+                labels[number - 1] = match.group(2).lower()
+        return labels
     
     async def query_lightweight(self, prompt: str) -> AIResponse:
         """
@@ -66,31 +178,11 @@ Response:"""
         This should be implemented by subclasses
         """
         # Default implementation - subclasses should override
-        return await self.query(prompt)
+        return await self.query(prompt, self.model_name)
     
     def _fallback_classification(self, query: str) -> tuple[bool, bool]:
-        """Fallback keyword-based classification"""
-        query_lower = query.lower()
-        
-        code_keywords = [
-            'code', 'programming', 'function', 'class', 'method', 'algorithm',
-            'debug', 'error', 'bug', 'syntax', 'compile', 'runtime', 'api',
-            'database', 'sql', 'javascript', 'python', 'java', 'c++', 'html',
-            'css', 'react', 'node', 'docker', 'git', 'deploy', 'server',
-            'client', 'frontend', 'backend', 'framework', 'library'
-        ]
-        
-        creative_keywords = [
-            'story', 'poem', 'creative', 'fiction', 'narrative', 'character',
-            'plot', 'scene', 'dialogue', 'description', 'imagine', 'write',
-            'compose', 'artistic', 'expressive', 'emotional', 'metaphor',
-            'simile', 'rhyme', 'verse', 'prose', 'novel', 'short story'
-        ]
-        
-        is_code = any(keyword in query_lower for keyword in code_keywords)
-        is_creative = any(keyword in query_lower for keyword in creative_keywords)
-        
-        return is_code, is_creative
+        """Fallback in-process classification"""
+        return get_local_classifier().classify(query).as_flags()
     
     async def is_code_query(self, query: str) -> bool:
         is_code, _ = await self.classify_query_type(query)
@@ -0,0 +1,229 @@
+import enum
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+from app.core.config import settings
+from app.core.models_config import ModelConfig
+from app.core.redis import get_redis
+import logging
+
+logger = logging.getLogger(__name__)
+
+class CircuitState(str, enum.Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+class CircuitOpenError(Exception):
+    pass
+
+class CircuitBreaker:
+    """
+    Rolling-window breaker over call outcomes.
+    
+    Opens when, over the last `window_seconds`, at least `min_calls` calls were seen and
+    either the error rate or the slow-call rate crossed its threshold. After
+    `open_seconds` it lets `half_open_max_calls` probes through: all succeeding closes
+    the circuit, any failure opens it again.
+    """
+    
+    def __init__(self, name: str):
+        self.name = name
+        self.window_seconds = settings.CIRCUIT_BREAKER_WINDOW_SECONDS
+        self.min_calls = settings.CIRCUIT_BREAKER_MIN_CALLS
+        self.error_rate_threshold = settings.CIRCUIT_BREAKER_ERROR_RATE
+        self.slow_call_seconds = settings.CIRCUIT_BREAKER_SLOW_CALL_SECONDS
+        self.slow_call_rate_threshold = settings.CIRCUIT_BREAKER_SLOW_CALL_RATE
+        self.open_seconds = settings.CIRCUIT_BREAKER_OPEN_SECONDS
+        self.half_open_max_calls = settings.CIRCUIT_BREAKER_HALF_OPEN_MAX_CALLS
+        
+        self.state = CircuitState.CLOSED
+        self.opened_until = 0.0
+        self._calls: Deque[Tuple[float, bool, bool]] = deque()
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+    
+    def _prune(self, now: float):
+        cutoff = now - self.window_seconds
+        while self._calls and self._calls[0][0] < cutoff:
+            self._calls.popleft()
+    
+    def _open(self, open_seconds: Optional[float] = None):
+        self.state = CircuitState.OPEN
+        self.opened_until = time.monotonic() + (open_seconds or self.open_seconds)
+        self._calls.clear()
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+    
+    def _close(self):
+        self.state = CircuitState.CLOSED
+        self._calls.clear()
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+    
+    def is_available(self) -> bool:
+        """Whether a call could be let through right now, without reserving a probe."""
+        if self.state == CircuitState.OPEN:
+            return time.monotonic() >= self.opened_until
+        if self.state == CircuitState.HALF_OPEN:
+            return self._probes_in_flight < self.half_open_max_calls
+        return True
+    
+    def allow_request(self) -> bool:
+        if self.state == CircuitState.OPEN:
+            if time.monotonic() < self.opened_until:
+                return False
+            self.state = CircuitState.HALF_OPEN
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+        if self.state == CircuitState.HALF_OPEN:
+            if self._probes_in_flight >= self.half_open_max_calls:
+                return False
+            self._probes_in_flight += 1
+        return True
+    
+    def release(self):
+        """Give back a probe slot for a call that was cancelled before it finished."""
+        if self.state == CircuitState.HALF_OPEN and self._probes_in_flight > 0:
+            self._probes_in_flight -= 1
+    
+    def record(self, success: bool, latency: float) -> bool:
+        """Record a finished call. Returns True if this call opened the circuit."""
+        if self.state == CircuitState.HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+            if not success:
+                self._open()
+                return True
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_max_calls:
+                self._close()
+            return False
+        
+        if self.state == CircuitState.OPEN:
+            return False
+        
+        now = time.monotonic()
+        self._calls.append((now, success, latency >= self.slow_call_seconds))
+        self._prune(now)
+        
+        total = len(self._calls)
+        if total < self.min_calls:
+            return False
+        error_rate = sum(1 for _, ok, _ in self._calls if not ok) / total
+        slow_rate = sum(1 for _, _, slow in self._calls if slow) / total
+        if error_rate >= self.error_rate_threshold or slow_rate >= self.slow_call_rate_threshold:
+            logger.warning(
+                f"Opening circuit '{self.name}' (error rate {error_rate:.2f}, slow rate {slow_rate:.2f} over {total} calls)"
+            )
+            self._open()
+            return True
+        return False
+    
+    def force_open(self, remaining_seconds: float):
+        """Adopt an open state published by another worker."""
+        if self.state != CircuitState.OPEN or self.opened_until < time.monotonic() + remaining_seconds:
+            self._open(remaining_seconds)
+    
+    def snapshot(self) -> Dict:
+        now = time.monotonic()
+        self._prune(now)
+        total = len(self._calls)
+        return {
+            "state": self.state.value,
+            "open_for_seconds": round(max(0.0, self.opened_until - now), 2) if self.state == CircuitState.OPEN else 0.0,
+            "window_calls": total,
+            "window_error_rate": round(sum(1 for _, ok, _ in self._calls if not ok) / total, 4) if total else 0.0,
+            "window_slow_rate": round(sum(1 for _, _, slow in self._calls if slow) / total, 4) if total else 0.0
+        }
+
+class CircuitBreakerRegistry:
+    """
+    One breaker per model. A provider counts as down when every one of its models that
+    has a breaker is open, which is how a provider-wide outage shows up.
+    
+    When a breaker opens, its deadline is written to Redis so other workers adopt the
+    open state on their next sync (at most every CIRCUIT_BREAKER_SYNC_INTERVAL seconds).
+    """
+    
+    def __init__(self):
+        self.enabled = settings.CIRCUIT_BREAKER_ENABLED
+        self.shared = settings.CIRCUIT_BREAKER_SHARED
+        self.sync_interval = settings.CIRCUIT_BREAKER_SYNC_INTERVAL
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._last_sync = 0.0
+    
+    def get(self, model: str) -> CircuitBreaker:
+        breaker = self._breakers.get(model)
+        if breaker is None:
+            breaker = self._breakers[model] = CircuitBreaker(model)
+        return breaker
+    
+    def is_available(self, model: str) -> bool:
+        if not self.enabled:
+            return True
+        return self.get(model).is_available()
+    
+    def allow_request(self, model: str) -> bool:
+        if not self.enabled:
+            return True
+        return self.get(model).allow_request()
+    
+    def release(self, model: str):
+        if self.enabled:
+            self.get(model).release()
+    
+    async def record(self, model: str, success: bool, latency: float):
+        if not self.enabled:
+            return
+        breaker = self.get(model)
+        if breaker.record(success, latency) and self.shared:
+            await self._publish_open(breaker)
+    
+    async def _publish_open(self, breaker: CircuitBreaker):
+        try:
+            await get_redis().set(
+                f"circuit:{breaker.name}",
+                time.time() + breaker.open_seconds,
+                px=int(breaker.open_seconds * 1000)
+            )
+        except Exception as e:
+            logger.warning(f"Could not share open circuit '{breaker.name}': {str(e)}")
+    
+    async def sync(self):
+        """Adopt circuits opened by other workers. Cheap to call often; runs one MGET per interval."""
+        if not (self.enabled and self.shared):
+            return
+        now = time.monotonic()
+        if now - self._last_sync < self.sync_interval:
+            return
+        self._last_sync = now
+        
+        names = list(ModelConfig.get_all_models())
+        try:
+            values = await get_redis().mget([f"circuit:{name}" for name in names])
+        except Exception as e:
+            logger.warning(f"Could not sync circuit breaker state: {str(e)}")
+            return
+        
+        wall_now = time.time()
+        for name, value in zip(names, values):
+            if value is not None:
+                remaining = float(value) - wall_now
+                if remaining > 0:
+                    self.get(name).force_open(remaining)
+    
+    def snapshot(self) -> Dict[str, Dict]:
+        models = {name: breaker.snapshot() for name, breaker in sorted(self._breakers.items())}
+        providers = {}
+        for name, state in models.items():
+            provider = ModelConfig.get_model_provider(name) or "unknown"
+            providers.setdefault(provider, []).append(state["state"])
+        return {
+            "models": models,
+            "providers": {
+                provider: "open" if all(s == CircuitState.OPEN.value for s in states)
+                else "degraded" if any(s != CircuitState.CLOSED.value for s in states)
+                else "closed"
+                for provider, states in providers.items()
+            }
+        }
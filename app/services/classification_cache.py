@@ -0,0 +1,32 @@
+from typing import Optional, Tuple
+from app.core.config import settings
+from app.services.two_tier_cache import TwoTierCache
+from app.utils import query_fingerprint
+
+class ClassificationCache:
+    """Caches (is_code, is_creative) per normalized query so repeats skip the classifier."""
+    
+    def __init__(self):
+        self.enabled = settings.CLASSIFICATION_CACHE_ENABLED
+        self.cache = TwoTierCache(
+            namespace="classify",
+            ttl=settings.CLASSIFICATION_CACHE_TTL,
+            max_entries=settings.CLASSIFICATION_CACHE_MAX_ENTRIES,
+            max_bytes=settings.CLASSIFICATION_CACHE_MAX_BYTES,
+            redis_enabled=settings.CLASSIFICATION_CACHE_REDIS_ENABLED
+        )
+    
+    async def get(self, query: str) -> Optional[Tuple[bool, bool]]:
+        if not self.enabled:
+            return None
+        value = await self.cache.get(query_fingerprint(query))
+        if value is None:
+            return None
+        return bool(value[0]), bool(value[1])
+    
+    async def set(self, query: str, classification: Tuple[bool, bool]):
+        if self.enabled:
+            await self.cache.set(query_fingerprint(query), list(classification))
+    
+    def get_stats(self):
+        return self.cache.get_stats()
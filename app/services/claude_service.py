@@ -1,45 +1,139 @@
-import anthropic
 import time
-from app.services.base_ai_service import BaseAIService, AIResponse
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+from app.services.base_ai_service import BaseAIService, AIResponse, StreamDelta
+from app.services.conversation_memory import ConversationContext
+from app.services.http_pool import get_http_pool, model_timeout
 from app.core.models_config import ModelConfig
+from app.services.token_estimator import get_token_estimator
 
 class ClaudeService(BaseAIService):
     
     def __init__(self, api_key: str):
         super().__init__(api_key)
-        self.client = anthropic.AsyncAnthropic(api_key=api_key)
+        self._client = None
     
-    async def query(self, prompt: str, model: str = "claude-3-5-sonnet-20241022") -> AIResponse:
-        start_time = time.time()
+    @property
+    def client(self):
+        if self._client is None:
+            # Imported on first use: the SDK is a large share of application import time
+            import anthropic
+            self._client = get_http_pool().build_sdk_client("Anthropic", anthropic.AsyncAnthropic, api_key=self.api_key)
+        return self._client
+    
+    @staticmethod
+    def build_request(prompt: str, model: str, context: Optional[ConversationContext] = None) -> Dict[str, Any]:
+        """Messages and system prompt, with a cache breakpoint after the stable conversation prefix."""
+        request: Dict[str, Any] = {}
+        messages = []
+        if context is not None and not context.is_empty:
+            summary = context.summary_text()
+            if summary:
+                request["system"] = [{"type": "text", "text": summary}]
+            messages = [
+                {"role": message["role"], "content": [{"type": "text", "text": message["content"]}]}
+                for message in context.messages()
+            ]
+            # Prefixes below the model's minimum are never cached, so only mark ones that qualify
+            if context.token_count() >= ModelConfig.get_prompt_cache_min_tokens(model):
+                last_block = messages[-1]["content"][-1] if messages else request["system"][-1]
+                last_block["cache_control"] = {"type": "ephemeral"}
+        messages.append({"role": "user", "content": prompt})
+        request["messages"] = messages
+        return request
+    
+    @staticmethod
+    def usage_tokens(usage) -> int:
+        # With prompt caching, input_tokens only counts the uncached part of the prompt
+        return (
+            usage.input_tokens
+            + (getattr(usage, "cache_creation_input_tokens", None) or 0)
+            + (getattr(usage, "cache_read_input_tokens", None) or 0)
+            + usage.output_tokens
+        )
+    
+    @staticmethod
+    def cache_tokens(usage) -> Tuple[int, int]:
+        """(cache read, cache write) input tokens, billed at 0.1x and 1.25x the input rate."""
+        return (
+            getattr(usage, "cache_read_input_tokens", None) or 0,
+            getattr(usage, "cache_creation_input_tokens", None) or 0
+        )
+    
+    async def query(
+        self,
+        prompt: str,
+        model: str = "claude-3-5-sonnet-20241022",
+        max_tokens: Optional[int] = None,
+        context: Optional[ConversationContext] = None
+    ) -> AIResponse:
+        start_time = time.perf_counter()
         
         try:
             response = await self.client.messages.create(
                 model=model,
-                max_tokens=4000,
-                messages=[{"role": "user", "content": prompt}]
+                **self.build_request(prompt, model, context),
+                timeout=model_timeout(model),
+                **ModelConfig.get_generation_params(model, max_tokens)
             )
             
-            processing_time = time.time() - start_time
+            processing_time = time.perf_counter() - start_time
             
             # Get the response text from the first content block
             response_text = response.content[0].text if response.content else ""
-            estimated_tokens = len(prompt.split()) + len(response_text.split())
-            tokens_used = estimated_tokens
+            cache_read_tokens, cache_write_tokens = 0, 0
+            if response.usage is not None:
+                tokens_used = self.usage_tokens(response.usage)
+                cache_read_tokens, cache_write_tokens = self.cache_tokens(response.usage)
+            else:
+                estimator = get_token_estimator()
+                tokens_used = estimator.count_prompt(prompt, model) + estimator.count(response_text, model)
+                if context is not None:
+                    tokens_used += context.token_count()
             
-            self.cost_per_1k_tokens = ModelConfig.get_model_cost(model)
-            cost_usd = self.calculate_cost(tokens_used)
+            cost_usd = ModelConfig.get_usage_cost(model, tokens_used, cache_read_tokens, cache_write_tokens)
             
             return AIResponse(
                 response=response_text,
                 tokens_used=tokens_used,
                 model_used=model,
                 cost_usd=cost_usd,
-                processing_time=processing_time
+                processing_time=processing_time,
+                cache_read_tokens=cache_read_tokens,
+                cache_write_tokens=cache_write_tokens
             )
             
         except Exception as e:
             raise Exception(f"Claude API error: {str(e)}")
     
+    async def stream(
+        self,
+        prompt: str,
+        model: str = "claude-3-5-sonnet-20241022",
+        max_tokens: Optional[int] = None,
+        context: Optional[ConversationContext] = None
+    ) -> AsyncIterator[StreamDelta]:
+        try:
+            async with self.client.messages.stream(
+                model=model,
+                **self.build_request(prompt, model, context),
+                timeout=model_timeout(model),
+                **ModelConfig.get_generation_params(model, max_tokens)
+            ) as stream:
+                async for text in stream.text_stream:
+                    yield StreamDelta(text=text)
+                
+                final_message = await stream.get_final_message()
+                cache_read_tokens, cache_write_tokens = self.cache_tokens(final_message.usage)
+                yield StreamDelta(
+                    text="",
+                    tokens_used=self.usage_tokens(final_message.usage),
+                    cache_read_tokens=cache_read_tokens,
+                    cache_write_tokens=cache_write_tokens
+                )
+        
+        except Exception as e:
+            raise Exception(f"Claude API error: {str(e)}")
+    
     async def query_lightweight(self, prompt: str) -> AIResponse:
         return await self.query(prompt, "claude-3-haiku-20240307")
     
@@ -0,0 +1,100 @@
+import time
+from typing import AsyncIterator, Callable, List, Optional
+from app.core.models_config import ModelConfig
+from app.services.base_ai_service import AIResponse, StreamDelta
+from app.services.conversation_memory import ConversationContext
+from app.services.token_estimator import get_token_estimator
+
+class CompletionStream:
+    """
+    A started provider stream whose first delta has already arrived.
+    
+    Iterating yields every delta (including the buffered first one) and assembles
+    the full text; to_ai_response() then builds the AIResponse to persist.
+    on_finish is called once, when the stream ends, fails or is closed.
+    """
+    
+    def __init__(
+        self,
+        model_used: str,
+        first_delta: StreamDelta,
+        deltas: AsyncIterator[StreamDelta],
+        start_time: float,
+        time_to_first_token: float,
+        on_finish: Optional[Callable[[], None]] = None
+    ):
+        self.model_used = model_used
+        self.start_time = start_time
+        self.time_to_first_token = time_to_first_token
+        self._first_delta: Optional[StreamDelta] = first_delta
+        self._deltas = deltas
+        self._chunks: List[str] = []
+        self._tokens_used: Optional[int] = None
+        self._cache_read_tokens = 0
+        self._cache_write_tokens = 0
+        self._end_time: Optional[float] = None
+        self._on_finish = on_finish
+    
+    def __aiter__(self):
+        return self
+    
+    async def __anext__(self) -> StreamDelta:
+        if self._first_delta is not None:
+            delta, self._first_delta = self._first_delta, None
+        else:
+            try:
+                delta = await self._deltas.__anext__()
+            except StopAsyncIteration:
+                self._end_time = time.perf_counter()
+                self._finish()
+                raise
+            except BaseException:
+                self._finish()
+                raise
+        
+        if delta.text:
+            self._chunks.append(delta.text)
+        if delta.tokens_used is not None:
+            self._tokens_used = delta.tokens_used
+            self._cache_read_tokens = delta.cache_read_tokens
+            self._cache_write_tokens = delta.cache_write_tokens
+        return delta
+    
+    async def aclose(self):
+        self._finish()
+        await self._deltas.aclose()
+    
+    def _finish(self):
+        if self._on_finish is not None:
+            on_finish, self._on_finish = self._on_finish, None
+            on_finish()
+    
+    @property
+    def text(self) -> str:
+        return "".join(self._chunks)
+    
+    def to_ai_response(self, prompt: str, context: Optional[ConversationContext] = None) -> AIResponse:
+        response_text = self.text
+        model_name = self.model_used.replace(" (fallback)", "")
+        tokens_used = self._tokens_used
+        if tokens_used is None:
+            # The provider did not report usage for this stream
+            estimator = get_token_estimator()
+            tokens_used = estimator.count_prompt(prompt, model_name) + estimator.count(response_text, model_name)
+            if context is not None:
+                # The history was sent with the prompt and is billed as input
+                tokens_used += context.token_count()
+        
+        cost_usd = ModelConfig.get_usage_cost(model_name, tokens_used, self._cache_read_tokens, self._cache_write_tokens)
+        end_time = self._end_time or time.perf_counter()
+        
+        return AIResponse(
+            response=response_text,
+            tokens_used=tokens_used,
+            model_used=self.model_used,
+            cost_usd=cost_usd,
+            processing_time=end_time - self.start_time,
+            time_to_first_token=self.time_to_first_token,
+            cache_read_tokens=self._cache_read_tokens,
+            cache_write_tokens=self._cache_write_tokens
+        )
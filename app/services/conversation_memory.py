@@ -0,0 +1,193 @@
+import asyncio
+import hashlib
+import json
+import logging
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+from app.core.config import settings
+from app.core.redis import get_redis
+from app.services.token_estimator import MESSAGE_OVERHEAD_TOKENS, get_token_estimator
+
+logger = logging.getLogger(__name__)
+
+# Takes the previous summary (or None) and the turns falling out of the window, returns the new summary
+Summarizer = Callable[[Optional[str], List[Dict[str, Any]]], Awaitable[str]]
+
+@dataclass
+class ConversationContext:
+    """The part of a session's history sent with the next query."""
+    summary: Optional[str] = None
+    turns: List[Dict[str, Any]] = field(default_factory=list)
+    # Stored turns older than the token window, oldest first; removed from the store after the answer
+    overflow: List[Dict[str, Any]] = field(default_factory=list)
+    # The overflow exactly as stored, so it is retired by value rather than by list position
+    overflow_entries: List[str] = field(default_factory=list)
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.summary and not self.turns
+
+    def messages(self) -> List[Dict[str, str]]:
+        """Earlier turns as alternating user/assistant messages, oldest first."""
+        messages = []
+        for turn in self.turns:
+            messages.append({"role": "user", "content": turn["user"]})
+            messages.append({"role": "assistant", "content": turn["assistant"]})
+        return messages
+
+    def summary_text(self) -> Optional[str]:
+        if not self.summary:
+            return None
+        return f"Summary of the earlier conversation:\n{self.summary}"
+
+    def token_count(self) -> int:
+        summary_tokens = get_token_estimator().count_prompt(self.summary) if self.summary else 0
+        return summary_tokens + sum(turn["tokens"] for turn in self.turns)
+
+    def fingerprint(self) -> str:
+        payload = json.dumps([self.summary, [(turn["user"], turn["assistant"]) for turn in self.turns]])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ConversationMemory:
+    """
+    Per-session conversation history in Redis.
+
+    Each session is a list of JSON turns at conversation:{user_id}:{session_id}, trimmed to
+    CONVERSATION_MAX_TURNS entries like a ring buffer and expiring after CONVERSATION_TTL.
+    Only the newest turns that fit in CONVERSATION_MAX_CONTEXT_TOKENS are sent. Older turns
+    are dropped, or with the "summarize" policy folded into a running summary by a background
+    task, so follow-up turns stay bounded no matter how long the session runs.
+    """
+
+    def __init__(self, summarizer: Optional[Summarizer] = None):
+        self.enabled = settings.CONVERSATION_MEMORY_ENABLED
+        self.max_turns = settings.CONVERSATION_MAX_TURNS
+        self.max_context_tokens = settings.CONVERSATION_MAX_CONTEXT_TOKENS
+        self.ttl = settings.CONVERSATION_TTL
+        self.overflow_policy = settings.CONVERSATION_OVERFLOW_POLICY
+        self.summarizer = summarizer
+        self.summaries = 0
+        self.dropped_turns = 0
+        self.redis_errors = 0
+        self._tasks: Set[asyncio.Task] = set()
+
+    @staticmethod
+    def _key(user_id: int, session_id: str) -> str:
+        return f"conversation:{user_id}:{session_id}"
+
+    async def load(self, user_id: int, session_id: str) -> ConversationContext:
+        if not self.enabled:
+            return ConversationContext()
+        key = self._key(user_id, session_id)
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            pipe.get(f"{key}:summary")
+            pipe.lrange(key, 0, -1)
+            summary, entries = await pipe.execute()
+        except Exception as e:
+            self.redis_errors += 1
+            logger.warning(f"Failed to load conversation for session {session_id}: {str(e)}")
+            return ConversationContext()
+
+        if isinstance(summary, bytes):
+            summary = summary.decode("utf-8")
+        entries = [entry.decode("utf-8") if isinstance(entry, bytes) else entry for entry in entries]
+        turns = [json.loads(entry) for entry in entries]
+        context = ConversationContext(summary=summary or None)
+        budget = self.max_context_tokens - context.token_count()
+        # Keep the newest turns that fit; everything older is overflow
+        split = len(turns)
+        while split > 0 and turns[split - 1]["tokens"] <= budget:
+            budget -= turns[split - 1]["tokens"]
+            split -= 1
+        context.turns = turns[split:]
+        context.overflow = turns[:split]
+        context.overflow_entries = entries[:split]
+        return context
+
+    async def append(self, user_id: int, session_id: str, context: ConversationContext, query_text: str, response_text: str):
+        """Store the answered turn and retire the overflow the context was loaded with."""
+        if not self.enabled:
+            return
+        estimator = get_token_estimator()
+        turn = {
+            # Makes every stored entry unique, so LREM removes exactly the turn that was loaded
+            "id": uuid.uuid4().hex,
+            "user": query_text,
+            "assistant": response_text,
+            "tokens": estimator.count(query_text) + estimator.count(response_text) + 2 * MESSAGE_OVERHEAD_TOKENS
+        }
+        key = self._key(user_id, session_id)
+        summarize = bool(context.overflow) and self.overflow_policy == "summarize" and self.summarizer is not None
+        try:
+            pipe = get_redis().pipeline(transaction=True)
+            if context.overflow and not summarize:
+                self._retire(pipe, key, context.overflow_entries)
+            pipe.rpush(key, json.dumps(turn))
+            pipe.ltrim(key, -self.max_turns, -1)
+            pipe.expire(key, self.ttl)
+            pipe.expire(f"{key}:summary", self.ttl)
+            await pipe.execute()
+        except Exception as e:
+            self.redis_errors += 1
+            logger.warning(f"Failed to store conversation turn for session {session_id}: {str(e)}")
+            return
+
+        if summarize:
+            task = asyncio.create_task(self._summarize(key, context.summary, context.overflow, context.overflow_entries))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        elif context.overflow:
+            self.dropped_turns += len(context.overflow)
+
+    @staticmethod
+    def _retire(pipe, key: str, entries: List[str]):
+        # Concurrent appends and the ring trim move turns around, so positions from load() are stale;
+        # an entry already trimmed away is simply not found
+        for entry in entries:
+            pipe.lrem(key, 1, entry)
+
+    async def _summarize(self, key: str, summary: Optional[str], overflow: List[Dict[str, Any]], entries: List[str]):
+        redis = get_redis()
+        lock_key = f"{key}:summarizing"
+        # One summary per session at a time; a turn that loses the race is summarized on a later request
+        try:
+            if not await redis.set(lock_key, 1, nx=True, ex=60):
+                return
+        except Exception as e:
+            self.redis_errors += 1
+            logger.warning(f"Failed to lock conversation for summary: {str(e)}")
+            return
+        try:
+            new_summary = await self.summarizer(summary, overflow)
+        except Exception as e:
+            logger.warning(f"Conversation summary failed, dropping {len(overflow)} turns instead: {str(e)}")
+            new_summary = summary
+            self.dropped_turns += len(overflow)
+        else:
+            self.summaries += 1
+        try:
+            pipe = redis.pipeline(transaction=True)
+            if new_summary:
+                pipe.set(f"{key}:summary", new_summary, ex=self.ttl)
+            self._retire(pipe, key, entries)
+            pipe.delete(lock_key)
+            await pipe.execute()
+        except Exception as e:
+            self.redis_errors += 1
+            logger.warning(f"Failed to store conversation summary: {str(e)}")
+
+    async def stop(self):
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def get_stats(self):
+        return {
+            "enabled": self.enabled,
+            "overflow_policy": self.overflow_policy,
+            "summaries": self.summaries,
+            "dropped_turns": self.dropped_turns,
+            "pending_summaries": len(self._tasks),
+            "redis_errors": self.redis_errors
+        }
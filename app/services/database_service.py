@@ -1,6 +1,6 @@
 import os
 import logging
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.engine import URL
 from sqlalchemy.exc import OperationalError
 from app.core.database import engine, Base
@@ -66,10 +66,54 @@ class DatabaseService:
             logger.error(f"Failed to create tables: {str(e)}")
             return False
 
+    @staticmethod
+    def ensure_indexes():
+        """Create indexes declared on models that an older existing table does not have yet."""
+        try:
+            for table in Base.metadata.sorted_tables:
+                for index in table.indexes:
+                    index.create(bind=engine, checkfirst=True)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to create indexes: {str(e)}")
+            return False
+
+    @staticmethod
+    def ensure_columns():
+        """
+        Add nullable columns declared on models that an older existing table does not have yet.
+
+        create_all never alters an existing table, so a column added to a model (for example
+        ai_queries.time_to_first_token) has to be added here before the new code writes it.
+        Columns that are NOT NULL without a server default cannot be added safely and are reported.
+        """
+        try:
+            inspector = inspect(engine)
+            existing_tables = set(inspector.get_table_names())
+            with engine.begin() as conn:
+                for table in Base.metadata.sorted_tables:
+                    if table.name not in existing_tables:
+                        continue
+                    existing = {column["name"] for column in inspector.get_columns(table.name)}
+                    for column in table.columns:
+                        if column.name in existing:
+                            continue
+                        if not column.nullable and column.server_default is None:
+                            logger.error(f"Column {table.name}.{column.name} is missing and NOT NULL; add it manually")
+                            return False
+                        column_type = column.type.compile(dialect=engine.dialect)
+                        null_clause = "NULL" if column.nullable else "NOT NULL"
+                        conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type} {null_clause}"))
+                        logger.info(f"Added column {table.name}.{column.name}")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to add columns: {str(e)}")
+            return False
+
     @staticmethod
     def initialize_database():
         if not DatabaseService.check_database_connection():
             logger.warning("Trying to create database because connection failed...")
             if not DatabaseService.ensure_database_exists():
                 return False
-        return DatabaseService.create_tables()
+        return DatabaseService.create_tables() and DatabaseService.ensure_columns() and DatabaseService.ensure_indexes()
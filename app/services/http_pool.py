@@ -0,0 +1,126 @@
+import asyncio
+import logging
+from typing import Any, Callable, Iterable, List, Optional
+import httpx
+from app.core.config import settings
+from app.core.models_config import ModelConfig
+
+try:
+    import h2
+except ImportError:
+    h2 = None
+
+logger = logging.getLogger(__name__)
+
+class ProviderHTTPPool:
+    """
+    One httpx.AsyncClient shared by the OpenAI and Anthropic SDK clients.
+
+    Keep-alive connections are reused across providers' requests up to HTTP_POOL_MAX_CONNECTIONS,
+    and HTTP/2 is negotiated when the h2 package is installed, so concurrent completions to the
+    same provider multiplex over a few warm connections instead of each paying a TLS handshake.
+    """
+
+    def __init__(self):
+        self.http2 = settings.HTTP_POOL_HTTP2 and h2 is not None
+        if settings.HTTP_POOL_HTTP2 and h2 is None:
+            logger.info("h2 is not installed, provider connections use HTTP/1.1")
+        self.limits = httpx.Limits(
+            max_connections=settings.HTTP_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_POOL_MAX_KEEPALIVE,
+            keepalive_expiry=settings.HTTP_POOL_KEEPALIVE_EXPIRY
+        )
+        self.warmed_up = 0
+        self.warmup_failures = 0
+        self.shared_with: List[str] = []
+        self._transport: Optional[httpx.AsyncHTTPTransport] = None
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._transport = httpx.AsyncHTTPTransport(http2=self.http2, limits=self.limits)
+            self._client = httpx.AsyncClient(
+                transport=self._transport,
+                timeout=httpx.Timeout(
+                    settings.HTTP_POOL_DEFAULT_READ_TIMEOUT,
+                    connect=settings.HTTP_POOL_CONNECT_TIMEOUT,
+                    pool=settings.HTTP_POOL_ACQUIRE_TIMEOUT
+                )
+            )
+        return self._client
+
+    def build_sdk_client(self, name: str, factory: Callable[..., Any], **kwargs) -> Any:
+        """Construct a provider SDK client on the shared pool.
+
+        SDK releases built on a different HTTP package reject an httpx client; those keep their own pool.
+        """
+        try:
+            sdk_client = factory(http_client=self.client, **kwargs)
+        except TypeError as e:
+            logger.warning(f"{name} SDK cannot use the shared HTTP pool, using its default client: {str(e)}")
+            return factory(**kwargs)
+        self.shared_with.append(name)
+        return sdk_client
+
+    async def warm_up(self, base_urls: Iterable[str]):
+        """Open keep-alive connections to each provider before the first user request.
+
+        Any response, including 401/404, leaves a handshaked connection in the pool.
+        """
+        async def open_connection(url: str):
+            try:
+                response = await self.client.get(url, timeout=settings.HTTP_POOL_WARMUP_TIMEOUT)
+                await response.aclose()
+                self.warmed_up += 1
+            except Exception as e:
+                self.warmup_failures += 1
+                logger.warning(f"Connection warm-up to {url} failed: {str(e)}")
+
+        # With HTTP/2 one connection per origin multiplexes every request
+        per_origin = 1 if self.http2 else settings.HTTP_POOL_WARMUP_CONNECTIONS
+        await asyncio.gather(*(open_connection(str(url)) for url in base_urls for _ in range(per_origin)))
+
+    async def close(self):
+        # The SDK clients keep a reference to this client, so it is closed once at shutdown, not replaced
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+
+    def get_stats(self):
+        connections = []
+        queued = 0
+        pool = getattr(self._transport, "_pool", None)
+        if pool is not None:
+            connections = pool.connections
+            queued = sum(1 for request in getattr(pool, "_requests", []) if request.is_queued())
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return {
+            "http2": self.http2,
+            "shared_with": self.shared_with,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+            "connections": len(connections),
+            "active": len(connections) - idle,
+            "idle": idle,
+            "queued_requests": queued,
+            "utilization": round((len(connections) - idle) / self.limits.max_connections, 4)
+            if self.limits.max_connections else 0.0,
+            "warmed_up": self.warmed_up,
+            "warmup_failures": self.warmup_failures
+        }
+
+def model_timeout(model: str) -> httpx.Timeout:
+    """Per-request timeout for a model: a short connect phase and the model's own read budget."""
+    return httpx.Timeout(
+        ModelConfig.get_read_timeout(model),
+        connect=ModelConfig.get_connect_timeout(model),
+        pool=settings.HTTP_POOL_ACQUIRE_TIMEOUT
+    )
+
+_http_pool: Optional[ProviderHTTPPool] = None
+
+def get_http_pool() -> ProviderHTTPPool:
+    global _http_pool
+    if _http_pool is None:
+        _http_pool = ProviderHTTPPool()
+    return _http_pool
@@ -0,0 +1,27 @@
+from collections import deque
+from typing import Deque, Dict, Optional
+
+class LatencyTracker:
+    """Rolling window of recent call latencies per model: successful calls, plus primaries
+    cancelled by a winning hedge, recorded at the time they had run when abandoned."""
+    
+    def __init__(self, window_size: int = 200):
+        self.window_size = window_size
+        self._samples: Dict[str, Deque[float]] = {}
+    
+    def record(self, model: str, seconds: float):
+        samples = self._samples.get(model)
+        if samples is None:
+            samples = self._samples[model] = deque(maxlen=self.window_size)
+        samples.append(seconds)
+    
+    def percentile(self, model: str, quantile: float, min_samples: int = 1) -> Optional[float]:
+        samples = self._samples.get(model)
+        if not samples or len(samples) < min_samples:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(quantile * len(ordered)))
+        return ordered[index]
+    
+    def sample_count(self, model: str) -> int:
+        return len(self._samples.get(model, ()))
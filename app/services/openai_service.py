@@ -1,34 +1,72 @@
-import openai
 import time
-from typing import Optional
-from app.services.base_ai_service import BaseAIService, AIResponse
+from typing import AsyncIterator, Dict, List, Optional
+from app.services.base_ai_service import BaseAIService, AIResponse, StreamDelta
+from app.services.conversation_memory import ConversationContext
+from app.services.http_pool import get_http_pool, model_timeout
 from app.core.models_config import ModelConfig
+from app.services.token_estimator import get_token_estimator
 
 class OpenAIService(BaseAIService):
     
     def __init__(self, api_key: str, organization: Optional[str] = None):
         super().__init__(api_key)
-        self.client = openai.AsyncOpenAI(api_key=api_key, organization=organization)
+        self.organization = organization
+        self._client = None
     
-    async def query(self, prompt: str, model: str = "gpt-4o-mini") -> AIResponse:
-        start_time = time.time()
+    @property
+    def client(self):
+        if self._client is None:
+            # Imported on first use: the SDK is a large share of application import time
+            import openai
+            self._client = get_http_pool().build_sdk_client(
+                "OpenAI", openai.AsyncOpenAI, api_key=self.api_key, organization=self.organization
+            )
+        return self._client
+    
+    @staticmethod
+    def build_messages(prompt: str, context: Optional[ConversationContext] = None) -> List[Dict[str, str]]:
+        # Summary and earlier turns come first and unchanged, so OpenAI's automatic prefix cache applies
+        messages = []
+        if context is not None:
+            summary = context.summary_text()
+            if summary:
+                messages.append({"role": "system", "content": summary})
+            messages.extend(context.messages())
+        messages.append({"role": "user", "content": prompt})
+        return messages
+    
+    async def query(
+        self,
+        prompt: str,
+        model: str = "gpt-4o-mini",
+        max_tokens: Optional[int] = None,
+        context: Optional[ConversationContext] = None
+    ) -> AIResponse:
+        start_time = time.perf_counter()
         
         try:
             response = await self.client.chat.completions.create(
                 model=model,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=4000,
-                temperature=0.7
+                messages=self.build_messages(prompt, context),
+                timeout=model_timeout(model),
+                **ModelConfig.get_generation_params(model, max_tokens)
             )
             
-            processing_time = time.time() - start_time
-            tokens_used = response.usage.total_tokens
+            processing_time = time.perf_counter() - start_time
+            response_text = response.choices[0].message.content
+            if response.usage is not None:
+                tokens_used = response.usage.total_tokens
+            else:
+                estimator = get_token_estimator()
+                tokens_used = estimator.count_prompt(prompt, model) + estimator.count(response_text or "", model)
+                if context is not None:
+                    tokens_used += context.token_count()
             
             self.cost_per_1k_tokens = ModelConfig.get_model_cost(model)
             cost_usd = self.calculate_cost(tokens_used)
             
             return AIResponse(
-                response=response.choices[0].message.content,
+                response=response_text,
                 tokens_used=tokens_used,
                 model_used=model,
                 cost_usd=cost_usd,
@@ -38,6 +76,28 @@ class OpenAIService(BaseAIService):
         except Exception as e:
             raise Exception(f"OpenAI API error: {str(e)}")
     
+    async def stream(
+        self,
+        prompt: str,
+        model: str = "gpt-4o-mini",
+        max_tokens: Optional[int] = None,
+        context: Optional[ConversationContext] = None
+    ) -> AsyncIterator[StreamDelta]:
+        try:
+            stream = await self.client.chat.completions.create(
+                model=model,
+                messages=self.build_messages(prompt, context),
+                stream=True,
+                timeout=model_timeout(model),
+                **ModelConfig.get_generation_params(model, max_tokens)
+            )
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield StreamDelta(text=chunk.choices[0].delta.content)
+        
+        except Exception as e:
+            raise Exception(f"OpenAI API error: {str(e)}")
+    
     async def query_lightweight(self, prompt: str) -> AIResponse:
         return await self.query(prompt, "gpt-4o-mini")
     
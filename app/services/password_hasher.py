@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass, asdict
+from typing import List, Optional
+from app.core.auth import get_password_hash, verify_password
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class PasswordHasherBusyError(Exception):
+    """Raised when more hash/verify calls are waiting than PASSWORD_HASH_MAX_QUEUE allows."""
+
+@dataclass
+class HasherStats:
+    submitted: int = 0
+    completed: int = 0
+    rejected: int = 0
+    in_flight: int = 0
+    max_in_flight: int = 0
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a dedicated process pool so hashing uses several cores and never occupies
+    the event loop or FastAPI's shared thread pool.
+
+    Calls beyond the pool size wait in the executor queue; once PASSWORD_HASH_MAX_QUEUE calls
+    are waiting, new interactive calls are rejected rather than queued indefinitely.
+    """
+
+    def __init__(self):
+        self.workers = settings.PASSWORD_HASH_WORKERS
+        self.max_queue = settings.PASSWORD_HASH_MAX_QUEUE
+        self.stats = HasherStats()
+        self._executor: Optional[Executor] = None
+
+    def start(self):
+        if self.workers > 0 and self._executor is None:
+            # spawn rather than fork: the parent already runs an event loop and helper threads
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self.stats.in_flight - max(self.workers, 1))
+
+    async def hash(self, password: str) -> str:
+        self._check_capacity()
+        return await self._run(get_password_hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        self._check_capacity()
+        return await self._run(verify_password, password, hashed_password)
+
+    async def hash_many(self, passwords: List[str]) -> List[str]:
+        """Hash in parallel across the pool, keeping at most one call per worker queued so
+        interactive logins are not stuck behind a large batch."""
+        slots = asyncio.Semaphore(max(self.workers, 1))
+
+        async def hash_one(password: str) -> str:
+            async with slots:
+                return await self._run(get_password_hash, password)
+
+        return await asyncio.gather(*(hash_one(password) for password in passwords))
+
+    def get_stats(self):
+        return {
+            **asdict(self.stats),
+            "workers": self.workers,
+            "queue_depth": self.queue_depth,
+            "max_queue": self.max_queue
+        }
+
+    def _check_capacity(self):
+        if self.queue_depth >= self.max_queue:
+            self.stats.rejected += 1
+            raise PasswordHasherBusyError(f"{self.queue_depth} password hash calls already waiting")
+
+    async def _run(self, fn, *args):
+        if self.workers > 0 and self._executor is None:
+            self.start()
+        self.stats.submitted += 1
+        self.stats.in_flight += 1
+        self.stats.max_in_flight = max(self.stats.max_in_flight, self.stats.in_flight)
+        try:
+            if self._executor is None:
+                return await asyncio.to_thread(fn, *args)
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.stats.in_flight -= 1
+            self.stats.completed += 1
+
+_password_hasher: Optional[PasswordHasher] = None
+
+def get_password_hasher() -> PasswordHasher:
+    global _password_hasher
+    if _password_hasher is None:
+        _password_hasher = PasswordHasher()
+    return _password_hasher
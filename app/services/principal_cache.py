@@ -0,0 +1,121 @@
+import asyncio
+import logging
+from typing import Iterable, List, Optional
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.principal import (
+    Principal,
+    PRINCIPAL_CACHE_NAMESPACE,
+    PRINCIPAL_INVALIDATION_CHANNEL,
+    add_local_invalidation_hook,
+    invalidate_principals
+)
+from app.core.redis import get_redis
+from app.repository import AsyncUserRepository
+from app.services.two_tier_cache import TwoTierCache
+
+logger = logging.getLogger(__name__)
+
+class PrincipalCache:
+    """
+    Short-TTL cache of authenticated principals, keyed by user id.
+
+    Changes to plan, session or account publish an invalidation on Redis; every worker runs a
+    subscriber that evicts the user from its local tier, so the TTL only bounds staleness when
+    Redis itself is unavailable.
+    """
+
+    def __init__(self):
+        self.cache = TwoTierCache(
+            namespace=PRINCIPAL_CACHE_NAMESPACE,
+            ttl=settings.PRINCIPAL_CACHE_TTL,
+            max_entries=settings.PRINCIPAL_CACHE_MAX_ENTRIES,
+            max_bytes=settings.PRINCIPAL_CACHE_MAX_BYTES,
+            redis_enabled=settings.PRINCIPAL_CACHE_REDIS_ENABLED
+        )
+        self.loads = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._subscriber: Optional[asyncio.Task] = None
+        add_local_invalidation_hook(self._evict_threadsafe)
+
+    async def get(self, user_id: int) -> Optional[Principal]:
+        """Return the cached principal, loading it from the database on a miss."""
+        cached = await self.cache.get(str(user_id))
+        if cached is not None:
+            return Principal.from_dict(cached)
+
+        async with AsyncSessionLocal() as db:
+            user = await AsyncUserRepository(db).get_by_id(user_id)
+        self.loads += 1
+        if not user:
+            return None
+        principal = Principal.from_user(user)
+        await self.cache.set(str(user_id), principal.to_dict())
+        return principal
+
+    async def invalidate(self, user_ids: Iterable[int]):
+        await invalidate_principals(user_ids)
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        if self.cache.redis_enabled and self._subscriber is None:
+            self._subscriber = asyncio.create_task(self._subscribe())
+
+    async def stop(self):
+        if self._subscriber is not None:
+            self._subscriber.cancel()
+            try:
+                await self._subscriber
+            except asyncio.CancelledError:
+                pass
+            self._subscriber = None
+        self._loop = None
+
+    def get_stats(self):
+        return {**self.cache.get_stats(), "database_loads": self.loads}
+
+    def _evict_local(self, user_ids: List[int]):
+        for user_id in user_ids:
+            self.cache.local.delete(str(user_id))
+
+    def _evict_threadsafe(self, user_ids: List[int]):
+        # Sync repositories run in the threadpool; the local tier belongs to the event loop thread
+        try:
+            on_loop_thread = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            on_loop_thread = False
+        if self._loop is not None and not on_loop_thread and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._evict_local, user_ids)
+        else:
+            self._evict_local(user_ids)
+
+    async def _subscribe(self):
+        while True:
+            pubsub = get_redis().pubsub()
+            try:
+                await pubsub.subscribe(PRINCIPAL_INVALIDATION_CHANNEL)
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    data = message["data"]
+                    if isinstance(data, bytes):
+                        data = data.decode()
+                    self._evict_local([int(user_id) for user_id in data.split(",") if user_id])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Principal invalidation subscriber error, reconnecting: {str(e)}")
+                await asyncio.sleep(1.0)
+            finally:
+                try:
+                    await pubsub.close()
+                except Exception:
+                    pass
+
+_principal_cache: Optional[PrincipalCache] = None
+
+def get_principal_cache() -> PrincipalCache:
+    global _principal_cache
+    if _principal_cache is None:
+        _principal_cache = PrincipalCache()
+    return _principal_cache
@@ -0,0 +1,237 @@
+import gzip
+import json
+import logging
+import os
+import time
+import zlib
+from dataclasses import dataclass, asdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models import AIQuery
+from app.repository import AIQueryRepository
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_COLUMNS = (
+    "id", "user_id", "session_id", "query_text", "model_used", "response",
+    "tokens_used", "cost_usd", "processing_time", "time_to_first_token", "created_at"
+)
+
+def archive_path(archive_dir: str, day: date) -> str:
+    return os.path.join(archive_dir, f"{day:%Y}", f"{day:%m}", f"ai_queries-{day:%Y-%m-%d}.ndjson.gz")
+
+def _row_to_dict(row: AIQuery) -> Dict[str, Any]:
+    data = {}
+    for column in ARCHIVE_COLUMNS:
+        value = getattr(row, column)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        elif isinstance(value, Decimal):
+            value = float(value)
+        data[column] = value
+    return data
+
+@dataclass
+class RetentionState:
+    """Progress of one retention run, persisted after every chunk so the run can resume."""
+    cutoff: str
+    max_id: int
+    last_id: int = 0
+    # Ids archived to disk but not yet confirmed deleted; resuming deletes them without re-archiving
+    pending_from: Optional[int] = None
+    pending_to: Optional[int] = None
+    # Archive file sizes before the chunk being written; a resumed run truncates back to them
+    archive_sizes: Optional[Dict[str, int]] = None
+    archived: int = 0
+    deleted: int = 0
+
+class QueryArchiver:
+    """
+    Moves expired ai_queries rows to gzip NDJSON files, one file per UTC day under
+    ARCHIVE_DIR/YYYY/MM/, then deletes them.
+
+    Rows are walked in bounded primary-key chunks, each archived (fsynced) and then deleted in
+    its own short transaction, with a pause between chunks. Progress is written to a state file
+    after every step, so an interrupted run continues where it stopped with the same cutoff.
+    Each file's size is saved before a chunk is appended, and a run resuming after a crash
+    mid-write truncates the files back to it before rewriting the chunk, so no torn gzip member
+    or duplicate rows are left behind. ArchiveReader still drops duplicate ids and stops at a
+    truncated last member, for files written before a crash that was never resumed.
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        archive_dir: str = settings.ARCHIVE_DIR,
+        state_path: str = settings.RETENTION_STATE_PATH,
+        chunk_size: int = settings.RETENTION_CHUNK_SIZE,
+        pause_seconds: float = settings.RETENTION_CHUNK_PAUSE
+    ):
+        self.repo = AIQueryRepository(db)
+        self.archive_dir = archive_dir
+        self.state_path = state_path
+        self.chunk_size = chunk_size
+        self.pause_seconds = pause_seconds
+
+    def run(self, days: int = settings.RETENTION_DAYS, max_chunks: Optional[int] = None) -> RetentionState:
+        state = self._load_state()
+        if state is None:
+            cutoff = datetime.utcnow() - timedelta(days=days)
+            max_id = self.repo.get_max_expired_id(cutoff)
+            if max_id is None:
+                logger.info("No expired ai_queries rows to archive")
+                return RetentionState(cutoff=cutoff.isoformat(), max_id=0)
+            state = RetentionState(cutoff=cutoff.isoformat(), max_id=max_id)
+            self._save_state(state)
+        else:
+            logger.info(f"Resuming retention run with cutoff {state.cutoff} after id {state.last_id}")
+        cutoff = datetime.fromisoformat(state.cutoff)
+
+        if state.archive_sizes:
+            self._rollback_archives(state.archive_sizes)
+            state.archive_sizes = None
+            self._save_state(state)
+        if state.pending_from is not None:
+            self._finish_pending(state, cutoff)
+
+        chunks = 0
+        while max_chunks is None or chunks < max_chunks:
+            rows = self.repo.get_expired_chunk(cutoff, state.last_id, state.max_id, self.chunk_size)
+            if not rows:
+                self._clear_state()
+                logger.info(f"Retention complete: {state.archived} archived, {state.deleted} deleted")
+                return state
+
+            by_day = self._group_by_day(rows)
+            state.archive_sizes = {
+                path: os.path.getsize(path) if os.path.exists(path) else 0
+                for path in (archive_path(self.archive_dir, day) for day in by_day)
+            }
+            self._save_state(state)
+            self._archive(by_day)
+            state.archived += len(rows)
+            state.pending_from, state.pending_to = rows[0].id, rows[-1].id
+            state.archive_sizes = None
+            self._save_state(state)
+            self._finish_pending(state, cutoff)
+
+            chunks += 1
+            if self.pause_seconds:
+                time.sleep(self.pause_seconds)
+        return state
+
+    def _finish_pending(self, state: RetentionState, cutoff: datetime):
+        ids = self.repo.get_expired_ids(cutoff, state.pending_from - 1, state.pending_to, self.chunk_size)
+        state.deleted += self.repo.delete_by_ids(ids)
+        state.last_id = state.pending_to
+        state.pending_from = state.pending_to = None
+        self._save_state(state)
+
+    @staticmethod
+    def _group_by_day(rows: List[AIQuery]) -> Dict[date, List[str]]:
+        by_day: Dict[date, List[str]] = {}
+        for row in rows:
+            by_day.setdefault(row.created_at.date(), []).append(json.dumps(_row_to_dict(row), separators=(",", ":")))
+        return by_day
+
+    def _archive(self, by_day: Dict[date, List[str]]):
+        for day, lines in by_day.items():
+            path = archive_path(self.archive_dir, day)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Appending starts a new gzip member; gzip readers treat the members as one stream
+            with open(path, "ab") as raw_file:
+                with gzip.GzipFile(fileobj=raw_file, mode="ab") as archive_file:
+                    archive_file.write(("\n".join(lines) + "\n").encode("utf-8"))
+                raw_file.flush()
+                os.fsync(raw_file.fileno())
+
+    def _rollback_archives(self, sizes: Dict[str, int]):
+        """Cut off whatever an interrupted chunk wrote, including a partial gzip member."""
+        for path, size in sizes.items():
+            if not os.path.exists(path) or os.path.getsize(path) <= size:
+                continue
+            logger.warning(f"Truncating {path} to {size} bytes after an interrupted archive write")
+            if size == 0:
+                os.remove(path)
+                continue
+            with open(path, "r+b") as raw_file:
+                raw_file.truncate(size)
+                raw_file.flush()
+                os.fsync(raw_file.fileno())
+
+    def _load_state(self) -> Optional[RetentionState]:
+        if not os.path.exists(self.state_path):
+            return None
+        with open(self.state_path, encoding="utf-8") as state_file:
+            return RetentionState(**json.load(state_file))
+
+    def _save_state(self, state: RetentionState):
+        directory = os.path.dirname(self.state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.state_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as state_file:
+            json.dump(asdict(state), state_file)
+            state_file.flush()
+            os.fsync(state_file.fileno())
+        os.replace(temp_path, self.state_path)
+
+    def _clear_state(self):
+        if os.path.exists(self.state_path):
+            os.remove(self.state_path)
+
+class ArchiveReader:
+    """Offline queries over the archive files written by QueryArchiver."""
+
+    def __init__(self, archive_dir: str = settings.ARCHIVE_DIR):
+        self.archive_dir = archive_dir
+
+    def available_days(self) -> List[date]:
+        days = []
+        for root, _, files in os.walk(self.archive_dir):
+            for name in files:
+                if name.startswith("ai_queries-") and name.endswith(".ndjson.gz"):
+                    days.append(date.fromisoformat(name[len("ai_queries-"):-len(".ndjson.gz")]))
+        return sorted(days)
+
+    def iter_rows(
+        self,
+        since: Optional[date] = None,
+        until: Optional[date] = None,
+        user_id: Optional[int] = None,
+        model_used: Optional[str] = None,
+        predicate: Optional[Callable[[Dict[str, Any]], bool]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield archived rows day by day, only opening the files inside [since, until]."""
+        for day in self.available_days():
+            if (since and day < since) or (until and day > until):
+                continue
+            seen_ids = set()
+            path = archive_path(self.archive_dir, day)
+            with gzip.open(path, "rt", encoding="utf-8") as archive_file:
+                try:
+                    for line in archive_file:
+                        if not line.strip():
+                            continue
+                        try:
+                            row = json.loads(line)
+                        except json.JSONDecodeError:
+                            # The last line of a gzip member cut short by a crash
+                            logger.warning(f"Skipping unreadable line in {path}")
+                            continue
+                        if row["id"] in seen_ids:
+                            continue
+                        seen_ids.add(row["id"])
+                        if user_id is not None and row["user_id"] != user_id:
+                            continue
+                        if model_used is not None and row["model_used"] != model_used:
+                            continue
+                        if predicate is not None and not predicate(row):
+                            continue
+                        yield row
+                except (EOFError, gzip.BadGzipFile, zlib.error) as e:
+                    # A crash mid-write that no resumed run has truncated yet leaves a partial last member
+                    logger.warning(f"Stopped reading {path} at a truncated gzip member: {str(e)}")
@@ -0,0 +1,205 @@
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+LABELS = ("code", "creative", "general")
+
+CODE_KEYWORDS = [
+    'code', 'programming', 'function', 'class', 'method', 'algorithm',
+    'debug', 'error', 'bug', 'syntax', 'compile', 'runtime', 'api',
+    'database', 'sql', 'javascript', 'python', 'java', 'c++', 'html',
+    'css', 'react', 'node', 'docker', 'git', 'deploy', 'server',
+    'client', 'frontend', 'backend', 'framework', 'library', 'div', 'flexbox',
+    'regex', 'json', 'yaml', 'typescript', 'array', 'variable', 'loop', 'exception',
+    'script', 'kubernetes'
+]
+
+CREATIVE_KEYWORDS = [
+    'story', 'poem', 'creative', 'fiction', 'narrative', 'character',
+    'plot', 'scene', 'dialogue', 'description', 'imagine', 'write',
+    'compose', 'artistic', 'expressive', 'emotional', 'metaphor',
+    'simile', 'rhyme', 'verse', 'prose', 'novel', 'short story'
+]
+
+# Untrained scorer calibration. A keyword list cannot tell a general query from a code or
+# creative one it has no word for, so no hits gives "general" only 0.45 and is escalated. One
+# hit of a single kind wins with 0.95 and each further hit raises it; a tie between code and
+# creative hits stays near 0.5 and is escalated too.
+KEYWORD_WEIGHT = 4.0
+GENERAL_BIAS = 0.5
+
+# Inflected forms matched for every keyword, so "bugs", "functions" and "stories" count too
+KEYWORD_SUFFIXES = ("s", "es", "ed", "ing", "er", "ers")
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9_#+]+")
+
+@dataclass
+class Classification:
+    label: str
+    confidence: float
+    
+    def as_flags(self) -> Tuple[bool, bool]:
+        """Return (is_code, is_creative) as used by the routing code."""
+        return self.label == "code", self.label == "creative"
+
+def _keyword_forms(keyword: str) -> List[str]:
+    """The keyword plus its plural and common inflections (debug -> debugging, story -> stories)."""
+    if not keyword[-1].isalpha():
+        return [keyword]
+    if keyword.endswith("e"):
+        # write -> writes, writer, writing; compose -> composed
+        return [keyword, keyword + "s", keyword + "d", keyword + "r", keyword + "rs", keyword[:-1] + "ing"]
+    if re.search(r"[^aeiou]y$", keyword):
+        # story -> stories; library -> libraries
+        return [keyword, keyword[:-1] + "ies", keyword[:-1] + "ied", keyword + "ing"]
+    if re.search(r"(?:^|[^aeiou])[aeiou][bdgmnpt]$", keyword):
+        # Doubled final consonant: bug -> bugged, debug -> debugging
+        return [keyword, keyword + "s"] + [keyword + keyword[-1] + suffix for suffix in KEYWORD_SUFFIXES if suffix not in ("s", "es")]
+    # class -> classes, but function -> functions
+    plural = "es" if re.search(r"(?:s|x|z|ch|sh)$", keyword) else "s"
+    return [keyword] + [keyword + suffix for suffix in KEYWORD_SUFFIXES if suffix not in ("s", "es") or suffix == plural]
+
+def _build_keyword_matcher(keywords_by_label: Dict[str, List[str]]) -> Tuple[re.Pattern, Dict[str, str]]:
+    """Compile every keyword form into one alternation so a query is scanned once, longest match first."""
+    label_by_keyword = {
+        form: label
+        for label, keywords in keywords_by_label.items()
+        for keyword in keywords
+        for form in _keyword_forms(keyword)
+    }
+    alternation = "|".join(re.escape(k) for k in sorted(label_by_keyword, key=len, reverse=True))
+    pattern = re.compile(rf"(?<![a-z0-9])(?:{alternation})(?![a-z0-9])")
+    return pattern, label_by_keyword
+
+def _softmax(scores: List[float]) -> List[float]:
+    top = max(scores)
+    exps = [math.exp(score - top) for score in scores]
+    total = sum(exps)
+    return [value / total for value in exps]
+
+class LocalQueryClassifier:
+    """
+    In-process code/creative/general classifier.
+    
+    A single compiled keyword matcher feeds a linear scorer over sparse token features.
+    Without a trained model the scorer uses keyword hits only, calibrated so that it is
+    confident only when the hits point one way; a model trained with
+    `python -m scripts.train_query_classifier` adds per-token naive Bayes weights.
+    """
+    
+    def __init__(self, model: Optional[dict] = None):
+        self.keyword_pattern, self.label_by_keyword = _build_keyword_matcher({
+            "code": CODE_KEYWORDS,
+            "creative": CREATIVE_KEYWORDS
+        })
+        self.model = model
+    
+    @classmethod
+    def load(cls, path: str) -> "LocalQueryClassifier":
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    model = json.load(f)
+                logger.info(f"Loaded query classifier model from {path} ({model.get('trained_on', 0)} samples)")
+                return cls(model)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not load query classifier model from {path}: {str(e)}")
+        return cls()
+    
+    def extract_features(self, query: str) -> List[str]:
+        query_lower = query.lower()
+        features = TOKEN_PATTERN.findall(query_lower)
+        features.extend(
+            f"kw:{self.label_by_keyword[match.group(0)]}"
+            for match in self.keyword_pattern.finditer(query_lower)
+        )
+        return features
+    
+    def score(self, features: List[str]) -> List[float]:
+        if self.model is None:
+            hits = Counter(f for f in features if f.startswith("kw:"))
+            return [
+                KEYWORD_WEIGHT * hits["kw:code"],
+                KEYWORD_WEIGHT * hits["kw:creative"],
+                GENERAL_BIAS
+            ]
+        
+        weights = self.model["weights"]
+        unknown = self.model["unknown"]
+        scores = list(self.model["priors"])
+        for feature in features:
+            feature_weights = weights.get(feature, unknown)
+            for index in range(len(LABELS)):
+                scores[index] += feature_weights[index]
+        return scores
+    
+    def classify(self, query: str) -> Classification:
+        probabilities = _softmax(self.score(self.extract_features(query)))
+        best = max(range(len(LABELS)), key=probabilities.__getitem__)
+        return Classification(label=LABELS[best], confidence=probabilities[best])
+    
+    def train(self, samples: Iterable[Tuple[str, str]], alpha: float = 1.0) -> dict:
+        """Fit multinomial naive Bayes weights from (query, label) pairs and use them."""
+        label_counts = Counter()
+        feature_counts: Dict[str, List[int]] = defaultdict(lambda: [0] * len(LABELS))
+        totals = [0] * len(LABELS)
+        
+        for query, label in samples:
+            if label not in LABELS:
+                continue
+            index = LABELS.index(label)
+            label_counts[label] += 1
+            for feature in self.extract_features(query):
+                feature_counts[feature][index] += 1
+                totals[index] += 1
+        
+        sample_count = sum(label_counts.values())
+        if not sample_count:
+            raise ValueError("No labelled samples to train on")
+        
+        vocabulary_size = len(feature_counts) + 1
+        denominators = [total + alpha * vocabulary_size for total in totals]
+        self.model = {
+            "labels": list(LABELS),
+            "trained_on": sample_count,
+            "priors": [
+                math.log((label_counts[label] + alpha) / (sample_count + alpha * len(LABELS)))
+                for label in LABELS
+            ],
+            "unknown": [math.log(alpha / denominator) for denominator in denominators],
+            "weights": {
+                feature: [
+                    round(math.log((counts[i] + alpha) / denominators[i]), 6)
+                    for i in range(len(LABELS))
+                ]
+                for feature, counts in feature_counts.items()
+            }
+        }
+        return self.model
+    
+    def save(self, path: str):
+        if self.model is None:
+            raise ValueError("Classifier has no trained model to save")
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.model, f)
+        os.replace(tmp_path, path)
+
+_local_classifier: Optional[LocalQueryClassifier] = None
+
+def get_local_classifier() -> LocalQueryClassifier:
+    global _local_classifier
+    if _local_classifier is None:
+        _local_classifier = LocalQueryClassifier.load(settings.QUERY_CLASSIFIER_MODEL_PATH)
+    return _local_classifier
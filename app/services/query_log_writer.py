@@ -0,0 +1,224 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.metrics import DB_WRITE_SECONDS, observe_seconds
+from app.repository import AsyncAIQueryRepository, AsyncUsageRollupRepository
+from app.services.base_ai_service import AIResponse
+
+logger = logging.getLogger(__name__)
+
+# How long to wait before retrying the spool after a failed replay, so an outage is not re-spooled every tick
+SPOOL_RETRY_SECONDS = 30.0
+
+@dataclass
+class WriterStats:
+    enqueued: int = 0
+    flushed: int = 0
+    flushes: int = 0
+    flush_failures: int = 0
+    spooled: int = 0
+    replayed: int = 0
+
+class QueryLogWriter:
+    """Write-behind log for completed queries.
+
+    Completed queries are buffered in memory and written in periodic batches: one executemany INSERT
+    into ai_queries plus one upsert per daily usage rollup table, in a single transaction.
+    Rows that cannot be written (database unreachable, or the buffer is full) are appended to a local
+    NDJSON spool file and replayed after the next successful flush, so answered queries are not lost.
+    """
+
+    def __init__(self):
+        self.enabled = settings.WRITE_BEHIND_ENABLED
+        self.max_queue = settings.WRITE_BEHIND_MAX_QUEUE
+        self.batch_size = settings.WRITE_BEHIND_BATCH_SIZE
+        self.flush_interval = settings.WRITE_BEHIND_FLUSH_INTERVAL
+        self.spool_path = settings.WRITE_BEHIND_SPOOL_PATH
+        self.stats = WriterStats()
+        self._buffer: List[Dict[str, Any]] = []
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._next_replay_at = 0.0
+
+    @staticmethod
+    def build_row(user_id: int, session_id: str, query_text: str, ai_response: AIResponse) -> Dict[str, Any]:
+        return {
+            "user_id": user_id,
+            "session_id": session_id,
+            "query_text": query_text,
+            "model_used": ai_response.model_used,
+            "response": ai_response.response,
+            "tokens_used": ai_response.tokens_used,
+            "cost_usd": ai_response.cost_usd,
+            "processing_time": ai_response.processing_time,
+            "time_to_first_token": ai_response.time_to_first_token,
+            # Stamped now rather than by the database so delayed or replayed rows keep their real time
+            "created_at": datetime.utcnow()
+        }
+
+    async def record(self, user_id: int, session_id: str, items: List[Tuple[str, AIResponse]]):
+        """Queue answered queries for persistence; returns without touching the database."""
+        rows = [self.build_row(user_id, session_id, query_text, ai_response) for query_text, ai_response in items]
+        if not rows:
+            return
+        self.stats.enqueued += len(rows)
+
+        if not self.enabled:
+            await self._write_or_spool(rows)
+            return
+
+        space = max(0, self.max_queue - len(self._buffer))
+        self._buffer.extend(rows[:space])
+        if len(rows) > space:
+            logger.warning(f"Query log buffer full, spooling {len(rows) - space} rows to {self.spool_path}")
+            await self._spool(rows[space:])
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**asdict(self.stats), "buffered": len(self._buffer), "spool_present": self._has_spool()}
+
+    async def start(self):
+        if self.enabled and self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+            if self._has_spool():
+                self._wakeup.set()
+
+    async def stop(self):
+        # Not cancelled: a cancel landing mid-flush would drop the batch already taken off the buffer
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._stopping:
+                break
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Query log flush failed: {str(e)}")
+
+    async def flush(self) -> int:
+        """Write everything buffered; on a database error the remainder goes to the spool file."""
+        async with self._flush_lock:
+            flushed = 0
+            while self._buffer:
+                rows = self._buffer[:self.batch_size]
+                del self._buffer[:self.batch_size]
+                if not await self._write_or_spool(rows):
+                    rows = self._buffer
+                    self._buffer = []
+                    await self._spool(rows)
+                    return flushed
+                flushed += len(rows)
+
+            if self._has_spool() and time.monotonic() >= self._next_replay_at:
+                await self._replay_spool()
+            return flushed
+
+    async def _write_or_spool(self, rows: List[Dict[str, Any]]) -> bool:
+        try:
+            await self._write(rows)
+            self.stats.flushes += 1
+            self.stats.flushed += len(rows)
+            return True
+        except asyncio.CancelledError:
+            # The rows are already off the buffer; spool them synchronously so a cancelled shutdown keeps them
+            _append_lines(self.spool_path, "".join(json.dumps(row, default=_encode_value) + "\n" for row in rows))
+            self.stats.spooled += len(rows)
+            raise
+        except Exception as e:
+            self.stats.flush_failures += 1
+            logger.error(f"Failed to write {len(rows)} query log rows, spooling: {str(e)}")
+            await self._spool(rows)
+            return False
+
+    async def _write(self, rows: List[Dict[str, Any]]):
+        with observe_seconds(DB_WRITE_SECONDS, operation="query_log", outcome="error") as labels:
+            async with AsyncSessionLocal() as db:
+                await AsyncAIQueryRepository(db).bulk_insert(rows, commit=False)
+                await AsyncUsageRollupRepository(db).apply(rows, commit=False)
+                await db.commit()
+            labels["outcome"] = "success"
+
+    def _has_spool(self) -> bool:
+        return os.path.exists(self.spool_path) or os.path.exists(self._replay_path())
+
+    def _replay_path(self) -> str:
+        return f"{self.spool_path}.replay"
+
+    async def _spool(self, rows: List[Dict[str, Any]]):
+        if not rows:
+            return
+        lines = "".join(json.dumps(row, default=_encode_value) + "\n" for row in rows)
+        await asyncio.to_thread(_append_lines, self.spool_path, lines)
+        self.stats.spooled += len(rows)
+
+    async def _replay_spool(self):
+        # A leftover replay file means a previous replay was interrupted; finish it before taking a new one
+        replay_path = self._replay_path()
+        if not os.path.exists(replay_path):
+            os.replace(self.spool_path, replay_path)
+        rows = await asyncio.to_thread(_read_spool, replay_path)
+
+        for start in range(0, len(rows), self.batch_size):
+            batch = rows[start:start + self.batch_size]
+            try:
+                await self._write(batch)
+            except Exception as e:
+                logger.error(f"Spool replay stopped after {start} rows: {str(e)}")
+                await self._spool(rows[start:])
+                self._next_replay_at = time.monotonic() + SPOOL_RETRY_SECONDS
+                break
+            self.stats.replayed += len(batch)
+        os.remove(replay_path)
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+def _append_lines(path: str, lines: str):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as spool_file:
+        spool_file.write(lines)
+        spool_file.flush()
+        os.fsync(spool_file.fileno())
+
+def _read_spool(path: str) -> List[Dict[str, Any]]:
+    rows = []
+    with open(path, encoding="utf-8") as spool_file:
+        for line in spool_file:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                # A torn final line from a crash mid-append
+                logger.warning(f"Skipping unreadable spool line in {path}")
+                continue
+            row["created_at"] = datetime.fromisoformat(row["created_at"])
+            rows.append(row)
+    return rows
@@ -1,54 +1,141 @@
-import redis
+import math
 import time
-from typing import Optional
+import uuid
+from dataclasses import dataclass
+from typing import Dict, Optional
 from app.core.config import settings
+from app.core.redis import get_redis
+from app.core.metrics import RATE_LIMIT_SECONDS
 import logging
 
 logger = logging.getLogger(__name__)
 
+UNLIMITED_PLANS = ('pro', 'expert')
+
+# Sliding-window log kept in a sorted set scored by Redis server time (microseconds),
+# so every worker agrees on the window regardless of local clock skew. Checking and
+# recording happen in one atomic script call.
+SLIDING_WINDOW_SCRIPT = """
+local key = KEYS[1]
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local token = ARGV[4]
+
+local now = redis.call('TIME')
+local now_us = tonumber(now[1]) * 1000000 + tonumber(now[2])
+
+redis.call('ZREMRANGEBYSCORE', key, '-inf', now_us - window)
+local count = redis.call('ZCARD', key)
+
+local allowed = 0
+if count + cost <= limit then
+    for i = 1, cost do
+        redis.call('ZADD', key, now_us, token .. ':' .. i)
+    end
+    count = count + cost
+    allowed = 1
+end
+
+local index = 0
+if allowed == 0 then
+    index = count + cost - limit - 1
+end
+local reset = window
+local entry = redis.call('ZRANGE', key, index, index, 'WITHSCORES')
+if entry[2] then
+    reset = tonumber(entry[2]) + window - now_us
+end
+
+redis.call('PEXPIRE', key, math.ceil(window / 1000))
+return {allowed, limit - count, reset}
+"""
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    limit: Optional[int]
+    remaining: int
+    reset_after: float
+
+    def headers(self) -> Dict[str, str]:
+        if self.limit is None:
+            return {}
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(max(0, self.remaining)),
+            "X-RateLimit-Reset": str(math.ceil(self.reset_after))
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.reset_after)))
+        return headers
+
 class RateLimiter:
     
     def __init__(self):
-        self.redis_client = redis.from_url(settings.REDIS_URL)
+        self.limit = settings.FREE_USER_RATE_LIMIT
+        self.window = settings.FREE_USER_RATE_LIMIT_WINDOW
+        self.local_precheck = settings.RATE_LIMIT_LOCAL_PRECHECK
+        self.local_max_entries = settings.RATE_LIMIT_LOCAL_MAX_ENTRIES
+        self._blocked_until: Dict[int, float] = {}
+        self._script = None
     
     def _get_key(self, user_id: int) -> str:
-        current_minute = int(time.time() // 60)
-        return f"rate_limit:{user_id}:{current_minute}"
+        return f"rate_limit:{user_id}"
     
-    def is_allowed(self, user_id: int, user_plan: str) -> bool:
-        if user_plan in ['pro', 'expert']:
-            return True
-        
-        key = self._get_key(user_id)
-        current_count = self.redis_client.get(key)
-        
-        if current_count is None:
-            current_count = 0
-        else:
-            current_count = int(current_count)
-        
-        return current_count < settings.FREE_USER_RATE_LIMIT
+    def _get_script(self):
+        if self._script is None:
+            self._script = get_redis().register_script(SLIDING_WINDOW_SCRIPT)
+        return self._script
     
-    def increment_request(self, user_id: int, user_plan: str) -> int:
-        if user_plan in ['pro', 'expert']:
-            return 999999
-        
-        key = self._get_key(user_id)
-        current_count = self.redis_client.incr(key)
+    def _check_local(self, user_id: int) -> Optional[RateLimitResult]:
+        """Reject users already known to be over the limit without touching Redis.
+
+        Rejected requests are not recorded in the window, so a user rejected with
+        reset_after=N cannot be allowed again for N seconds on any worker.
+        """
+        blocked_until = self._blocked_until.get(user_id)
+        if blocked_until is None:
+            return None
+        now = time.monotonic()
+        if now >= blocked_until:
+            self._blocked_until.pop(user_id, None)
+            return None
+        return RateLimitResult(allowed=False, limit=self.limit, remaining=0, reset_after=blocked_until - now)
+    
+    def _remember_block(self, user_id: int, reset_after: float):
+        now = time.monotonic()
+        if len(self._blocked_until) >= self.local_max_entries:
+            self._blocked_until = {uid: until for uid, until in self._blocked_until.items() if until > now}
+            if len(self._blocked_until) >= self.local_max_entries:
+                return
+        self._blocked_until[user_id] = now + reset_after
+    
+    async def acquire(self, user_id: int, user_plan: str, cost: int = 1) -> RateLimitResult:
+        """Check and record `cost` requests for the user in a single Redis round trip."""
+        if user_plan in UNLIMITED_PLANS:
+            return RateLimitResult(allowed=True, limit=None, remaining=999999, reset_after=0)
         
-        if current_count == 1:
-            self.redis_client.expire(key, settings.FREE_USER_RATE_LIMIT_WINDOW)
+        start_time = time.perf_counter()
+        if self.local_precheck and cost == 1:
+            local_result = self._check_local(user_id)
+            if local_result:
+                RATE_LIMIT_SECONDS.labels("local").observe(time.perf_counter() - start_time)
+                return local_result
         
-        return current_count
-    
-    def get_remaining_requests(self, user_id: int, user_plan: str) -> int:
-        if user_plan in ['pro', 'expert']:
-            return 999999
+        allowed, remaining, reset_us = await self._get_script()(
+            keys=[self._get_key(user_id)],
+            args=[self.limit, self.window * 1_000_000, cost, uuid.uuid4().hex]
+        )
+        RATE_LIMIT_SECONDS.labels("redis").observe(time.perf_counter() - start_time)
+        result = RateLimitResult(
+            allowed=bool(allowed),
+            limit=self.limit,
+            remaining=int(remaining),
+            reset_after=max(0, int(reset_us)) / 1_000_000
+        )
         
-        key = self._get_key(user_id)
-        current_count = self.redis_client.get(key)
+        if not result.allowed and self.local_precheck and cost == 1:
+            self._remember_block(user_id, result.reset_after)
         
-        if current_count is None:
-            return settings.FREE_USER_RATE_LIMIT
-        else:
-            return max(0, settings.FREE_USER_RATE_LIMIT - int(current_count)) 
\ No newline at end of file
+        return result
@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from sqlalchemy import text
+from app.core.config import settings
+from app.core.database import async_engine
+from app.core.redis import get_redis
+from app.services.http_pool import get_http_pool
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class CheckResult:
+    ok: bool
+    latency_ms: float
+    checked_at: float
+    error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "ok": self.ok,
+            "latency_ms": self.latency_ms,
+            "age_seconds": round(time.monotonic() - self.checked_at, 2),
+            "error": self.error
+        }
+
+class ReadinessProbe:
+    """
+    Dependency checks behind /ready: MySQL, Redis and provider reachability.
+
+    Each result is cached (READINESS_CACHE_SECONDS, or READINESS_PROVIDER_CACHE_SECONDS for the
+    providers) and concurrent probes share one in-flight check, so a load balancer polling every
+    instance does not turn into a stream of queries and outbound requests.
+    """
+
+    def __init__(self, get_provider_urls: Callable[[], Dict[str, str]]):
+        self.get_provider_urls = get_provider_urls
+        self.timeout = settings.READINESS_CHECK_TIMEOUT
+        self._results: Dict[str, CheckResult] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def check(self) -> Tuple[bool, Dict[str, dict]]:
+        checks: Dict[str, Tuple[Callable[[], Awaitable[None]], float]] = {
+            "mysql": (self._check_mysql, settings.READINESS_CACHE_SECONDS),
+            "redis": (self._check_redis, settings.READINESS_CACHE_SECONDS)
+        }
+        for provider, url in self.get_provider_urls().items():
+            checks[provider] = (lambda url=url: self._check_url(url), settings.READINESS_PROVIDER_CACHE_SECONDS)
+
+        names = list(checks)
+        results = await asyncio.gather(*(self._cached(name, *checks[name]) for name in names))
+        by_name = dict(zip(names, results))
+        # Fallback routing can serve from either provider, so one reachable provider is enough
+        providers_ok = any(result.ok for name, result in by_name.items() if name not in ("mysql", "redis"))
+        ready = by_name["mysql"].ok and by_name["redis"].ok and providers_ok
+        return ready, {name: result.to_dict() for name, result in by_name.items()}
+
+    async def _cached(self, name: str, fn: Callable[[], Awaitable[None]], ttl: float) -> CheckResult:
+        result = self._results.get(name)
+        if result is not None and time.monotonic() - result.checked_at < ttl:
+            return result
+        lock = self._locks.setdefault(name, asyncio.Lock())
+        async with lock:
+            result = self._results.get(name)
+            if result is not None and time.monotonic() - result.checked_at < ttl:
+                return result
+            start = time.perf_counter()
+            try:
+                await asyncio.wait_for(fn(), timeout=self.timeout)
+                error = None
+            except Exception as e:
+                error = str(e) or type(e).__name__
+                logger.warning(f"Readiness check {name} failed: {error}")
+            result = CheckResult(
+                ok=error is None,
+                latency_ms=round((time.perf_counter() - start) * 1000, 2),
+                checked_at=time.monotonic(),
+                error=error
+            )
+            self._results[name] = result
+            return result
+
+    async def _check_mysql(self):
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    async def _check_redis(self):
+        await get_redis().ping()
+
+    async def _check_url(self, url: str):
+        # Any HTTP response, even 401/404, means DNS, TCP and TLS to the provider work
+        response = await get_http_pool().client.get(url)
+        await response.aclose()
@@ -0,0 +1,200 @@
+import cProfile
+import io
+import logging
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, deque
+from datetime import datetime
+from typing import Any, Deque, Dict, Optional
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class StackSampler:
+    """Statistical CPU profile: a background thread records the event loop thread's stack
+    every PROFILING_SAMPLE_INTERVAL seconds. Overhead is independent of how many calls run."""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = 0
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and len(stack) < 64:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples += 1
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def report(self, top_n: int) -> Dict[str, Any]:
+        leaf_counts: Counter = Counter()
+        for stack, count in self.stacks.items():
+            leaf_counts[stack.rsplit(";", 1)[-1]] += count
+        return {
+            "samples": self.samples,
+            "interval_seconds": self.interval,
+            "top_functions": [
+                {"function": function, "samples": count, "share": round(count / self.samples, 4)}
+                for function, count in leaf_counts.most_common(top_n)
+            ],
+            # Folded stacks ("root;...;leaf count"), the input format of flamegraph tools
+            "folded_stacks": [f"{stack} {count}" for stack, count in self.stacks.most_common(top_n)]
+        }
+
+class ProfileSession:
+    """Profiles one request. Entered around the request's ASGI call by ServerTimingMiddleware."""
+
+    def __init__(self, profiler: "RequestProfiler", path: str, mode: str, memory: bool):
+        self.profiler = profiler
+        self.path = path
+        self.mode = mode
+        self.memory = memory
+        self.started_at = datetime.utcnow()
+        self._profile: Optional[cProfile.Profile] = None
+        self._sampler: Optional[StackSampler] = None
+        self._started_tracemalloc = False
+        self._snapshot_before = None
+        self._snapshot_after = None
+
+    def __enter__(self):
+        if self.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(settings.PROFILING_TRACEMALLOC_FRAMES)
+                self._started_tracemalloc = True
+            self._snapshot_before = tracemalloc.take_snapshot()
+        if self.mode == "sample":
+            self._sampler = StackSampler(threading.get_ident(), settings.PROFILING_SAMPLE_INTERVAL)
+            self._sampler.start()
+        else:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._profile is not None:
+            self._profile.disable()
+        if self._sampler is not None:
+            self._sampler.stop()
+        if self.memory:
+            self._snapshot_after = tracemalloc.take_snapshot()
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+        return False
+
+    def finish(self, status_code: int, total_ms: float, spans: Dict[str, float]):
+        top_n = settings.PROFILING_TOP_N
+        report: Dict[str, Any] = {
+            "path": self.path,
+            "status": status_code,
+            "started_at": self.started_at.isoformat(),
+            "total_ms": round(total_ms, 2),
+            "spans": {name: round(duration, 2) for name, duration in spans.items()},
+            "mode": self.mode
+        }
+        try:
+            # The event loop interleaves requests, so other requests on this worker show up too
+            if self._profile is not None:
+                output = io.StringIO()
+                stats = pstats.Stats(self._profile, stream=output)
+                stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top_n)
+                report["cpu"] = output.getvalue()
+            if self._sampler is not None:
+                report["cpu"] = self._sampler.report(top_n)
+            if self._snapshot_after is not None:
+                differences = self._snapshot_after.compare_to(self._snapshot_before, "lineno")
+                report["memory"] = {
+                    "allocated_bytes": sum(stat.size_diff for stat in differences),
+                    "top_allocations": [str(stat) for stat in differences[:top_n]]
+                }
+        except Exception as e:
+            logger.error(f"Failed to build profile report for {self.path}: {str(e)}")
+            report["error"] = str(e)
+        finally:
+            self.profiler.complete(report)
+
+class RequestProfiler:
+    """
+    On-demand profiling of the next N requests on this worker, armed from the admin API.
+
+    Only one request is profiled at a time (cProfile and tracemalloc are process-wide), so
+    concurrent requests are served normally while the profiled one runs. Finished reports
+    are kept in memory, newest last, up to PROFILING_MAX_REPORTS.
+    """
+
+    def __init__(self):
+        self.remaining = 0
+        self.mode = "cprofile"
+        self.memory = False
+        self.path_prefix = ""
+        self.armed_at: Optional[float] = None
+        self.profiled = 0
+        self.reports: Deque[Dict[str, Any]] = deque(maxlen=settings.PROFILING_MAX_REPORTS)
+        self._active: Optional[ProfileSession] = None
+
+    def arm(self, requests: int, mode: str = "cprofile", memory: bool = False, path_prefix: str = "") -> Dict[str, Any]:
+        self.remaining = min(requests, settings.PROFILING_MAX_REQUESTS)
+        self.mode = mode
+        self.memory = memory
+        self.path_prefix = path_prefix
+        self.armed_at = time.monotonic()
+        logger.info(f"Profiling armed for {self.remaining} requests (mode={mode}, memory={memory})")
+        return self.get_status()
+
+    def disarm(self, clear_reports: bool = False) -> Dict[str, Any]:
+        self.remaining = 0
+        if clear_reports:
+            self.reports.clear()
+        return self.get_status()
+
+    def claim(self, path: str) -> Optional[ProfileSession]:
+        if self.remaining <= 0 or self._active is not None or not path.startswith(self.path_prefix):
+            return None
+        if time.monotonic() - self.armed_at > settings.PROFILING_ARM_SECONDS:
+            # Nobody sent matching traffic in time; do not leave profiling armed indefinitely
+            self.remaining = 0
+            return None
+        self.remaining -= 1
+        self._active = ProfileSession(self, path, self.mode, self.memory)
+        return self._active
+
+    def complete(self, report: Dict[str, Any]):
+        self.reports.append(report)
+        self.profiled += 1
+        self._active = None
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "remaining": self.remaining,
+            "mode": self.mode,
+            "memory": self.memory,
+            "path_prefix": self.path_prefix,
+            "active": self._active is not None,
+            "profiled": self.profiled,
+            "reports": len(self.reports)
+        }
+
+_request_profiler: Optional[RequestProfiler] = None
+
+def get_request_profiler() -> RequestProfiler:
+    global _request_profiler
+    if _request_profiler is None:
+        _request_profiler = RequestProfiler()
+    return _request_profiler
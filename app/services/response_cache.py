@@ -0,0 +1,58 @@
+import json
+import time
+from typing import Optional
+from app.core.config import settings
+from app.core.models_config import ModelConfig
+from app.models import PlanType
+from app.services.base_ai_service import AIResponse
+from app.services.two_tier_cache import TwoTierCache
+from app.utils import exact_fingerprint
+
+class ResponseCache:
+    """
+    Opt-in exact-match cache of completions keyed on (model, prompt, generation params).
+    Only surrounding whitespace is ignored: case and indentation can change the answer.
+    
+    Hits are returned with zero tokens and cost, since no provider call was made.
+    """
+    
+    def __init__(self):
+        self.enabled = settings.RESPONSE_CACHE_ENABLED
+        self.plans = {plan.strip().lower() for plan in settings.RESPONSE_CACHE_PLANS if plan.strip()}
+        self.cache = TwoTierCache(
+            namespace="response",
+            ttl=settings.RESPONSE_CACHE_TTL,
+            max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+            max_bytes=settings.RESPONSE_CACHE_MAX_BYTES,
+            redis_enabled=settings.RESPONSE_CACHE_REDIS_ENABLED
+        )
+    
+    def is_enabled_for(self, user_plan: PlanType) -> bool:
+        return self.enabled and user_plan.value in self.plans
+    
+    def _key(self, query: str, model: str) -> str:
+        params = json.dumps(ModelConfig.get_generation_params(model), sort_keys=True)
+        return exact_fingerprint(query.strip(), model, params)
+    
+    async def get(self, query: str, model: str) -> Optional[AIResponse]:
+        start_time = time.perf_counter()
+        cached = await self.cache.get(self._key(query, model))
+        if cached is None:
+            return None
+        return AIResponse(
+            response=cached["response"],
+            tokens_used=0,
+            model_used=cached["model_used"],
+            cost_usd=0.0,
+            processing_time=time.perf_counter() - start_time,
+            cached=True
+        )
+    
+    async def set(self, query: str, model: str, ai_response: AIResponse):
+        await self.cache.set(self._key(query, model), {
+            "response": ai_response.response,
+            "model_used": ai_response.model_used
+        })
+    
+    def get_stats(self):
+        return self.cache.get_stats()
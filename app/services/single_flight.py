@@ -0,0 +1,165 @@
+import asyncio
+import json
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+from app.core.config import settings
+from app.core.redis import get_redis
+import logging
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Published instead of a result when the leader's call failed; followers then run their own call
+LEADER_FAILED = "__failed__"
+# The result key only has to cover followers that subscribe just after the leader published
+RESULT_TTL_MS = 5000
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one execution.
+    
+    Within a worker, callers share one task; it is cancelled only when every caller
+    waiting on it has been cancelled. With `distributed` enabled, the first worker to
+    take a Redis lock executes the call and publishes the result; other workers wait
+    on the result channel and fall back to executing themselves on timeout or failure.
+    """
+    
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self.enabled = settings.SINGLE_FLIGHT_ENABLED
+        self.distributed = settings.SINGLE_FLIGHT_DISTRIBUTED
+        self.lock_ttl = settings.SINGLE_FLIGHT_LOCK_TTL
+        self.wait_timeout = settings.SINGLE_FLIGHT_WAIT_TIMEOUT
+        self._flights: Dict[str, _Flight] = {}
+        self.executions = 0
+        self.shared_calls = 0
+    
+    async def do(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[T]],
+        encode: Callable[[T], Any] = lambda value: value,
+        decode: Callable[[Any], T] = lambda value: value
+    ) -> Tuple[T, bool]:
+        """Return (result, shared); shared is False only for the caller whose call did the work."""
+        if not self.enabled:
+            return await fn(), False
+        
+        flight = self._flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _Flight(asyncio.ensure_future(self._execute(key, fn, encode, decode)))
+            self._flights[key] = flight
+        else:
+            self.shared_calls += 1
+        
+        flight.waiters += 1
+        try:
+            result, remote = await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+                # Unregister now: the task only unwinds on its next step, and a caller joining
+                # before then would await a cancelled flight
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            raise
+        flight.waiters -= 1
+        return result, remote or not leader
+    
+    async def _execute(self, key, fn, encode, decode) -> Tuple[Any, bool]:
+        try:
+            if self.distributed:
+                return await self._execute_distributed(key, fn, encode, decode)
+            self.executions += 1
+            return await fn(), False
+        finally:
+            flight = self._flights.get(key)
+            if flight is not None and flight.task is asyncio.current_task():
+                del self._flights[key]
+    
+    async def _execute_distributed(self, key, fn, encode, decode) -> Tuple[Any, bool]:
+        redis = get_redis()
+        lock_key = f"single_flight:{self.namespace}:lock:{key}"
+        result_key = f"single_flight:{self.namespace}:result:{key}"
+        channel = f"single_flight:{self.namespace}:done:{key}"
+        token = uuid.uuid4().hex
+        
+        try:
+            acquired = await redis.set(lock_key, token, nx=True, px=int(self.lock_ttl * 1000))
+        except Exception as e:
+            logger.warning(f"Single-flight lock unavailable, running locally: {str(e)}")
+            acquired = None
+            redis = None
+        
+        if not acquired and redis is not None:
+            remote_result = await self._wait_for_leader(redis, result_key, channel)
+            if remote_result is not None:
+                return decode(remote_result), True
+        
+        self.executions += 1
+        try:
+            result = await fn()
+        except BaseException:
+            if acquired:
+                await self._publish(redis, result_key, channel, LEADER_FAILED, lock_key, token)
+            raise
+        if acquired:
+            await self._publish(redis, result_key, channel, json.dumps(encode(result)), lock_key, token)
+        return result, False
+    
+    async def _wait_for_leader(self, redis, result_key: str, channel: str) -> Optional[Any]:
+        pubsub = redis.pubsub()
+        try:
+            await pubsub.subscribe(channel)
+            # The leader may have finished between our lock attempt and subscribing
+            payload = await redis.get(result_key)
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.wait_timeout
+            while payload is None and loop.time() < deadline:
+                message = await pubsub.get_message(
+                    ignore_subscribe_messages=True,
+                    timeout=min(1.0, deadline - loop.time())
+                )
+                if message and message.get("type") == "message":
+                    payload = message["data"]
+        except Exception as e:
+            logger.warning(f"Single-flight wait failed, running locally: {str(e)}")
+            payload = None
+        finally:
+            try:
+                await pubsub.unsubscribe(channel)
+                await pubsub.close()
+            except Exception:
+                pass
+        
+        if payload is None:
+            return None
+        if isinstance(payload, bytes):
+            payload = payload.decode("utf-8")
+        if payload == LEADER_FAILED:
+            return None
+        return json.loads(payload)
+    
+    async def _publish(self, redis, result_key: str, channel: str, payload: str, lock_key: str, token: str):
+        try:
+            await redis.set(result_key, payload, px=RESULT_TTL_MS)
+            await redis.publish(channel, payload)
+            if (await redis.get(lock_key)) in (token, token.encode("utf-8")):
+                await redis.delete(lock_key)
+        except Exception as e:
+            logger.warning(f"Could not publish single-flight result: {str(e)}")
+    
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._flights),
+            "executions": self.executions,
+            "shared_calls": self.shared_calls
+        }
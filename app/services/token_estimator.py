@@ -0,0 +1,106 @@
+import logging
+import math
+import re
+from functools import lru_cache
+from typing import Optional
+from app.core.config import settings
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# The cl100k-style pre-tokenizer: contractions, letter runs with their leading space, digit
+# groups of up to three, punctuation runs and whitespace. BPE merges never cross these pieces.
+PRETOKEN_PATTERN = re.compile(r"""'(?:[sdmt]|ll|ve|re)| ?[^\W\d_]+| ?\d{1,3}| ?[^\s\w]+|\s+(?!\S)|\s+""")
+
+# Whole words up to this length (with their leading space) are usually a single token in the
+# OpenAI vocabularies; longer and rarer words split into sub-words of roughly this many letters
+SINGLE_TOKEN_WORD_CHARS = 10
+SUBWORD_CHARS = 8
+
+# Chat formatting around each message (role markers and separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+class PromptTooLargeError(Exception):
+    """Raised before any provider call when a prompt cannot fit in the model's context window."""
+
+    def __init__(self, model: str, prompt_tokens: int, context_window: int):
+        super().__init__(
+            f"Prompt is about {prompt_tokens} tokens, which does not fit the {context_window}-token context of {model}"
+        )
+        self.model = model
+        self.prompt_tokens = prompt_tokens
+        self.context_window = context_window
+
+@lru_cache(maxsize=settings.TOKEN_ESTIMATOR_CACHE_SIZE)
+def _piece_tokens(piece: str) -> int:
+    """Token count for one pre-token piece, memoised since real text reuses a small vocabulary."""
+    text = piece.lstrip(" ") or piece
+    if not text.isascii():
+        # Non-Latin scripts are split close to byte level
+        return math.ceil(len(text.encode("utf-8")) / 2)
+    if text.isalpha():
+        return 1 if len(text) <= SINGLE_TOKEN_WORD_CHARS else math.ceil(len(text) / SUBWORD_CHARS)
+    if text.isspace():
+        return 1
+    if text.isdigit():
+        return 1
+    return math.ceil(len(text) / 2)
+
+class TokenEstimator:
+    """
+    Local token counts for pre-flight sizing, without calling a provider.
+
+    Uses tiktoken when its encoding can be loaded (it is downloaded on first use). Otherwise text
+    is split with the same pre-tokenizer pattern and each piece is costed from a cached table.
+    That is only a rough estimate: common words are one token, but identifiers, rare words and
+    non-Latin text can be off by a wide margin. Both vocabularies are OpenAI's; Claude counts are
+    close but not exact, so provider-reported usage is preferred wherever the SDK returns it.
+    """
+
+    def __init__(self):
+        self._encodings = {}
+
+    def count(self, text: str, model: Optional[str] = None) -> int:
+        if not text:
+            return 0
+        encoding = self._get_encoding(model)
+        if encoding is not None:
+            return len(encoding.encode_ordinary(text))
+        return sum(_piece_tokens(piece) for piece in PRETOKEN_PATTERN.findall(text))
+
+    def count_prompt(self, prompt: str, model: Optional[str] = None) -> int:
+        return self.count(prompt, model) + MESSAGE_OVERHEAD_TOKENS
+
+    def get_stats(self):
+        info = _piece_tokens.cache_info()
+        return {
+            "backend": "tiktoken" if tiktoken is not None else "table",
+            "table_entries": info.currsize,
+            "table_hits": info.hits,
+            "table_misses": info.misses
+        }
+
+    def _get_encoding(self, model: Optional[str]):
+        if tiktoken is None:
+            return None
+        # o200k_base is gpt-4o's vocabulary; everything else is measured with cl100k_base
+        name = "o200k_base" if model and model.startswith("gpt-4o") else "cl100k_base"
+        if name not in self._encodings:
+            try:
+                self._encodings[name] = tiktoken.get_encoding(name)
+            except Exception as e:
+                logger.warning(f"Could not load tiktoken encoding {name}, using the built-in table: {str(e)}")
+                self._encodings[name] = None
+        return self._encodings[name]
+
+_token_estimator: Optional[TokenEstimator] = None
+
+def get_token_estimator() -> TokenEstimator:
+    global _token_estimator
+    if _token_estimator is None:
+        _token_estimator = TokenEstimator()
+    return _token_estimator
@@ -0,0 +1,153 @@
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Optional, Tuple
+from app.core.redis import get_redis
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Rough per-entry bookkeeping cost (OrderedDict node, tuple, key object) added to the payload size
+ENTRY_OVERHEAD_BYTES = 200
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    redis_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    redis_errors: int = 0
+
+class LocalTTLCache:
+    """In-process LRU with per-entry TTL, bounded by entry count and approximate bytes."""
+    
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self.current_bytes = 0
+        self._data: "OrderedDict[str, Tuple[float, Any, int]]" = OrderedDict()
+    
+    def __len__(self) -> int:
+        return len(self._data)
+    
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value, _ = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.stats.expirations += 1
+            return None
+        self._data.move_to_end(key)
+        return value
+    
+    def set(self, key: str, value: Any, size: int, ttl: Optional[float] = None):
+        size += len(key) + ENTRY_OVERHEAD_BYTES
+        if size > self.max_bytes:
+            return
+        if key in self._data:
+            self._remove(key)
+        self._data[key] = (time.monotonic() + (ttl or self.ttl), value, size)
+        self.current_bytes += size
+        while len(self._data) > self.max_entries or self.current_bytes > self.max_bytes:
+            oldest_key = next(iter(self._data))
+            self._remove(oldest_key)
+            self.stats.evictions += 1
+    
+    def delete(self, key: str):
+        if key in self._data:
+            self._remove(key)
+    
+    def clear(self):
+        self._data.clear()
+        self.current_bytes = 0
+    
+    def _remove(self, key: str):
+        _, _, size = self._data.pop(key)
+        self.current_bytes -= size
+
+class TwoTierCache:
+    """
+    In-process LocalTTLCache in front of a shared Redis tier.
+    
+    Values must be JSON-serializable. Redis failures are logged and counted but never
+    raised, so a cache outage degrades to the local tier instead of failing requests.
+    """
+    
+    def __init__(
+        self,
+        namespace: str,
+        ttl: int,
+        max_entries: int,
+        max_bytes: int,
+        redis_enabled: bool = True
+    ):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.redis_enabled = redis_enabled
+        self.local = LocalTTLCache(max_entries=max_entries, max_bytes=max_bytes, ttl=ttl)
+    
+    @property
+    def stats(self) -> CacheStats:
+        return self.local.stats
+    
+    def _redis_key(self, key: str) -> str:
+        return f"cache:{self.namespace}:{key}"
+    
+    async def get(self, key: str) -> Optional[Any]:
+        value = self.local.get(key)
+        if value is not None:
+            self.stats.hits += 1
+            return value
+        
+        if self.redis_enabled:
+            try:
+                raw = await get_redis().get(self._redis_key(key))
+            except Exception as e:
+                self.stats.redis_errors += 1
+                logger.warning(f"Redis read failed for cache '{self.namespace}': {str(e)}")
+                raw = None
+            if raw is not None:
+                value = json.loads(raw)
+                self.local.set(key, value, len(raw))
+                self.stats.redis_hits += 1
+                return value
+        
+        self.stats.misses += 1
+        return None
+    
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None):
+        raw = json.dumps(value, separators=(",", ":"))
+        self.local.set(key, value, len(raw), ttl)
+        if self.redis_enabled:
+            try:
+                await get_redis().set(self._redis_key(key), raw, ex=ttl or self.ttl)
+            except Exception as e:
+                self.stats.redis_errors += 1
+                logger.warning(f"Redis write failed for cache '{self.namespace}': {str(e)}")
+    
+    async def delete(self, key: str):
+        self.local.delete(key)
+        if self.redis_enabled:
+            try:
+                await get_redis().delete(self._redis_key(key))
+            except Exception as e:
+                self.stats.redis_errors += 1
+                logger.warning(f"Redis delete failed for cache '{self.namespace}': {str(e)}")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        stats = asdict(self.stats)
+        lookups = stats["hits"] + stats["redis_hits"] + stats["misses"]
+        stats.update({
+            "namespace": self.namespace,
+            "entries": len(self.local),
+            "bytes": self.local.current_bytes,
+            "max_bytes": self.local.max_bytes,
+            "hit_ratio": round((stats["hits"] + stats["redis_hits"]) / lookups, 4) if lookups else 0.0
+        })
+        return stats
@@ -0,0 +1,160 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.redis import get_redis
+from app.core.metrics import DB_WRITE_SECONDS, observe_seconds
+from app.repository import AsyncUserRepository
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class DailyUsage:
+    queries: int = 0
+    premium: int = 0
+
+class DailyUsageCounters:
+    """
+    Per-user daily query counters in Redis, keyed by UTC date.
+
+    Each (user, day) is a hash at usage:{user_id}:{YYYYMMDD} with `queries` and `premium` fields,
+    incremented atomically and expiring after USAGE_COUNTER_TTL, so a new day simply starts a
+    new key and nothing has to be reset. Users touched on a day are added to usage:dirty:{YYYYMMDD};
+    a background task periodically copies their current counts into users.daily_query_count and
+    daily_premium_count in batches, which keeps the MySQL columns as a recent snapshot.
+    """
+
+    def __init__(self):
+        self.ttl = settings.USAGE_COUNTER_TTL
+        self.fold_interval = settings.USAGE_COUNTER_FOLD_INTERVAL
+        self.fold_batch_size = settings.USAGE_COUNTER_FOLD_BATCH_SIZE
+        self.folded = 0
+        self.redis_errors = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _day(moment: Optional[datetime] = None) -> str:
+        return (moment or datetime.utcnow()).strftime("%Y%m%d")
+
+    @staticmethod
+    def _key(user_id: int, day: str) -> str:
+        return f"usage:{user_id}:{day}"
+
+    @staticmethod
+    def _dirty_key(day: str) -> str:
+        return f"usage:dirty:{day}"
+
+    async def increment(self, user_id: int, queries: int = 1, premium: int = 0) -> Optional[DailyUsage]:
+        """Add to today's counters and return the new totals, in one round trip.
+        Returns None when Redis is unavailable; the queries are still logged."""
+        day = self._day()
+        key = self._key(user_id, day)
+        try:
+            pipe = get_redis().pipeline(transaction=True)
+            pipe.hincrby(key, "queries", queries)
+            pipe.hincrby(key, "premium", premium)
+            pipe.expire(key, self.ttl)
+            pipe.sadd(self._dirty_key(day), user_id)
+            pipe.expire(self._dirty_key(day), self.ttl)
+            total_queries, total_premium, *_ = await pipe.execute()
+        except Exception as e:
+            self.redis_errors += 1
+            logger.warning(f"Failed to increment usage counters for user {user_id}: {str(e)}")
+            return None
+        return DailyUsage(queries=int(total_queries), premium=int(total_premium))
+
+    async def get(self, user_id: int) -> Optional[DailyUsage]:
+        try:
+            queries, premium = await get_redis().hmget(self._key(user_id, self._day()), "queries", "premium")
+        except Exception as e:
+            self.redis_errors += 1
+            logger.warning(f"Failed to read usage counters for user {user_id}: {str(e)}")
+            return None
+        return DailyUsage(queries=int(queries or 0), premium=int(premium or 0))
+
+    async def start(self):
+        if self._task is None and self.fold_interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.fold()
+        except Exception as e:
+            logger.error(f"Final usage counter fold failed: {str(e)}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.fold_interval)
+            try:
+                await self.fold()
+            except Exception as e:
+                logger.error(f"Usage counter fold failed: {str(e)}")
+
+    async def fold(self) -> int:
+        """Copy dirty users' counters into MySQL. Yesterday goes first so that right after
+        midnight a user active on both days ends with today's values."""
+        now = datetime.utcnow()
+        folded = 0
+        for day in (self._day(now - timedelta(days=1)), self._day(now)):
+            while True:
+                count = await self._fold_batch(day)
+                folded += count
+                if count < self.fold_batch_size:
+                    break
+        self.folded += folded
+        return folded
+
+    async def _fold_batch(self, day: str) -> int:
+        redis = get_redis()
+        dirty_key = self._dirty_key(day)
+        # SPOP hands each dirty user to exactly one worker even when several fold at once
+        members = await redis.spop(dirty_key, self.fold_batch_size)
+        if not members:
+            return 0
+        user_ids = [int(member) for member in members]
+
+        # Once popped, a failure anywhere (reading Redis, writing MySQL, or a cancel at shutdown)
+        # must put the users back, or they would not be folded again until their next query
+        try:
+            pipe = redis.pipeline(transaction=False)
+            for user_id in user_ids:
+                pipe.hmget(self._key(user_id, day), "queries", "premium")
+            values = await pipe.execute()
+            counts: Dict[int, Tuple[int, int]] = {
+                user_id: (int(queries or 0), int(premium or 0))
+                for user_id, (queries, premium) in zip(user_ids, values)
+            }
+
+            with observe_seconds(DB_WRITE_SECONDS, operation="usage_fold", outcome="error") as labels:
+                async with AsyncSessionLocal() as db:
+                    await AsyncUserRepository(db).set_daily_counts(counts)
+                labels["outcome"] = "success"
+        except BaseException:
+            try:
+                await redis.sadd(dirty_key, *user_ids)
+            except Exception as e:
+                self.redis_errors += 1
+                logger.error(f"Could not re-queue {len(user_ids)} users for the usage fold: {str(e)}")
+            raise
+        return len(user_ids)
+
+    def get_stats(self):
+        return {"folded": self.folded, "redis_errors": self.redis_errors}
+
+_usage_counters: Optional[DailyUsageCounters] = None
+
+def get_usage_counters() -> DailyUsageCounters:
+    global _usage_counters
+    if _usage_counters is None:
+        _usage_counters = DailyUsageCounters()
+    return _usage_counters
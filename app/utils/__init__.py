@@ -1,3 +1,5 @@
 from .session_utils import generate_session_id
+from .text_utils import normalize_query, exact_fingerprint, query_fingerprint
+from .pagination import encode_cursor, decode_cursor
 
-__all__ = ['generate_session_id'] 
\ No newline at end of file
+__all__ = ['generate_session_id', 'normalize_query', 'exact_fingerprint', 'query_fingerprint', 'encode_cursor', 'decode_cursor']
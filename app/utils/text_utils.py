@@ -0,0 +1,38 @@
+import hashlib
+
+def normalize_query(query: str) -> str:
+    """Lowercase and collapse whitespace so trivially different prompts share a key."""
+    return " ".join(query.lower().split())
+
+def exact_fingerprint(*parts: str) -> str:
+    """
+    Stable hash of the key parts exactly as given.
+    
+    For keys that stand for a provider answer: case and indentation change what a prompt asks,
+    e.g. in Python or YAML, so prompts are not normalized here.
+    
+    Returns:
+        Hex SHA-256 digest
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x1f")
+    return digest.hexdigest()
+
+def query_fingerprint(*parts: str) -> str:
+    """
+    Stable hash of a normalized query plus any extra key parts; for classification, whose
+    result does not depend on case or spacing.
+    
+    Args:
+        parts: Query text first, followed by optional qualifiers (model, params, ...)
+    
+    Returns:
+        Hex SHA-256 digest
+    """
+    digest = hashlib.sha256()
+    for index, part in enumerate(parts):
+        digest.update((normalize_query(part) if index == 0 else part).encode("utf-8"))
+        digest.update(b"\x1f")
+    return digest.hexdigest()
@@ -0,0 +1,120 @@
+"""
+Compare requests/sec of the query hot path with the sync and async database layers.
+
+Each simulated request does what /api/v1/ai/query does around the provider call:
+load the user, await the (simulated) completion, save the AIQuery row, increment
+the daily counter and read the user back for remaining queries. Run it against
+MySQL; SQLite serializes writers, so the sync mode deadlocks the event loop on it
+at any concurrency above 1.
+
+    python -m benchmarks.db_modes --requests 500 --concurrency 50 --provider-latency 0.05
+"""
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.core.database import Base, to_async_database_url
+from app.models import User, AIQuery, PlanType
+from app.repository import UserRepository, AIQueryRepository, AsyncUserRepository, AsyncAIQueryRepository
+
+BENCH_EMAIL = "db-modes-benchmark@vexacore.local"
+
+def _make_query(user_id: int) -> AIQuery:
+    return AIQuery(
+        user_id=user_id,
+        session_id="benchmark",
+        query_text="benchmark query",
+        model_used="gpt-4o-mini",
+        response="benchmark response",
+        tokens_used=42,
+        cost_usd=0.0,
+        processing_time=0.0
+    )
+
+def _ensure_user(session_factory) -> int:
+    db = session_factory()
+    try:
+        user_repo = UserRepository(db)
+        user = user_repo.get_by_email(BENCH_EMAIL)
+        if not user:
+            user = user_repo.create(User(
+                email=BENCH_EMAIL,
+                name="Benchmark",
+                hashed_password="!",
+                plan_type=PlanType.PRO
+            ))
+        return user.id
+    finally:
+        db.close()
+
+async def _run(handler, total: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await handler()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return time.perf_counter() - start
+
+async def bench_sync(session_factory, user_id: int, args) -> float:
+    async def handler():
+        db = session_factory()
+        try:
+            user_repo = UserRepository(db)
+            user_repo.get_by_id(user_id)
+            await asyncio.sleep(args.provider_latency)
+            AIQueryRepository(db).create(_make_query(user_id))
+            user_repo.increment_daily_query_count(user_id)
+            user_repo.get_by_id(user_id)
+        finally:
+            db.close()
+
+    return await _run(handler, args.requests, args.concurrency)
+
+async def bench_async(session_factory, user_id: int, args) -> float:
+    async def handler():
+        async with session_factory() as db:
+            user_repo = AsyncUserRepository(db)
+            await user_repo.get_by_id(user_id)
+            await asyncio.sleep(args.provider_latency)
+            await AsyncAIQueryRepository(db).create(_make_query(user_id))
+            await user_repo.increment_daily_query_count(user_id)
+            await user_repo.get_by_id(user_id)
+
+    return await _run(handler, args.requests, args.concurrency)
+
+async def main(args):
+    pool_kwargs = {} if args.database_url.startswith("sqlite") else {"pool_size": args.concurrency}
+    sync_engine = create_engine(args.database_url)
+    async_engine = create_async_engine(to_async_database_url(args.database_url), **pool_kwargs)
+    Base.metadata.create_all(bind=sync_engine)
+
+    sync_sessions = sessionmaker(autocommit=False, autoflush=False, bind=sync_engine)
+    async_sessions = async_sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
+    user_id = _ensure_user(sync_sessions)
+
+    results = {}
+    for mode, bench, factory in (("sync", bench_sync, sync_sessions), ("async", bench_async, async_sessions)):
+        elapsed = await bench(factory, user_id, args)
+        results[mode] = args.requests / elapsed
+        print(f"{mode:>5}: {args.requests} requests in {elapsed:.2f}s -> {results[mode]:.1f} req/s")
+
+    print(f"async/sync speedup: {results['async'] / results['sync']:.2f}x")
+    await async_engine.dispose()
+    sync_engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark sync vs async database modes")
+    parser.add_argument("--database-url", default=settings.DATABASE_URL)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--provider-latency", type=float, default=0.05,
+                        help="Simulated provider latency in seconds")
+    asyncio.run(main(parser.parse_args()))
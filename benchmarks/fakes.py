@@ -0,0 +1,111 @@
+"""
+Local stand-ins for the paid and networked dependencies, used by the load benchmark.
+
+Importing this module imports the application, so set DATABASE_URL first (benchmarks.load does).
+"""
+import asyncio
+import math
+import random
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+from app.core.models_config import ModelConfig
+from app.services.base_ai_service import BaseAIService, AIResponse, StreamDelta
+from app.services.conversation_memory import ConversationContext
+
+@dataclass
+class LatencyModel:
+    """Log-normal provider latency: `median_seconds` at the middle, `sigma` sets the tail
+    (0.5 puts p99 near 3.2x the median). `error_rate` of calls fail after the delay."""
+    median_seconds: float = 0.2
+    sigma: float = 0.5
+    error_rate: float = 0.0
+    seed: Optional[int] = None
+
+    def __post_init__(self):
+        self._random = random.Random(self.seed)
+
+    def sample(self) -> float:
+        if self.median_seconds <= 0:
+            return 0.0
+        return self._random.lognormvariate(math.log(self.median_seconds), self.sigma)
+
+    def fails(self) -> bool:
+        return self._random.random() < self.error_rate
+
+class FakeProviderService(BaseAIService):
+    """A provider that answers after a sampled delay, with the same AIResponse shape as the real ones.
+
+    Classification, complexity and batching come from BaseAIService unchanged, so LLM
+    escalations of the query classifier also go through `query` and its latency model.
+    """
+
+    def __init__(self, provider: str, latency: LatencyModel, response_words: int = 120, stream_chunks: int = 20):
+        super().__init__(api_key="benchmark")
+        self.provider = provider
+        self.latency = latency
+        self.response_text = " ".join(f"word{index % 50}" for index in range(response_words))
+        self.stream_chunks = max(1, stream_chunks)
+        self.calls = 0
+        self.failures = 0
+
+    def _tokens(self, prompt: str) -> int:
+        return len(prompt.split()) + len(self.response_text.split())
+
+    async def query(
+        self,
+        prompt: str,
+        model: str = "gpt-4o-mini",
+        max_tokens: Optional[int] = None,
+        context: Optional[ConversationContext] = None
+    ) -> AIResponse:
+        self.calls += 1
+        delay = self.latency.sample()
+        await asyncio.sleep(delay)
+        if self.latency.fails():
+            self.failures += 1
+            raise Exception(f"{self.provider} API error: simulated failure")
+        tokens_used = self._tokens(prompt)
+        return AIResponse(
+            response=self.response_text,
+            tokens_used=tokens_used,
+            model_used=model,
+            cost_usd=(tokens_used / 1000) * ModelConfig.get_model_cost(model),
+            processing_time=delay
+        )
+
+    async def stream(
+        self,
+        prompt: str,
+        model: str,
+        max_tokens: Optional[int] = None,
+        context: Optional[ConversationContext] = None
+    ) -> AsyncIterator[StreamDelta]:
+        self.calls += 1
+        # Time to first token is the sampled latency; the rest of the text trickles in after it
+        await asyncio.sleep(self.latency.sample())
+        if self.latency.fails():
+            self.failures += 1
+            raise Exception(f"{self.provider} API error: simulated failure")
+        words = self.response_text.split(" ")
+        chunk_size = max(1, math.ceil(len(words) / self.stream_chunks))
+        for start in range(0, len(words), chunk_size):
+            yield StreamDelta(text=" ".join(words[start:start + chunk_size]) + " ")
+            await asyncio.sleep(0)
+        yield StreamDelta(text="", tokens_used=self._tokens(prompt))
+
+def install_fake_redis():
+    """Point the application's Redis clients at one in-process fakeredis server."""
+    import fakeredis
+    import app.core.redis as redis_module
+    server = fakeredis.FakeServer()
+    redis_module._redis_client = fakeredis.FakeAsyncRedis(server=server)
+    redis_module._sync_redis_client = fakeredis.FakeRedis(server=server)
+
+def install_fake_providers(latency: LatencyModel, **kwargs):
+    """Replace the router's OpenAI and Anthropic services with FakeProviderService instances."""
+    from app.services.ai_router_service import get_ai_router_service
+    router_service = get_ai_router_service()
+    router_service.openai_service = FakeProviderService("OpenAI", latency, **kwargs)
+    router_service.claude_service = FakeProviderService("Anthropic", latency, **kwargs)
+    return router_service
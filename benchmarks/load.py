@@ -0,0 +1,366 @@
+"""
+Offline load test of the FastAPI app: no provider spend, no MySQL or Redis server needed.
+
+The app runs in-process behind httpx's ASGI transport. Providers are replaced by
+benchmarks.fakes.FakeProviderService with a log-normal latency and an error rate, Redis by
+fakeredis, and the database defaults to a throwaway SQLite file (pass --database-url to use
+a real MySQL). A weighted mix of query, stream, usage and login requests runs at a fixed
+concurrency. The report gives RPS, p50/p95/p99 and the error rate per operation, plus the
+allocation peak per request, measured with tracemalloc in a separate sequential pass.
+
+Results can be saved as a baseline; later runs with the same settings fail (exit 1) when RPS
+drops or latency, errors or allocations grow beyond --tolerance.
+
+    pip install -r benchmarks/requirements.txt
+    python -m benchmarks.load --requests 2000 --concurrency 50 --save-baseline
+    python -m benchmarks.load --requests 2000 --concurrency 50
+    python -m benchmarks.load --mix query=1 --provider-latency-ms 800 --error-rate 0.05
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "load.json")
+BENCH_PASSWORD = "benchmark-password"
+OPERATIONS = ("query", "stream", "usage", "login")
+
+# Fixed query shapes so the local classifier, complexity rules and model choice vary like real traffic
+QUERY_TEMPLATES = (
+    "Write a Python function that merges two sorted lists #{n}",
+    "Debug this JavaScript error: undefined is not a function in my reducer #{n}",
+    "Write a short poem about the sea at night #{n}",
+    "Tell me a story about a robot who learns to paint #{n}",
+    "What is the capital of Australia and why was it chosen #{n}",
+    "Explain how TLS session resumption works #{n}",
+    " ".join(["Summarize the trade-offs between consistency and availability in distributed databases"] * 6) + " #{n}",
+)
+
+def parse_mix(value: str) -> Dict[str, int]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"unknown operation {name!r}, choose from {', '.join(OPERATIONS)}")
+        mix[name] = int(weight or 1)
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("the mix needs at least one operation with a positive weight")
+    return mix
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000, help="Measured requests")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=100, help="Unmeasured requests run first")
+    parser.add_argument("--mix", type=parse_mix, default="query=80,stream=5,usage=10,login=5",
+                        help="Weighted operations: query, stream, usage, login")
+    parser.add_argument("--users", type=int, default=20, help="Users sending query, stream and usage requests")
+    parser.add_argument("--auth-users", type=int, default=5, help="Separate users for login, which rotates the session")
+    parser.add_argument("--plan", default="pro", choices=["free", "pro", "expert"], help="Plan of the benchmark users")
+    parser.add_argument("--repeat-ratio", type=float, default=0.0,
+                        help="Share of queries reusing an earlier text, to exercise the response cache")
+    parser.add_argument("--provider-latency-ms", type=float, default=50.0, help="Median fake provider latency")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Log-normal spread of provider latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of fake provider calls that fail")
+    parser.add_argument("--response-words", type=int, default=120)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--database-url", help="Defaults to a temporary SQLite database")
+    parser.add_argument("--alloc-requests", type=int, default=50,
+                        help="Sequential requests per operation traced for allocations (0 to skip)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Write this run's results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this file")
+    return parser.parse_args()
+
+class BenchUser:
+    def __init__(self, user_id: int, email: str, token: str, session_id: str):
+        self.id = user_id
+        self.email = email
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.session_id = session_id
+
+class Scenario:
+    def __init__(self, client: httpx.AsyncClient, args, users: List[BenchUser], auth_users: List[BenchUser]):
+        self.client = client
+        self.users = users
+        self.auth_users = auth_users
+        self.repeat_ratio = args.repeat_ratio
+        self.random = random.Random(args.seed)
+        self.counter = itertools.count()
+        self.issued: List[str] = []
+
+    def next_query(self) -> str:
+        if self.issued and self.random.random() < self.repeat_ratio:
+            return self.random.choice(self.issued)
+        n = next(self.counter)
+        text = QUERY_TEMPLATES[n % len(QUERY_TEMPLATES)].format(n=n)
+        if len(self.issued) < 1000:
+            self.issued.append(text)
+        return text
+
+    def _query_body(self, user: BenchUser) -> dict:
+        # History off: each request is independent, so results do not depend on how turns interleave
+        return {"query": self.next_query(), "user_id": user.id, "session_id": user.session_id, "use_history": False}
+
+    async def query(self) -> httpx.Response:
+        user = self.random.choice(self.users)
+        return await self.client.post("/api/v1/ai/query", json=self._query_body(user), headers=user.headers)
+
+    async def stream(self) -> httpx.Response:
+        user = self.random.choice(self.users)
+        return await self.client.post("/api/v1/ai/query/stream", json=self._query_body(user), headers=user.headers)
+
+    async def usage(self) -> httpx.Response:
+        user = self.random.choice(self.users)
+        return await self.client.get(f"/api/v1/ai/usage/{user.id}", headers=user.headers)
+
+    async def login(self) -> httpx.Response:
+        user = self.random.choice(self.auth_users)
+        return await self.client.post("/api/v1/auth/login", json={"email": user.email, "password": BENCH_PASSWORD})
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+
+    def record(self, operation: str, seconds: float, status_code: int):
+        self.latencies[operation].append(seconds)
+        self.statuses[operation][status_code] += 1
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # Nearest rank
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def summarize(latencies: List[float], statuses: Dict[int, int], elapsed: float) -> dict:
+    values = sorted(latencies)
+    errors = sum(count for status, count in statuses.items() if status >= 400)
+    return {
+        "count": len(values),
+        "rps": round(len(values) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+        "error_rate": round(errors / len(values), 4) if values else 0.0,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())}
+    }
+
+async def drive(scenario: Scenario, mix: Dict[str, int], total: int, concurrency: int, recorder: Optional[Recorder]) -> float:
+    operations = [name for name, weight in mix.items() if weight > 0]
+    weights = [mix[name] for name in operations]
+    plan = scenario.random.choices(operations, weights=weights, k=total)
+    position = iter(plan)
+
+    async def worker():
+        for operation in position:
+            start = time.perf_counter()
+            response = await getattr(scenario, operation)()
+            if recorder is not None:
+                recorder.record(operation, time.perf_counter() - start, response.status_code)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    return time.perf_counter() - start
+
+async def measure_allocations(scenario: Scenario, mix: Dict[str, int], per_operation: int) -> Dict[str, float]:
+    """Mean tracemalloc peak above the starting point, in KiB, of one request at a time.
+    Covers everything the request allocates in this process, including the test client's side."""
+    results = {}
+    tracemalloc.start()
+    try:
+        for operation in (name for name, weight in mix.items() if weight > 0):
+            peaks = []
+            for _ in range(per_operation):
+                current, _ = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+                await getattr(scenario, operation)()
+                _, peak = tracemalloc.get_traced_memory()
+                peaks.append(peak - current)
+            results[operation] = round(sum(peaks) / len(peaks) / 1024, 1) if peaks else 0.0
+    finally:
+        tracemalloc.stop()
+    return results
+
+async def create_users(client: httpx.AsyncClient, count: int, plan: str, label: str, recorder: Recorder) -> List[BenchUser]:
+    run_id = uuid.uuid4().hex[:8]
+
+    async def create(index: int) -> BenchUser:
+        email = f"bench-{label}-{run_id}-{index}@vexacore.local"
+        start = time.perf_counter()
+        response = await client.post("/api/v1/auth/register", json={
+            "email": email, "name": f"Benchmark {index}", "password": BENCH_PASSWORD, "plan_type": plan
+        })
+        recorder.record("register", time.perf_counter() - start, response.status_code)
+        response.raise_for_status()
+        start = time.perf_counter()
+        response = await client.post("/api/v1/auth/login", json={"email": email, "password": BENCH_PASSWORD})
+        recorder.record("login", time.perf_counter() - start, response.status_code)
+        response.raise_for_status()
+        body = response.json()
+        return BenchUser(body["user_id"], email, body["access_token"], body["session_id"])
+
+    return await asyncio.gather(*(create(index) for index in range(count)))
+
+def run_config(args) -> dict:
+    """Settings that change the numbers; a baseline only applies to runs with the same ones."""
+    return {
+        "concurrency": args.concurrency,
+        "mix": args.mix,
+        "plan": args.plan,
+        "repeat_ratio": args.repeat_ratio,
+        "provider_latency_ms": args.provider_latency_ms,
+        "latency_sigma": args.latency_sigma,
+        "error_rate": args.error_rate,
+        "response_words": args.response_words,
+        "database": args.database_url.split(":", 1)[0]
+    }
+
+async def run(args) -> dict:
+    import app.main
+    from app.services.database_service import DatabaseService
+    from benchmarks.fakes import LatencyModel, install_fake_providers, install_fake_redis
+
+    # app.main configures INFO logging; per-request log lines would dominate the profile
+    logging.getLogger().setLevel(logging.WARNING)
+    install_fake_redis()
+    router_service = install_fake_providers(
+        LatencyModel(args.provider_latency_ms / 1000, args.latency_sigma, args.error_rate, seed=args.seed),
+        response_words=args.response_words
+    )
+    if not DatabaseService.create_tables():
+        raise RuntimeError(f"Could not create tables on {args.database_url}")
+
+    await app.main.app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=app.main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            setup = Recorder()
+            users = await create_users(client, args.users, args.plan, "query", setup)
+            auth_users = await create_users(client, args.auth_users, args.plan, "auth", setup)
+            scenario = Scenario(client, args, users, auth_users)
+
+            if args.warmup:
+                await drive(scenario, args.mix, args.warmup, args.concurrency, None)
+            recorder = Recorder()
+            elapsed = await drive(scenario, args.mix, args.requests, args.concurrency, recorder)
+            allocations = await measure_allocations(scenario, args.mix, args.alloc_requests) if args.alloc_requests else {}
+    finally:
+        await app.main.app.router.shutdown()
+
+    all_latencies = [value for values in recorder.latencies.values() for value in values]
+    all_statuses: Dict[int, int] = defaultdict(int)
+    for statuses in recorder.statuses.values():
+        for status, count in statuses.items():
+            all_statuses[status] += count
+    operations = {
+        name: {**summarize(recorder.latencies[name], recorder.statuses[name], elapsed), "alloc_kib": allocations.get(name)}
+        for name in recorder.latencies
+    }
+    return {
+        "config": run_config(args),
+        "requests": args.requests,
+        "elapsed_seconds": round(elapsed, 3),
+        "overall": summarize(all_latencies, all_statuses, elapsed),
+        "operations": operations,
+        "setup": {name: summarize(values, setup.statuses[name], 0) for name, values in setup.latencies.items()},
+        "provider_calls": router_service.openai_service.calls + router_service.claude_service.calls,
+        "provider_failures": router_service.openai_service.failures + router_service.claude_service.failures
+    }
+
+def print_report(results: dict):
+    print(f"{results['requests']} requests in {results['elapsed_seconds']}s "
+          f"({results['provider_calls']} fake provider calls, {results['provider_failures']} failed)")
+    print(f"{'operation':<10} {'count':>7} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7} {'KiB/req':>9}")
+    rows = [(name, stats) for name, stats in sorted(results["operations"].items())] + [("overall", results["overall"])]
+    for name, stats in rows:
+        alloc = stats.get("alloc_kib")
+        print(f"{name:<10} {stats['count']:>7} {stats['rps']:>9.1f} {stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} "
+              f"{stats['p99_ms']:>9.1f} {stats['error_rate']:>7.2%} {alloc if alloc is not None else '-':>9}")
+    for name, stats in sorted(results["setup"].items()):
+        print(f"setup {name:<9} {stats['count']:>5} requests, p50 {stats['p50_ms']:.1f} ms, p95 {stats['p95_ms']:.1f} ms")
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    regressions = []
+    base_overall = baseline["overall"]
+    if results["overall"]["rps"] < base_overall["rps"] * (1 - tolerance):
+        regressions.append(f"overall rps {results['overall']['rps']} < baseline {base_overall['rps']}")
+    for name, base in baseline["operations"].items():
+        current = results["operations"].get(name)
+        if current is None:
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms", "alloc_kib"):
+            if base.get(metric) is None or current.get(metric) is None:
+                continue
+            # The absolute floor keeps sub-millisecond jitter on fast operations from failing the run
+            floor = 1.0 if metric.endswith("_ms") else 4.0
+            if current[metric] > base[metric] * (1 + tolerance) and current[metric] - base[metric] > floor:
+                regressions.append(f"{name} {metric} {current[metric]} > baseline {base[metric]}")
+        if current["error_rate"] > base["error_rate"] + 0.01:
+            regressions.append(f"{name} error rate {current['error_rate']:.2%} > baseline {base['error_rate']:.2%}")
+    return regressions
+
+def main() -> int:
+    args = parse_args()
+    temp_dir = None
+    if not args.database_url:
+        temp_dir = tempfile.mkdtemp(prefix="vexacore-bench-")
+        args.database_url = f"sqlite:///{os.path.join(temp_dir, 'bench.db')}"
+    # Read by app.core.config at import, so this has to happen before the app is imported
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("WRITE_BEHIND_SPOOL_PATH", os.path.join(temp_dir or tempfile.gettempdir(), "bench-spool.ndjson"))
+
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    print_report(results)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline["config"] != results["config"]:
+        print(f"Baseline {args.baseline} was recorded with different settings, not comparing:")
+        print(f"  baseline {baseline['config']}\n  this run {results['config']}")
+        return 2
+
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION: {regression}")
+    if not regressions:
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""
+Measure how long `import app.main` and the startup hooks take, and fail on regressions.
+
+Each run uses a fresh interpreter so module caches do not hide import cost. The check fails
+when the median import or startup time exceeds its budget, or when a module that must stay
+lazy (the provider SDKs) is imported by `app.main`.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --runs 7 --max-import-seconds 1.5 --max-startup-seconds 0.5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Heavy modules that must only be imported when first used
+LAZY_MODULES = ("openai", "anthropic")
+
+CHILD_SCRIPT = """
+import asyncio, json, sys, time
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+
+async def run_startup():
+    await app.main.app.router.startup()
+    started = time.perf_counter()
+    await app.main.app.router.shutdown()
+    return started
+
+started = asyncio.run(run_startup()) if sys.argv[1] == "1" else imported
+print(json.dumps({
+    "import_seconds": imported - start,
+    "startup_seconds": started - imported,
+    "eager_modules": [name for name in %r if name in sys.modules]
+}))
+""" % (LAZY_MODULES,)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Fresh-interpreter runs; the median is compared")
+    parser.add_argument("--max-import-seconds", type=float, default=1.5)
+    parser.add_argument("--max-startup-seconds", type=float, default=0.5)
+    parser.add_argument("--skip-startup", action="store_true", help="Only time the import, without running startup hooks")
+    return parser.parse_args()
+
+def run_once(with_startup: bool) -> dict:
+    completed = subprocess.run(
+        [sys.executable, "-c", CHILD_SCRIPT, "1" if with_startup else "0"],
+        capture_output=True,
+        text=True,
+        env=os.environ.copy()
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Benchmark child failed:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def main() -> int:
+    args = parse_args()
+    samples = [run_once(not args.skip_startup) for _ in range(args.runs)]
+    import_seconds = statistics.median(sample["import_seconds"] for sample in samples)
+    startup_seconds = statistics.median(sample["startup_seconds"] for sample in samples)
+    eager_modules = sorted({name for sample in samples for name in sample["eager_modules"]})
+
+    print(f"import app.main   median {import_seconds:.3f}s (budget {args.max_import_seconds:.3f}s)")
+    if not args.skip_startup:
+        print(f"startup hooks     median {startup_seconds:.3f}s (budget {args.max_startup_seconds:.3f}s)")
+
+    failures = []
+    if import_seconds > args.max_import_seconds:
+        failures.append("import time over budget")
+    if not args.skip_startup and startup_seconds > args.max_startup_seconds:
+        failures.append("startup time over budget")
+    if eager_modules:
+        failures.append(f"imported eagerly: {', '.join(eager_modules)}")
+
+    for failure in failures:
+        print(f"REGRESSION: {failure}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
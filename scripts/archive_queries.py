@@ -0,0 +1,77 @@
+"""
+Archive and delete expired ai_queries rows, or query the archive offline.
+
+    python -m scripts.archive_queries run --days 90
+    python -m scripts.archive_queries run --days 90 --chunk-size 500 --pause 1.0 --max-chunks 100
+    python -m scripts.archive_queries query --since 2024-01-01 --until 2024-01-31 --user-id 42
+    python -m scripts.archive_queries days
+
+`run` resumes an interrupted run from RETENTION_STATE_PATH. Usage rollups are not touched,
+so lifetime totals still include archived queries.
+"""
+import argparse
+import json
+from datetime import date
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services.query_archiver import QueryArchiver, ArchiveReader
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--archive-dir", default=settings.ARCHIVE_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Archive and delete rows older than --days")
+    run.add_argument("--days", type=int, default=settings.RETENTION_DAYS)
+    run.add_argument("--chunk-size", type=int, default=settings.RETENTION_CHUNK_SIZE)
+    run.add_argument("--pause", type=float, default=settings.RETENTION_CHUNK_PAUSE, help="Seconds to sleep between chunks")
+    run.add_argument("--max-chunks", type=int, default=None, help="Stop after this many chunks; the next run resumes")
+    run.add_argument("--state-path", default=settings.RETENTION_STATE_PATH)
+
+    query = commands.add_parser("query", help="Print archived rows as NDJSON")
+    query.add_argument("--since", type=date.fromisoformat)
+    query.add_argument("--until", type=date.fromisoformat)
+    query.add_argument("--user-id", type=int)
+    query.add_argument("--model")
+    query.add_argument("--contains", help="Only rows whose query text contains this string")
+    query.add_argument("--limit", type=int, default=None)
+
+    commands.add_parser("days", help="List the days present in the archive")
+    return parser.parse_args()
+
+def run(args):
+    db = SessionLocal()
+    try:
+        archiver = QueryArchiver(
+            db,
+            archive_dir=args.archive_dir,
+            state_path=args.state_path,
+            chunk_size=args.chunk_size,
+            pause_seconds=args.pause
+        )
+        state = archiver.run(days=args.days, max_chunks=args.max_chunks)
+        print(f"Archived {state.archived} rows, deleted {state.deleted} (cutoff {state.cutoff}, last id {state.last_id})")
+    finally:
+        db.close()
+
+def query(args):
+    reader = ArchiveReader(args.archive_dir)
+    predicate = (lambda row: args.contains in row["query_text"]) if args.contains else None
+    for count, row in enumerate(reader.iter_rows(args.since, args.until, args.user_id, args.model, predicate)):
+        if args.limit is not None and count >= args.limit:
+            break
+        print(json.dumps(row))
+
+def main():
+    args = parse_args()
+    if args.command == "run":
+        run(args)
+    elif args.command == "query":
+        query(args)
+    else:
+        for day in ArchiveReader(args.archive_dir).available_days():
+            print(day.isoformat())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Rebuild the daily usage rollups (user_model_daily_usage, model_daily_usage) from ai_queries.
+
+Each day is recomputed from scratch in its own short transaction, so the command is safe to
+re-run and to interrupt. Run it once after deploying the rollup tables to cover history written
+before them; rebuilding the current day while traffic is flowing can miss a write-behind flush
+that lands mid-rebuild, so prefer --until yesterday on a live system.
+
+    python -m scripts.backfill_usage_rollups
+    python -m scripts.backfill_usage_rollups --since 2024-01-01 --until 2024-06-30
+"""
+import argparse
+from datetime import date, timedelta
+
+from app.core.database import SessionLocal
+from app.repository import UsageRollupRepository
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--since", type=date.fromisoformat, help="First day to rebuild (default: oldest query)")
+    parser.add_argument("--until", type=date.fromisoformat, help="Last day to rebuild, inclusive (default: newest query)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    db = SessionLocal()
+    try:
+        repo = UsageRollupRepository(db)
+        first, last = repo.get_query_date_range()
+        if first is None:
+            print("ai_queries is empty, nothing to backfill")
+            return
+        day = args.since or first
+        until = args.until or last
+        days = rows = 0
+        while day <= until:
+            rows += repo.rebuild_day(day)
+            days += 1
+            day += timedelta(days=1)
+        print(f"Rebuilt {days} days of usage rollups ({rows} user/model/day rows)")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
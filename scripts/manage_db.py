@@ -0,0 +1,45 @@
+"""
+Manage the database schema outside the request-serving boot path.
+
+The application no longer creates the database or tables on startup unless DB_AUTO_INIT is
+set; run `init` once per environment (and after deploying new models or indexes) instead.
+Every step is idempotent.
+
+    python -m scripts.manage_db check
+    python -m scripts.manage_db init
+    python -m scripts.manage_db upgrade
+    python -m scripts.manage_db create-indexes
+"""
+import argparse
+import sys
+
+from app.services.database_service import DatabaseService
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("check", help="Check that the database accepts connections")
+    init = subparsers.add_parser("init", help="Create the database if missing, then tables and indexes")
+    init.add_argument("--no-create-database", action="store_true", help="Fail instead of creating a missing database")
+    subparsers.add_parser("upgrade", help="Add columns and indexes that existing tables are missing")
+    subparsers.add_parser("create-indexes", help="Add indexes that existing tables are missing")
+    return parser.parse_args()
+
+def main() -> int:
+    args = parse_args()
+    if args.command == "check":
+        ok = DatabaseService.check_database_connection()
+    elif args.command == "init":
+        ok = DatabaseService.check_database_connection()
+        if not ok and not args.no_create_database:
+            ok = DatabaseService.ensure_database_exists()
+        ok = ok and DatabaseService.create_tables() and DatabaseService.ensure_columns() and DatabaseService.ensure_indexes()
+    elif args.command == "upgrade":
+        ok = DatabaseService.ensure_columns() and DatabaseService.ensure_indexes()
+    else:
+        ok = DatabaseService.ensure_indexes()
+    print(f"{args.command}: {'ok' if ok else 'failed'}")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
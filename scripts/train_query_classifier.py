@@ -0,0 +1,75 @@
+"""
+Train the local query classifier from historical ai_queries rows.
+
+Each distinct query is labelled by the LLM classifier (gpt-4o-mini), then the
+local naive Bayes scorer is fitted on those labels and written to
+QUERY_CLASSIFIER_MODEL_PATH, where the app loads it on startup.
+
+    python -m scripts.train_query_classifier --limit 5000 --concurrency 8
+"""
+import argparse
+import asyncio
+import random
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.repository import AIQueryRepository
+from app.services.openai_service import OpenAIService
+from app.services.query_classifier import LocalQueryClassifier
+
+async def label_queries(queries, concurrency: int):
+    service = OpenAIService(api_key=settings.OPENAI_API_KEY, organization=settings.OPENAI_ORGANIZATION)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def label(query):
+        async with semaphore:
+            try:
+                return query, await service.classify_with_llm(query)
+            except Exception as e:
+                print(f"Skipping query, LLM labelling failed: {str(e)}")
+                return query, None
+
+    results = await asyncio.gather(*(label(q) for q in queries))
+    return [(query, label) for query, label in results if label]
+
+def evaluate(classifier: LocalQueryClassifier, samples, threshold: float):
+    correct = confident = confident_correct = 0
+    for query, label in samples:
+        result = classifier.classify(query)
+        correct += result.label == label
+        if result.confidence >= threshold:
+            confident += 1
+            confident_correct += result.label == label
+    total = len(samples) or 1
+    print(f"Holdout accuracy: {correct / total:.3f}")
+    print(f"Answered locally at threshold {threshold}: {confident / total:.3f} "
+          f"(accuracy {confident_correct / (confident or 1):.3f})")
+
+def main(args):
+    db = SessionLocal()
+    try:
+        queries = AIQueryRepository(db).get_distinct_query_texts(limit=args.limit)
+    finally:
+        db.close()
+    print(f"Labelling {len(queries)} queries with the LLM classifier...")
+
+    samples = asyncio.run(label_queries(queries, args.concurrency))
+    random.Random(42).shuffle(samples)
+    split = int(len(samples) * (1 - args.holdout))
+    train_samples, holdout_samples = samples[:split], samples[split:]
+
+    classifier = LocalQueryClassifier()
+    classifier.train(train_samples)
+    evaluate(classifier, holdout_samples, settings.QUERY_CLASSIFIER_CONFIDENCE_THRESHOLD)
+
+    classifier.train(samples)
+    classifier.save(args.output)
+    print(f"Saved model trained on {len(samples)} samples to {args.output}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the local query classifier")
+    parser.add_argument("--limit", type=int, default=5000, help="Maximum distinct queries to label")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent LLM labelling calls")
+    parser.add_argument("--holdout", type=float, default=0.2, help="Fraction of samples held out for evaluation")
+    parser.add_argument("--output", default=settings.QUERY_CLASSIFIER_MODEL_PATH)
+    main(parser.parse_args())